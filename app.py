@@ -1,46 +1,102 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import os
 import random
+import time
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from supabase import create_client, Client
-import json
-import streamlit.components.v1 as components
+from supabase import create_client
+
+from chart_component import ChartSync, trading_chart
+from chart_payload import CandleEncoder, WideContext, level_lines, marker_payload
+from catalog import DATA_DIR, DEFAULT_SYMBOL, MINUTE_TIMEFRAME, Catalog
+from engine import Engine
+from intrabar import MinuteIndex
+from indicators import INDICATORS, IndicatorOverlay, IndicatorSet, spec_key
+from levels import PivotIndex
+import metrics
+from metrics import CountingStore, MetricsSink
+from montecarlo import BOOTSTRAP, METHODS, RETURN_COLUMNS, RUIN_FRACTION, base_returns, process_pool, simulate
+from timeframes import BASE_TIMEFRAME, TIMEFRAMES, TimeframePyramid
+from trade_export import FORMATS, MIME_TYPES, PARQUET, export_bytes, guess_format, import_trades
+from market_data import BASE_DIR, CSV_FILE
+from performance import Analytics
+from scenarios import ANY, REGIMES, SEED_RANGE, SPAN, DatasetScenarios, parse_code, scenario_code, uniform_start
+from persistence import QUEUE_FILE, LocalQueue, WriteBehindWriter
+from storage import STORE_FILE, SQLiteTradeStore, SupabaseTradeStore
+
+# =====================
+# 🔗 저장소 설정
+# =====================
+# STORAGE_BACKEND = "sqlite" 이면 Supabase 대신 로컬 SQLite 파일을 쓴다
+@st.cache_resource
+def trade_store():
+    if st.secrets.get("STORAGE_BACKEND", "supabase") == "sqlite":
+        # SQLITE_LATENCY: 호출마다 넣을 지연(초). 부하 테스트에서 원격 저장소 왕복을 흉내낸다
+        return SQLiteTradeStore(
+            st.secrets.get("SQLITE_PATH", os.path.join(BASE_DIR, STORE_FILE)),
+            float(st.secrets.get("SQLITE_LATENCY", 0.0)),
+        )
+    return SupabaseTradeStore(create_client(st.secrets["SUPABASE_URL"], st.secrets["SUPABASE_KEY"]))
+
+# 청산 기록은 로컬 큐에 먼저 쓰고 백그라운드 스레드가 묶어서 저장소로 보낸다
+@st.cache_resource
+def trade_writer():
+    return WriteBehindWriter(LocalQueue(st.secrets.get("QUEUE_FILE", os.path.join(BASE_DIR, QUEUE_FILE))),
+                             trade_store()).start()
+
+store = CountingStore(trade_store())
+writer = trade_writer()
+
+# =====================
+# 📈 rerun 계측 (선택)
+# =====================
+# secrets 에 METRICS = true 이거나 주소에 ?debug=1 이 있을 때만 기록한다.
+# 꺼져 있으면 metrics.section() 은 빈 context 를 돌려주므로 비용이 거의 없다
+@st.cache_resource
+def metrics_sink():
+    return MetricsSink(
+        st.secrets.get("METRICS_FILE", os.path.join(BASE_DIR, "metrics.jsonl")),
+        st.secrets.get("METRICS_PROM_FILE", os.path.join(BASE_DIR, "metrics.prom")),
+        float(st.secrets.get("METRICS_PROM_INTERVAL", 5.0)),
+        gauges=lambda: {
+            "trade_queue_depth": len(trade_writer().queue),
+            "trade_writer_sent": trade_writer().sent,
+            "trade_writer_batches": trade_writer().batches,
+            "trade_writer_failures": trade_writer().failures,
+        },
+    )
 
-# =====================
-# 🔗 Supabase 설정
-# =====================
-SUPABASE_URL = st.secrets["SUPABASE_URL"]
-SUPABASE_KEY = st.secrets["SUPABASE_KEY"]
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+DEBUG = st.query_params.get("debug") == "1"
+METRICS_ENABLED = DEBUG or bool(st.secrets.get("METRICS", False))
+if METRICS_ENABLED:
+    # ?metrics_id=... 로 기록의 세션 이름을 지정할 수 있다 (부하 테스트가 클라이언트별로 기록을 모을 때)
+    if "_metrics_id" not in st.session_state:
+        st.session_state._metrics_id = st.query_params.get("metrics_id") or uuid.uuid4().hex[:8]
+    metrics.begin(st.session_state._metrics_id, st.session_state, metrics_sink())
+
+def rerun():
+    # st.rerun() 은 예외로 스크립트를 끊어 end() 에 닿지 못하므로, 그 전에 기록을 마감하고 스레드의 Recorder 를 비운다
+    if METRICS_ENABLED:
+        metrics.end(st.session_state, metrics_sink(), status="rerun")
+    st.rerun()
 
 # =====================
 # SESSION_ID 복원/생성
 # =====================
 if "SESSION_ID" not in st.session_state:
-    res = (
-        supabase.table("session_meta")
-        .select("session_id")
-        .eq("is_active", True)
-        .order("created_at", desc=True)
-        .limit(1)
-        .execute()
-    )
+    with metrics.section("session_restore"):
+        active_id = store.active_session()
 
-    if res.data:
-        st.session_state.SESSION_ID = res.data[0]["session_id"]
-    else:
-        # 처음 실행 시
-        new_id = str(uuid.uuid4())
-        st.session_state.SESSION_ID = new_id
-        from datetime import datetime, timezone
-
-        supabase.table("session_meta").insert({
-            "session_id": new_id,
-            "is_active": True,
-            "created_at": datetime.now(timezone.utc).isoformat()
-        }).execute()
+        if active_id:
+            st.session_state.SESSION_ID = active_id
+        else:
+            # 처음 실행 시
+            new_id = str(uuid.uuid4())
+            st.session_state.SESSION_ID = new_id
+            store.create_session(new_id)
 
 
 
@@ -54,62 +110,25 @@ st.set_page_config(layout="wide")
 # =====================
 # 기본 세션 초기화
 # =====================
+# 잔고/포지션/주문/라운드 진행 상태는 모두 engine(Engine) 이 갖는다
 defaults = {
-    "balance": 1000.0,
-    "position": None,
-    "entry_price": None,
-    "entry_capital": 0.0,
-    "entry_time": None,
-    "leverage": 5,
-    "position_ratio": 0.05,
-    "trade_count": 0,
-    "win": 0,
-    "lose": 0,
-    "total_pnl": 0.0,
-    "trade_markers": [],
-    "turn_count": 0,
-    "stop_loss_price": None,
+    "engine": None,
     "pending_order": False,
     "limit_price": None,
     "limit_direction": None,
     "performance_loaded": False,
-    "start_idx": 0,
-    "current_step": 300,
-    "df_chart": None,
+    "analytics": Analytics(),
+    "round_analytics": Analytics(),
     "support_levels": [],
     "resistance_levels": [],
-    "pending_entry": None,
-    "pending_exits": []
+    "chart_sync": ChartSync(),
+    "engine_symbol": None
 }
 
 for k, v in defaults.items():
     if k not in st.session_state:
         st.session_state[k] = v
 
-# =====================
-# 앱 시작 시 성과 복원
-# =====================
-def restore_performance():
-    df = load_trade_log_df()
-    if not df.empty:
-        st.session_state.trade_count = int(df["trade_id"].max())
-        st.session_state.win = int((df["pnl_dollar"] > 0).sum())
-        st.session_state.lose = int((df["pnl_dollar"] <= 0).sum())
-        st.session_state.total_pnl = float(df["pnl_dollar"].sum())
-        st.session_state.balance = float(df.iloc[-1]["balance_after"])
-        st.session_state.trade_markers = [
-            {
-                "time": int(pd.to_datetime(r["entry_time"]).timestamp()),
-                "label": r["direction"],
-                "color": "green" if r["pnl_dollar"]>0 else "red",
-                "symbol": "arrow"
-            } for _, r in df.iterrows()
-        ]
-
-
-
-
-
 # =====================
 # 유틸 함수
 # =====================
@@ -119,137 +138,198 @@ def now():
 def to_iso(dt):
     return pd.to_datetime(dt).isoformat() if dt else None
 
-def save_trade_log(row: dict):
-    row["session_id"] = SESSION_ID
-    supabase.table("trade_log").insert(row).execute()
+# 성과 복원에 필요한 컬럼만 읽는다
+STATS_COLUMNS = [
+    "trade_id", "idempotency_key", "entry_time", "play_hours", "leverage",
+    "pnl_dollar", "entry_capital", "balance_after",
+]
 
-def load_trade_log_df():
-    res = supabase.table("trade_log").select("*").eq("session_id", SESSION_ID).order("trade_id").execute()
-    return pd.DataFrame(res.data) if res.data else pd.DataFrame()
+def save_trade_log(row: dict):
+    with metrics.section("save_trade_log"):
+        row["session_id"] = SESSION_ID
+        st.session_state.analytics.add(row)
+        st.session_state.round_analytics.add(row)
+        writer.submit(row)
+
+def load_trade_rows(columns=None):
+    # 저장소 기록 + 아직 전송 대기 중인 기록 (idempotency_key 로 중복 제거)
+    # 대기 목록을 먼저 읽어야 그 사이 전송·ack 된 행이 양쪽 모두에서 빠지지 않는다
+    pending = writer.pending(SESSION_ID)
+    if columns is not None and "idempotency_key" not in columns:
+        # 중복 제거 키는 호출자가 고른 컬럼과 상관없이 항상 읽는다
+        columns = [*columns, "idempotency_key"]
+    rows = store.load_trades(SESSION_ID, columns)
+    sent = {r.get("idempotency_key") for r in rows}
+    rows += [r for r in pending if r["idempotency_key"] not in sent]
+    return rows
 
 def restore_performance():
+    # 세션당 한 번만 trade_log 를 읽고, 이후 통계는 청산마다 누적 갱신한다
     if st.session_state.performance_loaded:
         return
-    df = load_trade_log_df()
-    if not df.empty:
-        st.session_state.trade_count = int(df["trade_id"].max())
-        st.session_state.win = int((df["pnl_dollar"] > 0).sum())
-        st.session_state.lose = int((df["pnl_dollar"] <= 0).sum())
-        st.session_state.total_pnl = float(df["pnl_dollar"].sum())
-        st.session_state.balance = float(df.iloc[-1]["balance_after"])
+    with metrics.section("session_restore"):
+        rows = load_trade_rows(STATS_COLUMNS)
+        st.session_state.analytics = Analytics().seed(rows)
+        if rows:
+            acct = st.session_state.engine.account
+            acct.trade_count = len(rows)
+            acct.win = sum(r["pnl_dollar"] > 0 for r in rows)
+            acct.lose = len(rows) - acct.win
+            acct.total_pnl = float(sum(r["pnl_dollar"] for r in rows))
+            acct.balance = float(rows[-1]["balance_after"])
     st.session_state.performance_loaded = True
 
 # =====================
-# 앱 시작 시 성과 복원 호출
+# 차트 데이터 로드
 # =====================
-restore_performance()
+# data/<종목>/<타임프레임>/ 아래 청크 파일을 프로세스 전체가 공유하고,
+# 세션은 start_idx / current_step 만 보관한다.
+# 윈도우가 닿는 청크만 memory-map 하므로 설치된 이력 크기와 무관하게 메모리가 일정하다
+@st.cache_resource
+def catalog():
+    cat = Catalog(st.secrets.get("DATA_DIR", DATA_DIR))
+    # 최초 실행: 기존 btc_1h.csv 를 카탈로그로 옮긴다
+    if DEFAULT_SYMBOL not in cat.symbols(BASE_TIMEFRAME) and os.path.exists(CSV_FILE):
+        cat.install_csv(DEFAULT_SYMBOL, BASE_TIMEFRAME, CSV_FILE)
+    return cat
+
+@st.cache_resource
+def generate_chart(symbol=DEFAULT_SYMBOL):
+    return catalog().open(symbol, BASE_TIMEFRAME)
+
+# 포지션/대기 주문이 있는 동안에는 종목을 바꿀 수 없다
+_engine = st.session_state.engine
+symbol = st.sidebar.selectbox(
+    "종목", catalog().symbols(BASE_TIMEFRAME), key="symbol",
+    disabled=_engine is not None and (_engine.position is not None or len(_engine.book) > 0),
+)
+
+# 1분봉이 설치된 종목은 한 캔들 안의 체결 순서를 1분봉 경로로 정할 수 있다
+has_minutes = MINUTE_TIMEFRAME in catalog().timeframes(symbol)
+use_intrabar = st.sidebar.checkbox(
+    "1분봉으로 봉 안 체결 순서 결정", key="intrabar", disabled=not has_minutes,
+    help=None if has_minutes else f"data/{symbol}/{MINUTE_TIMEFRAME} 가 없습니다",
+)
+
+with metrics.section("generate_chart"):
+    candles_store = generate_chart(symbol)
+
+# 1시간봉 → 1분봉 행 범위 인덱스는 종목당 한 번만 만든다 (1분봉은 청크 memory-map 그대로)
+@st.cache_resource
+def minute_index(symbol):
+    return MinuteIndex(generate_chart(symbol), catalog().open(symbol, MINUTE_TIMEFRAME))
+
+# 이미 인코딩한 윈도우 prefix 를 세션끼리 공유한다
+@st.cache_resource
+def candle_encoder(symbol):
+    return CandleEncoder(generate_chart(symbol))
+
+# 4h / 12h / 1d / 1w 봉은 상위 타임프레임을 처음 고를 때 종목당 한 번만 만들어 두고 슬라이스만 한다
+@st.cache_resource
+def timeframe_pyramid(symbol):
+    return TimeframePyramid(generate_chart(symbol))
+
+# 스윙 고점/저점과 구간 최대/최소 테이블은 종목당 한 번만 만든다
+@st.cache_resource
+def pivot_index(symbol):
+    return PivotIndex(generate_chart(symbol))
+
+# 넓은 맥락: 윈도우 앞 구간의 묶음 봉을 start 별로 캐시한다 (context 는 기본 캔들 수)
+WIDE_CONTEXTS = {"끄기": 0, "1개월": 24 * 30, "3개월": 24 * 91, "1년": 24 * 365, "3년": 24 * 365 * 3}
+WIDE_BUDGET = 400
+
+@st.cache_resource
+def wide_context(symbol, timeframe, context):
+    source = candle_encoder(symbol) if timeframe == BASE_TIMEFRAME else timeframe_pyramid(symbol)[timeframe]
+    return WideContext(source, context, WIDE_BUDGET)
+
+# 보조지표는 타임프레임별로 전체 구간을 한 번 계산하고 지표 키("sma:20" 등)별로 캐시한다
+@st.cache_resource
+def indicator_set(symbol, timeframe):
+    source = candle_encoder(symbol) if timeframe == BASE_TIMEFRAME else timeframe_pyramid(symbol)[timeframe]
+    return IndicatorSet(source.bars())
+
+# 350캔들 윈도우별 변동성/추세/낙폭/거래량 국면 역색인은 카탈로그 설치 때 만들어 청크 옆에 저장해 둔다.
+# 파일이 없으면(예전 설치) 백그라운드에서 만들고, 그동안은 국면 없이 균등 추첨한다
+@st.cache_resource
+def scenario_index(symbol):
+    return DatasetScenarios(generate_chart(symbol), catalog().scenario_path(symbol, BASE_TIMEFRAME))
+
+def draw_start(seed=None, regime=None):
+    """선택한 국면에서 라운드 시작 위치를 뽑고, 공유용 시나리오 코드를 남긴다."""
+    index = scenario_index(symbol).get()
+    regime = regime or st.session_state.get("regime") or ANY
+    if index is None or regime not in index.regimes():
+        regime = ANY
+    seed = random.randrange(SEED_RANGE) if seed is None else seed
+    st.session_state.scenario_code = scenario_code(regime, seed)
+    # 균등 추첨은 색인의 ANY 추첨과 같은 값이므로 "any-<seed>" 코드는 색인 준비 전후로 같다
+    return index.draw(regime, seed) if index is not None else uniform_start(len(generate_chart(symbol)), seed)
+
+if st.session_state.engine is None:
+    st.session_state.engine = Engine(
+        candles_store,
+        start_idx=draw_start(),
+    )
+    st.session_state.engine_symbol = symbol
+elif st.session_state.engine_symbol != symbol:
+    # 종목 변경: 잔고는 유지하고 새 종목의 랜덤 위치에서 라운드를 다시 시작한다
+    st.session_state.engine.store = candles_store
+    st.session_state.engine.reset_round(draw_start())
+    st.session_state.engine_symbol = symbol
+    st.session_state.round_analytics = Analytics()
+    st.session_state.chart_sync = ChartSync()
+
+engine = st.session_state.engine
+engine.intrabar = minute_index(symbol) if use_intrabar and has_minutes else None
+
+# =====================
+# 🎯 시나리오 (국면 지정 / 코드로 같은 구간 재현)
+# =====================
+# 국면은 다음 라운드부터 적용된다. 같은 종목·코드면 누구나 같은 구간을 받는다
+regime_index = scenario_index(symbol).get()
+regime_counts = regime_index.regimes() if regime_index is not None else {ANY: max(len(candles_store) - SPAN + 1, 1)}
+with st.sidebar.expander("🎯 시나리오"):
+    if regime_index is None:
+        st.caption("⏳ 국면 색인을 만드는 중입니다. 그동안은 전체 구간에서 뽑습니다.")
+    st.selectbox(
+        "시장 국면", list(regime_counts), key="regime",
+        format_func=lambda name: f"{REGIMES[name]} ({regime_counts[name]:,})",
+    )
+    st.caption(f"현재 시나리오 코드: `{st.session_state.get('scenario_code', '-')}`")
+    code = st.text_input("시나리오 코드로 시작", key="scenario_input", placeholder="crash-123456")
+    if st.button(
+        "🎯 새 라운드 시작", key="scenario_start",
+        disabled=engine.position is not None or len(engine.book) > 0,
+    ):
+        try:
+            regime, seed = parse_code(code) if code.strip() else (None, None)
+        except ValueError:
+            st.error("시나리오 코드 형식이 올바르지 않습니다 (예: crash-123456)")
+        else:
+            if regime is not None and regime not in regime_counts:
+                if regime_index is None:
+                    st.error("국면 색인을 만드는 중입니다. 잠시 뒤 다시 시도하세요")
+                else:
+                    st.error(f"{symbol} 에는 '{REGIMES[regime]}' 구간이 없습니다")
+            else:
+                engine.reset_round(draw_start(seed, regime))
+                st.session_state.round_analytics = Analytics()
+                rerun()
 
 # =====================
-# 차트 데이터 로드
+# 앱 시작 시 성과 복원 호출
 # =====================
-def generate_chart():
-    BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-    DATA_FILE = os.path.join(BASE_DIR, "btc_1h.csv")
-    df = pd.read_csv(DATA_FILE)
-    df["open_time"] = pd.to_numeric(df["open_time"], errors="coerce")
-    df["open_time"] = df["open_time"].apply(
-        lambda x: pd.to_datetime(x, unit="ms", errors="coerce") if x and x > 1e12 else pd.to_datetime(x, unit="s", errors="coerce")
-    )
-    df = df.dropna(subset=["open_time"])
-    df = df.sort_values("open_time")
-    df.set_index("open_time", inplace=True)
-    return df
+restore_performance()
 
-if st.session_state.df_chart is None:
-    st.session_state.df_chart = generate_chart()
-    st.session_state.start_idx = random.randint(0, len(st.session_state.df_chart) - 300)
-    st.session_state.current_step = 300
-    
 
 # =====================
 # 포지션 관련 함수
 # =====================
-def reset_position():
-    st.session_state.position = None
-    st.session_state.entry_price = None
-    st.session_state.entry_capital = 0
-    st.session_state.entry_time = None
-    st.session_state.stop_loss_price = None
-
-def open_position(pos, price, capital, leverage, position_ratio):
-    st.session_state.position = pos
-    st.session_state.entry_price = price
-    st.session_state.entry_capital = capital
-    st.session_state.leverage = leverage
-    st.session_state.position_ratio = position_ratio
-
-    # ✅ 현재 캔들의 시간 (고정)
-    row = st.session_state.df_chart.iloc[
-        st.session_state.start_idx + st.session_state.current_step - 1
-    ]
-    entry_time = int(row.name.timestamp())
-
-    st.session_state.entry_time = entry_time
-
-    st.session_state.trade_markers.append({
-        "time": entry_time,   # ✅ 캔들 time
-        "label": pos,
-        "color": "green" if pos == "LONG" else "red",
-        "symbol": "arrow"
-    })
-
-def close_position(exit_price, reason="MANUAL EXIT"):
-    if st.session_state.position is None:
-        return
-
-    exit_ts = int(
-        st.session_state.df_chart.iloc[
-            st.session_state.start_idx + st.session_state.current_step - 1
-        ].name.timestamp()
-    )
-
-    entry = st.session_state.entry_price
-    amt = st.session_state.entry_capital
-    pos = st.session_state.position
-    lev = st.session_state.leverage
-
-    pnl = ((exit_price - entry)/entry*amt*lev
-           if pos=="LONG"
-           else (entry - exit_price)/entry*amt*lev)
-
-    st.session_state.balance += pnl
-    st.session_state.total_pnl += pnl
-    st.session_state.trade_count += 1
-    st.session_state.win += int(pnl > 0)
-    st.session_state.lose += int(pnl <= 0)
-
-    save_trade_log({
-        "entry_time": datetime.utcfromtimestamp(
-            st.session_state.entry_time
-        ).isoformat(),
-        "exit_time": datetime.utcfromtimestamp(exit_ts).isoformat(),
-        "play_hours": (exit_ts - st.session_state.entry_time) / 3600,
-        "direction": pos,
-        "entry_price": entry,
-        "exit_price": exit_price,
-        "leverage": lev,
-        "position_ratio": int(st.session_state.position_ratio * 100),
-        "entry_capital": amt,
-        "pnl_dollar": pnl,
-        "balance_after": st.session_state.balance,
-        "reason": reason
-    })
-
-    reset_position()
-
-    st.session_state.trade_markers.append({
-        "time": exit_ts,
-        "price": exit_price,
-        "label": reason,
-        "color": "red" if pnl<0 else "green",
-        "symbol":"x"
-    })
-    reset_position()
+def close_position(exit_price, reason="MANUAL EXIT", ratio=1.0):
+    row = engine.close(exit_price, reason, ratio)
+    if row is not None:
+        save_trade_log(row)
 
 # =====================
 # 메인 UI
@@ -257,146 +337,170 @@ def close_position(exit_price, reason="MANUAL EXIT"):
 st.title("📈 Trading Simulator")
 
 # =====================
-# ➡️ 다음 캔들 (차트보다 먼저!)
+# ➡️ 리플레이 영역 (fragment)
 # =====================
+# Next Candle / 자동 재생은 이 영역(다음 캔들 버튼, 차트, 남은 턴수, 포지션 손익)만 다시 실행한다.
+# 체결·청산으로 포지션이나 대기 주문이 바뀌면 사이드바와 누적 성과를 갱신하도록 전체 rerun 한다
 MAX_TURNS = 50
 
-if st.session_state.turn_count >= MAX_TURNS:
+if "autoplay" not in st.session_state:
+    st.session_state.autoplay = False
+    st.session_state.autoplay_at = 0.0
+
+def advance() -> bool:
+    """캔들 1개 진행. 체결/청산으로 포지션·대기 주문이 바뀌었으면 True."""
+    before = (engine.position, len(engine.book))
+    # 📌 대기 주문(지정가 진입/청산, 손절) 체결은 engine.step() 안에서
+    with metrics.section("next_candle"):
+        trades = engine.step()
+        for row in trades:
+            save_trade_log(row)
+    return bool(trades) or (engine.position, len(engine.book)) != before
+
+def replay_panel():
+    # fragment 만 다시 실행될 때는 여기서 rerun 기록을 따로 시작/마감한다
+    fragment_only = METRICS_ENABLED and metrics.current() is None
+    if fragment_only:
+        metrics.begin(st.session_state._metrics_id, st.session_state, metrics_sink())
+
+    # ⏩ 자동 재생: run_every 마다 1캔들 (위젯 조작으로 먼저 실행된 경우는 건너뛴다)
+    if st.session_state.autoplay and engine.turn_count < MAX_TURNS:
+        now_ts = time.monotonic()
+        if now_ts - st.session_state.autoplay_at >= 0.8 / autoplay_speed:
+            st.session_state.autoplay_at = now_ts
+            if advance() or engine.turn_count >= MAX_TURNS:
+                st.session_state.autoplay = False
+                rerun()
+
+    if engine.turn_count >= MAX_TURNS:
+
+        st.warning("🛑 최대 50턴이 종료되었습니다.")
+
+        # 🔁 새 매매 시작 버튼 (← 여기에 둔다)
+        if st.button("🔁 새 매매 시작"):
+            engine.reset_round(draw_start())
+            st.session_state.round_analytics = Analytics()
+            rerun()
 
-    st.warning("🛑 최대 50턴이 종료되었습니다.")
-
-    # 🔁 새 매매 시작 버튼 (← 여기에 둔다)
-    if st.button("🔁 새 매매 시작"):
-        st.session_state.start_idx = random.randint(
-            0, len(st.session_state.df_chart) - 300
-        )
-        st.session_state.current_step = 300
-        st.session_state.turn_count = 0
-        st.session_state.pending_entry = None
-        st.session_state.trade_markers = []
-        reset_position()
-        st.rerun()
+    else:
+        col_next, col_play = st.columns(2)
+        # ▶️ Next Candle 버튼
+        if col_next.button("▶️ Next Candle", key="next_candle"):
+            if advance():
+                rerun()
+        if col_play.button(
+            "⏸ 자동 재생 정지" if st.session_state.autoplay else f"⏩ 자동 재생 ({autoplay_speed}캔들/초)",
+            key="autoplay_toggle",
+        ):
+            # run_every 를 바꾸려면 fragment 를 다시 등록해야 하므로 전체 rerun
+            st.session_state.autoplay = not st.session_state.autoplay
+            rerun()
+
+    # =====================
+    # 데이터 슬라이싱
+    # =====================
+    start = engine.start_idx
+    end = engine.end
+    current_price = engine.price
+
+    # 다음 턴에 닿을 청크를 미리 열어 둔다
+    candles_store.prefetch(end)
+
+    # =====================
+    # 차트표시
+    # =====================
+    # 양방향 차트 컴포넌트: 매 rerun 마다 새 캔들/마커/가격선 변경분만 전송
+    timeframe = st.radio("타임프레임", [BASE_TIMEFRAME, *TIMEFRAMES], horizontal=True, key="timeframe")
+    chart_source = candle_encoder(symbol) if timeframe == BASE_TIMEFRAME else timeframe_pyramid(symbol)[timeframe]
+
+    selected = st.multiselect(
+        "보조지표", list(INDICATORS), key="indicators",
+        format_func=lambda name: INDICATORS[name].title
+    )
+    indicator_keys = []
+    if selected:
+        cols = st.columns(len(selected))
+        for col, name in zip(cols, selected):
+            cls = INDICATORS[name]
+            period = col.number_input(
+                f"{cls.title} 기간", min_value=1, max_value=500, value=cls.defaults[0], step=1, key=f"indicator_{name}"
+            )
+            indicator_keys.append(spec_key(name, int(period), *cls.defaults[1:]))
+    overlay = IndicatorOverlay(chart_source, indicator_set(symbol, timeframe), indicator_keys) if indicator_keys else None
+
+    # 과거 구간은 최대 WIDE_BUDGET 개 묶음 봉으로만 보내고, 현재 윈도우는 원래 해상도로 둔다
+    context_label = st.radio("과거 구간 함께 보기", list(WIDE_CONTEXTS), horizontal=True, key="wide_context")
+    context = WIDE_CONTEXTS[context_label]
+    chart_encoder = wide_context(symbol, timeframe, context) if context else chart_source
+
+    markers = marker_payload(engine.markers, chart_source.bar_time)
+
+    support_lines = level_lines(st.session_state.support_levels, "#2962FF", "Support")
+    resistance_lines = level_lines(st.session_state.resistance_levels, "#FF1744", "Resistance")
+
+    # 자동 지지/저항: 현재 캔들까지 확정된 피벗만 사용 (미래 캔들 미참조)
+    if st.checkbox("자동 지지/저항선", key="auto_levels"):
+        auto_support, auto_resistance = pivot_index(symbol).levels(start, end, current_price)
+        support_lines += level_lines(auto_support, "#90CAF9", "Auto S")
+        resistance_lines += level_lines(auto_resistance, "#EF9A9A", "Auto R")
+
+    trading_chart(
+        st.session_state.chart_sync,
+        chart_encoder,
+        start,
+        end,
+        markers,
+        support_lines + resistance_lines,
+        overlay,
+    )
 
-else:
-    # ▶️ Next Candle 버튼
-    if st.button("▶️ Next Candle", key="next_candle"):
-        st.session_state.current_step += 1
-        st.session_state.turn_count += 1
-
-        # 📌 지정가 진입 체크
-        if st.session_state.pending_entry is not None:
-            row = st.session_state.df_chart.iloc[
-                st.session_state.start_idx + st.session_state.current_step - 1
-            ]
-
-            limit_price = st.session_state.pending_entry["price"]
-            direction = st.session_state.pending_entry["dir"]
-
-            hit = False
-            if direction == "LONG" and row["low"] <= limit_price:
-                hit = True
-            if direction == "SHORT" and row["high"] >= limit_price:
-                hit = True
-
-            if hit:
-                open_position(
-                    direction,
-                    limit_price,
-                    st.session_state.balance * st.session_state.position_ratio,
-                    st.session_state.leverage,
-                    st.session_state.position_ratio
-                )
-                st.session_state.pending_entry = None
-
-        st.rerun()
-# =====================
-# 데이터 슬라이싱
-# =====================
-start = st.session_state.start_idx
-end = start + st.session_state.current_step
-df_view = st.session_state.df_chart.iloc[start:end]
-current_price = df_view["close"].iloc[-1]
-
-# =====================
-# 차트표시
-# =====================
-# HTML/JS 차트 렌더링
-df_reset = df_view.reset_index()
-
-candles = df_reset.apply(
-    lambda r: {
-        "time": int(pd.to_datetime(r["open_time"]).timestamp()),
-        "open": float(r["open"]),
-        "high": float(r["high"]),
-        "low": float(r["low"]),
-        "close": float(r["close"]),
-        "volume": float(r.get("volume", 0))
-    },
-    axis=1
-).tolist()
-
-markers = [
-    {
-        "time": m["time"],   # ✅ 그대로 사용
-        "position": "belowBar" if m["label"] == "LONG" else "aboveBar",
-        "color": m["color"],
-        "shape": "arrowUp" if m["label"] == "LONG" else "arrowDown",
-        "text": m["label"]
-    } for m in st.session_state.trade_markers
-]
+    # ----------------------
+    # 남은 턴수 표시
+    # ----------------------
+    st.markdown(
+        f"⏳ 남은 턴수: <span style='color:blue;font-weight:bold;'>{MAX_TURNS - engine.turn_count}</span> / {MAX_TURNS}",
+        unsafe_allow_html=True
+    )
 
-support_lines = [{"price": float(s), "color":"#2962FF","lineWidth":1,"lineStyle":2,"title":"Support"} for s in st.session_state.support_levels]
-resistance_lines = [{"price": float(r), "color":"#FF1744","lineWidth":1,"lineStyle":2,"title":"Resistance"} for r in st.session_state.resistance_levels]
-
-html_template = open("chart.html", encoding="utf-8").read()
-html_template = html_template.replace("__CANDLE_DATA__", json.dumps(candles))
-html_template = html_template.replace("__MARKER_DATA__", json.dumps(markers))
-html_template = html_template.replace("__SUPPORT_LINES__", json.dumps(support_lines))
-html_template = html_template.replace("__RESISTANCE_LINES__", json.dumps(resistance_lines))
-components.html(html_template, height=600)
-
-# ----------------------
-# 남은 턴수 표시
-# ----------------------
-st.markdown(
-    f"⏳ 남은 턴수: <span style='color:blue;font-weight:bold;'>{MAX_TURNS - st.session_state.turn_count}</span> / {MAX_TURNS}",
-    unsafe_allow_html=True
-)
+    # ----------------------
+    # 포지션 손익 계산 및 표시 (레버리지 반영)
+    # ----------------------
+    if engine.position is not None:
+        entry = engine.position.entry_price
+        amt = engine.position.entry_capital
+        lev = engine.leverage
+
+        price_change, profit_leveraged = engine.unrealized(current_price)
+        pnl_leveraged_pct = price_change * lev * 100
+
+        st.markdown(f"""
+        ### 📊 현재 포지션
+        - 포지션: **{engine.position.direction}**
+        - 진입가: **{entry:,.2f}**
+        - 현재가: **{current_price:,.2f}**
+        - 진입 금액: **${amt:,.2f}**
+        - 레버리지: **{lev}x**
+        - 손익률 (레버리지):
+          <span style="color:{'green' if pnl_leveraged_pct >= 0 else 'red'};">
+          **{pnl_leveraged_pct:+.2f}%**
+          </span>
+        - 예상 수익 (레버리지):
+          <span style="color:{'green' if profit_leveraged >= 0 else 'red'};">
+          **${profit_leveraged:+,.2f}**
+          </span>
+        """, unsafe_allow_html=True)
+
+    if fragment_only:
+        metrics.end(st.session_state, metrics_sink())
+
+# 자동 재생 속도는 사이드바 슬라이더(지난 rerun 값)를 쓴다
+autoplay_speed = st.session_state.get("autoplay_speed", 10)
+st.fragment(run_every=1 / autoplay_speed if st.session_state.autoplay else None)(replay_panel)()
 
 restore_performance()
 
-# ----------------------
-# 포지션 손익 계산 및 표시 (레버리지 반영)
-# ----------------------
-if st.session_state.position is not None:
-    entry = st.session_state.entry_price
-    amt = st.session_state.entry_capital
-    lev = st.session_state.leverage
-
-    if st.session_state.position == "LONG":
-        price_change = (current_price - entry) / entry
-    else:
-        price_change = (entry - current_price) / entry
-
-    pnl_leveraged_pct = price_change * lev * 100
-    profit_leveraged = amt * price_change * lev
-
-    st.markdown(f"""
-    ### 📊 현재 포지션
-    - 포지션: **{st.session_state.position}**
-    - 진입가: **{entry:,.2f}**
-    - 현재가: **{current_price:,.2f}**
-    - 진입 금액: **${amt:,.2f}**
-    - 레버리지: **{lev}x**
-    - 손익률 (레버리지):
-      <span style="color:{'green' if pnl_leveraged_pct >= 0 else 'red'};">
-      **{pnl_leveraged_pct:+.2f}%**
-      </span>
-    - 예상 수익 (레버리지):
-      <span style="color:{'green' if profit_leveraged >= 0 else 'red'};">
-      **${profit_leveraged:+,.2f}**
-      </span>
-    """, unsafe_allow_html=True)
+# 사이드바 청산 버튼은 전체 rerun 시점의 현재가를 쓴다
+current_price = engine.price
 
 
 # =====================
@@ -407,18 +511,21 @@ st.sidebar.subheader("⚙️ 거래 설정")
 # =====================
 # 🔧 💰 레버지리(사이드바)
 # =====================
-st.session_state.leverage = st.sidebar.slider("레버리지", 1, 100, st.session_state.leverage)
+engine.leverage = st.sidebar.slider("레버리지", 1, 100, engine.leverage)
+
+# ⏩ 자동 재생 속도 (리플레이 영역은 다음 rerun 부터 반영)
+st.sidebar.slider("자동 재생 속도 (캔들/초)", 1, 20, 10, key="autoplay_speed")
 
 # =====================
 # 🔧 💰 진입 비중(사이드바)
 # =====================
 st.sidebar.subheader("💰 진입 비중")
 
-st.session_state.position_ratio = st.sidebar.slider(
+engine.position_ratio = st.sidebar.slider(
     "잔고 대비 진입 비중 (%)",
     min_value=0,
     max_value=100,
-    value=int(st.session_state.position_ratio * 100),
+    value=int(engine.position_ratio * 100),
     step=5
 ) / 100
 
@@ -430,70 +537,65 @@ limit_dir = st.sidebar.selectbox("방향", ["LONG", "SHORT"])
 
 col1, col2 = st.sidebar.columns(2)
 if col1.button("지정가 진입"):
-    st.session_state.pending_entry = {
-        "price": limit_price,
-        "dir": limit_dir
-    }
+    engine.submit_order(limit_dir, limit_price)
 
 if col2.button("지정가 취소"):
-    st.session_state.pending_entry = None
-
-# =====================
-# ✅ 지정가 대기 상태 표시
-# =====================
-if st.session_state.pending_entry:
-    st.sidebar.info(
-        f"📌 지정가 대기중\n"
-        f"가격: {st.session_state.pending_entry['price']}\n"
-        f"방향: {st.session_state.pending_entry['dir']}"
-    )
-else:
-    st.sidebar.info("📌 지정가 대기 없음")
+    engine.cancel_order()
 
 st.sidebar.subheader("📤 지정가 청산")
 exit_price = st.sidebar.number_input("청산 가격", value=0.0, step=1.0)
 exit_ratio = st.sidebar.slider("청산 비율 (%)", 10, 100, 50)
 if st.sidebar.button("청산 등록"):
-    st.session_state.pending_exits.append({"price": exit_price, "ratio": exit_ratio/100})
+    if engine.submit_exit(exit_price, exit_ratio/100) is None:
+        st.sidebar.warning("보유 포지션이 없거나 가격이 올바르지 않습니다.")
+
+stop_price = st.sidebar.number_input("손절 가격", value=0.0, step=1.0)
+if st.sidebar.button("손절 등록"):
+    if engine.set_stop_loss(stop_price) is None:
+        st.sidebar.warning("보유 포지션이 없거나 가격이 올바르지 않습니다.")
+
+# =====================
+# ✅ 대기 주문 목록 (취소 가능)
+# =====================
+if len(engine.book):
+    st.sidebar.caption("📌 대기 주문")
+    for order in engine.book:
+        col1, col2 = st.sidebar.columns([3, 1])
+        if order.reduce_only:
+            label = "손절" if order.kind == "STOP" else f"청산 {int(round(order.ratio * 100))}%"
+        else:
+            label = f"{order.direction} 진입"
+        col1.write(f"{label} @ {order.price:,.2f}")
+        if col2.button("❌", key=f"cancel_order_{order.id}"):
+            engine.cancel_order(order.id)
+            rerun()
+else:
+    st.sidebar.info("📌 대기 주문 없음")
 # =====================
 # 즉시 진입(사이드바)
 # =====================
 st.sidebar.subheader("🚀 즉시 진입")
 
-if st.session_state.position is None:
-    capital = st.session_state.balance * st.session_state.position_ratio
-
+if engine.position is None:
     if st.sidebar.button("🟢 LONG 진입"):
-        open_position(
-            "LONG",
-            current_price,
-            capital,
-            st.session_state.leverage,
-            st.session_state.position_ratio
-        )
+        engine.submit_order("LONG")
 
     if st.sidebar.button("🔴 SHORT 진입"):
-        open_position(
-            "SHORT",
-            current_price,
-            capital,
-            st.session_state.leverage,
-            st.session_state.position_ratio
-        )
+        engine.submit_order("SHORT")
 else:
-    st.sidebar.success(f"보유 포지션: {st.session_state.position}")
+    st.sidebar.success(f"보유 포지션: {engine.position.direction}")
 
 # =====================
 # 진입후 포지션 청산 (사이드바)
 # =====================
-if st.session_state.position:
+if engine.position:
     st.sidebar.subheader("📤 포지션 청산")
 
     if st.sidebar.button("25% 청산"):
-        close_position(current_price, "25% EXIT")
+        close_position(current_price, "25% EXIT", 0.25)
 
     if st.sidebar.button("50% 청산"):
-        close_position(current_price, "50% EXIT")
+        close_position(current_price, "50% EXIT", 0.5)
 
     if st.sidebar.button("전체 청산"):
         close_position(current_price, "FULL EXIT")
@@ -531,7 +633,28 @@ for idx, support in enumerate(st.session_state.support_levels):
 
     if col2.button("❌", key=f"del_support_{idx}"):
         st.session_state.support_levels.pop(idx)
-        st.rerun()
+        rerun()
+
+st.sidebar.subheader("📏 저항선")
+
+new_resistance = st.sidebar.number_input(
+    "저항선 추가",
+    value=0.0,
+    step=1.0,
+    key="sidebar_resistance"
+)
+if st.sidebar.button("➕ 저항선 추가"):
+    if new_resistance > 0:
+        st.session_state.resistance_levels.append(new_resistance)
+
+for idx, resistance in enumerate(st.session_state.resistance_levels):
+    col1, col2 = st.sidebar.columns([3, 1])
+
+    col1.write(f"{resistance}")
+
+    if col2.button("❌", key=f"del_resistance_{idx}"):
+        st.session_state.resistance_levels.pop(idx)
+        rerun()
 
 # ===============================
 # 🔁 성과 초기화 + 새 매매 시작 버튼(사이드바)
@@ -546,33 +669,24 @@ if st.sidebar.button("🔄 성과 초기화 + 새 매매 시작"):
     st.session_state.SESSION_ID = new_session_id
     SESSION_ID = new_session_id
 
-    # 2️⃣ 기존 세션 DB 기록 삭제
-    supabase.table("trade_log").delete().eq(
-        "session_id", old_session_id
-    ).execute()
-
-    # 3️⃣ 랜덤 차트 시작 위치 초기화
-    st.session_state.start_idx = random.randint(
-        0, len(st.session_state.df_chart) - 300
+    # 2️⃣ 기존 세션 DB 기록 삭제 (전송 대기 중인 기록 포함)
+    # 전송 중인 묶음이 끝난 뒤에 지우고, 지우는 동안은 새 묶음을 보내지 않는다
+    with writer.paused():
+        writer.discard(old_session_id)
+        store.delete_trades(old_session_id)
+
+    # 3️⃣ 랜덤 차트 시작 위치 + 4️⃣ 포지션 + 5️⃣ 성과 초기화
+    st.session_state.engine = engine = Engine(
+        candles_store,
+        start_idx=draw_start(),
+        leverage=engine.leverage,
+        position_ratio=engine.position_ratio,
     )
-    st.session_state.current_step = 300
-    st.session_state.turn_count = 0
-    st.session_state.pending_entry = None
-    st.session_state.pending_exits = []
-    st.session_state.trade_markers = []
     st.session_state.support_levels = []
     st.session_state.resistance_levels = []
-
-    # 4️⃣ 포지션 초기화
-    reset_position()
-
-    # 5️⃣ 성과 초기화
-    st.session_state.balance = 1000.0
-    st.session_state.total_pnl = 0.0
-    st.session_state.trade_count = 0
-    st.session_state.win = 0
-    st.session_state.lose = 0
     st.session_state.performance_loaded = False
+    st.session_state.analytics = Analytics()
+    st.session_state.round_analytics = Analytics()
 
     st.success("✅ 성과가 초기화되고 새 매매를 시작합니다!")
 
@@ -582,36 +696,251 @@ if st.sidebar.button("🔄 성과 초기화 + 새 매매 시작"):
         unsafe_allow_html=True
     )
 
+# =====================
+# 📦 매매 기록 내보내기 / 가져오기 (사이드바)
+# =====================
+# trade_id keyset 페이지 단위로 임시 파일에 흘려 쓰므로 변환 중 메모리는 페이지 하나 + 결과 파일 크기다.
+# 파일은 다운로드 버튼을 누를 때(별도 스레드)만 만든다
+def export_file(fmt, session_id):
+    # 대기열을 비우지 못해도(원격 장애 등) 남은 행은 파일 끝에 붙인다. 대기 목록은 저장소보다 먼저 읽는다
+    writer = trade_writer()
+    pending = [] if writer.flush() else writer.pending(session_id)
+    return export_bytes(trade_store(), fmt, session_id, pending=pending)
+
+with st.sidebar.expander("📦 매매 기록 내보내기 / 가져오기"):
+    export_fmt = st.radio("형식", FORMATS, horizontal=True, key="export_format",
+                          format_func=lambda f: "Parquet (열 기반)" if f == PARQUET else "CSV")
+    st.download_button(
+        "⬇️ 이 세션 기록 다운로드",
+        data=lambda fmt=export_fmt, sid=SESSION_ID: export_file(fmt, sid),
+        file_name=f"trades_{SESSION_ID[:8]}.{export_fmt}",
+        mime=MIME_TYPES[export_fmt],
+        on_click="ignore",
+        key="export_download",
+    )
+    # 다른 세션에서 내보낸 파일도 이 세션 기록으로 옮겨 넣는다 (같은 파일을 다시 넣어도 중복 없음)
+    upload = st.file_uploader("기록 파일 가져오기", type=list(FORMATS), key="import_file")
+    if st.button("⬆️ 이 세션으로 가져오기", key="import_trades",
+                 disabled=upload is None or engine.position is not None):
+        with metrics.section("import_trades"):
+            trade_writer().flush()
+            count = import_trades(store, upload, guess_format(upload.name), SESSION_ID)
+        # 가져온 기록까지 포함해 잔고/통계를 다시 읽는다
+        st.session_state.performance_loaded = False
+        restore_performance()
+        st.success(f"✅ {count:,}건을 읽었습니다 (이미 있던 기록은 건너뜀)")
+
 # =====================
 # 🔹 누적 성과 표시 (확장판)
 # =====================
-total_trades = st.session_state.win + st.session_state.lose
-winrate = (st.session_state.win / total_trades * 100) if total_trades else 0
-
-# 📊 매매 평균 수익률 계산 (전체 / 승 / 패)
-def get_trade_return_stats():
-    df = load_trade_log_df()
-    if df.empty:
-        return 0.0, 0.0, 0.0
-    # 수익률 계산
-    df["return_pct"] = df["pnl_dollar"] / df["entry_capital"] * 100
-    overall_avg = df["return_pct"].mean()
-    win_avg = df[df["return_pct"] > 0]["return_pct"].mean() if not df[df["return_pct"] > 0].empty else 0.0
-    loss_avg = df[df["return_pct"] <= 0]["return_pct"].mean() if not df[df["return_pct"] <= 0].empty else 0.0
-    return overall_avg, win_avg, loss_avg
+acct = engine.account
+total_trades = acct.win + acct.lose
+winrate = (acct.win / total_trades * 100) if total_trades else 0
 
-avg_return, win_avg_return, loss_avg_return = get_trade_return_stats()
+# 📊 매매 평균 수익률 (전체 / 승 / 패) — 누적 합계에서 바로 계산
+with metrics.section("trade_stats"):
+    stats = st.session_state.analytics.stats
 
-st.markdown(f"""
+    st.markdown(f"""
 ## 📊 누적 성과
-- 승 : {st.session_state.win} / 패 : {st.session_state.lose}
+- 승 : {acct.win} / 패 : {acct.lose}
 - 승률: {winrate:.2f}%
-- 누적 손익: ${st.session_state.total_pnl:,.2f}
-- 매매 평균 수익률: {avg_return:+.2f}%
-- 🟢 승리 트레이드 평균 수익률: {win_avg_return:+.2f}%
-- 🔴 패배 트레이드 평균 손실률: {loss_avg_return:+.2f}%
+- 누적 손익: ${acct.total_pnl:,.2f}
+- 매매 평균 수익률: {stats.avg_return:+.2f}%
+- 🟢 승리 트레이드 평균 수익률: {stats.win_avg_return:+.2f}%
+- 🔴 패배 트레이드 평균 손실률: {stats.loss_avg_return:+.2f}%
+- 수익률 표준편차: {stats.return_std:.2f}%
 """)
 
 # 잔고 및 총 손익 표시
-st.metric("잔고", f"${st.session_state.balance:,.2f}")
-st.metric("총 손익", f"${st.session_state.total_pnl:,.2f}")
\ No newline at end of file
+st.metric("잔고", f"${acct.balance:,.2f}")
+st.metric("총 손익", f"${acct.total_pnl:,.2f}")
+
+# =====================
+# 📉 자산 곡선 / 리스크 (이번 라운드 / 전체)
+# =====================
+# 청산마다 누적 갱신한 값만 쓰고, 자산 곡선은 LTTB 로 최대 500점만 브라우저에 보낸다
+def show_analytics(analytics):
+    stats = analytics.stats
+    if not stats.count:
+        st.info("청산된 매매가 없습니다.")
+        return
+    c1, c2, c3, c4, c5 = st.columns(5)
+    c1.metric("최대 낙폭", f"{analytics.max_drawdown:.2f}%", f"현재 {-analytics.drawdown:.2f}%")
+    c2.metric("최장 낙폭 기간", f"{analytics.drawdown_trades} 회")
+    c3.metric("Sharpe (트레이드당)", f"{stats.sharpe:.2f}")
+    c4.metric("Sortino (트레이드당)", f"{stats.sortino:.2f}")
+    c5.metric("포지션 보유 시간", f"{analytics.exposure_hours:,.0f} h")
+
+    x, y = analytics.equity_points()
+    st.line_chart(pd.DataFrame({"잔고": y}, index=pd.Index(x, name="청산 번호")), height=220)
+
+    buckets = sorted(analytics.buckets.items(), key=lambda kv: int(kv[0].split("-")[0].rstrip("x+")))
+    st.dataframe(pd.DataFrame(
+        [
+            {"레버리지": name, "매매 수": b.count, "승률(%)": round(b.win_rate, 2),
+             "평균 수익률(%)": round(b.avg_return, 2), "손익($)": round(b.pnl_sum, 2)}
+            for name, b in buckets
+        ]
+    ), hide_index=True, width="stretch")
+
+with metrics.section("analytics"):
+    st.markdown("## 📉 자산 곡선 / 리스크")
+    tab_round, tab_all = st.tabs(["이번 라운드", "전체"])
+    with tab_round:
+        show_analytics(st.session_state.round_analytics)
+    with tab_all:
+        show_analytics(st.session_state.analytics)
+
+# =====================
+# 🏆 리더보드 (세션 간 비교)
+# =====================
+# trade_log 전체 대신 저장소의 session_summary(청산마다 트리거로 누적)에서 정렬된 한 페이지와
+# 내 순위만 읽는다. 모든 세션이 같은 페이지를 보므로 LEADERBOARD_TTL 초 동안 프로세스 전체에서 캐시한다
+LEADERBOARD_LABELS = {"total_pnl": "총 손익", "win_rate": "승률", "max_drawdown": "최대 낙폭"}
+LEADERBOARD_PAGE = 20
+LEADERBOARD_MIN_TRADES = 5
+LEADERBOARD_TTL = 30
+
+@st.cache_data(ttl=LEADERBOARD_TTL, show_spinner=False)
+def leaderboard_page(metric, page):
+    return store.leaderboard(metric, LEADERBOARD_PAGE, page * LEADERBOARD_PAGE, LEADERBOARD_MIN_TRADES)
+
+@st.cache_data(ttl=LEADERBOARD_TTL, show_spinner=False)
+def leaderboard_rank(session_id, metric):
+    return store.session_rank(session_id, metric, LEADERBOARD_MIN_TRADES)
+
+with st.expander("🏆 리더보드"):
+    # 펼쳐 볼 때만 저장소를 조회한다
+    if st.toggle("리더보드 불러오기", key="show_leaderboard"):
+        c1, c2 = st.columns([3, 1])
+        lb_metric = c1.radio(
+            "정렬 기준", list(LEADERBOARD_LABELS), horizontal=True, key="lb_metric",
+            format_func=LEADERBOARD_LABELS.get,
+        )
+        lb_page = c2.number_input("페이지", min_value=1, value=1, step=1, key="lb_page")
+
+        mine = leaderboard_rank(SESSION_ID, lb_metric)
+        if mine is None or mine["summary"]["trades"] < LEADERBOARD_MIN_TRADES:
+            st.info(f"청산 {LEADERBOARD_MIN_TRADES}회 이상부터 순위에 오릅니다 (저장소 전송 후 반영).")
+        else:
+            st.metric(
+                f"내 순위 ({LEADERBOARD_LABELS[lb_metric]})", f"{mine['rank']:,} / {mine['total']:,}",
+                f"상위 {mine['rank'] / mine['total'] * 100:.1f}%", delta_color="off",
+            )
+
+        rows = leaderboard_page(lb_metric, int(lb_page) - 1)
+        if not rows:
+            st.info("표시할 세션이 없습니다.")
+        else:
+            offset = (int(lb_page) - 1) * LEADERBOARD_PAGE
+            st.dataframe(pd.DataFrame(
+                [
+                    {"순위": offset + i + 1,
+                     "세션": r["session_id"][:8] + (" (나)" if r["session_id"] == SESSION_ID else ""),
+                     "매매 수": r["trades"], "총 손익($)": round(r["total_pnl"], 2),
+                     "승률(%)": round(r["win_rate"] * 100, 2), "최대 낙폭(%)": round(r["max_drawdown"] * 100, 2),
+                     "잔고($)": round(r["balance"], 2)}
+                    for i, r in enumerate(rows)
+                ]
+            ), hide_index=True, width="stretch")
+
+# =====================
+# 🎲 위험 분석 (몬테카를로)
+# =====================
+# 경로 계산은 프로세스 풀에서, 결과 대기는 백그라운드 스레드에서 하므로 rerun 스레드를 막지 않는다
+# 워커는 spawn 으로 띄우고(process_pool), 웹 서버와 코어를 나눠 쓰도록 MC_WORKERS(기본 2)개로 제한한다
+@st.cache_resource
+def analysis_pools():
+    workers = max(min(int(st.secrets.get("MC_WORKERS", 2)), os.cpu_count() or 1), 1)
+    return (
+        ThreadPoolExecutor(max_workers=2, thread_name_prefix="montecarlo"),
+        process_pool(workers),
+    )
+
+MC_LEVERAGES = [1, 2, 5, 10, 20, 25, 50, 75, 100]
+MC_RATIOS = [0.01, 0.05, 0.1, 0.25, 0.5, 1.0]
+
+with st.expander("🎲 위험 분석 (몬테카를로)"):
+    st.caption("이 세션의 실현 수익률을 레버리지 1배 기준으로 되돌려 다른 레버리지/비중으로 다시 굴려 봅니다.")
+    c1, c2 = st.columns(2)
+    mc_method = c1.radio(
+        "방식", METHODS, horizontal=True, key="mc_method",
+        format_func=lambda m: "부트스트랩 (복원 추출)" if m == BOOTSTRAP else "순서 섞기"
+    )
+    mc_paths = c2.select_slider("경로 수", [10_000, 50_000, 100_000], value=100_000, key="mc_paths")
+    leverage_options = sorted(set(MC_LEVERAGES) | {engine.leverage})
+    ratio_options = sorted(set(MC_RATIOS) | {engine.position_ratio})
+    mc_leverages = c1.multiselect(
+        "레버리지", leverage_options, default=sorted({1, engine.leverage, 100}), key="mc_leverages"
+    )
+    mc_ratios = c2.multiselect(
+        "진입 비중", ratio_options, default=[engine.position_ratio], key="mc_ratios",
+        format_func=lambda r: f"{r * 100:g}%"
+    )
+    mc_ruin = c1.number_input("파산 기준 (시작 잔고 대비 %)", 0.0, 99.0, RUIN_FRACTION * 100, 5.0, key="mc_ruin")
+    mc_seed = c2.number_input("시드", 0, 2**31 - 1, 0, key="mc_seed")
+
+    if st.button("🎲 시뮬레이션 실행", disabled=not (mc_leverages and mc_ratios)):
+        returns = base_returns(load_trade_rows(RETURN_COLUMNS))
+        if not len(returns):
+            st.warning("청산된 매매가 없습니다.")
+        else:
+            runner, workers = analysis_pools()
+            st.session_state.mc_job = runner.submit(
+                simulate, returns, mc_leverages, mc_ratios, mc_paths, None, mc_method,
+                ruin_fraction=mc_ruin / 100, seed=int(mc_seed), pool=workers,
+            )
+
+    mc_job = st.session_state.get("mc_job")
+    mc_running = mc_job is not None and not mc_job.done()
+
+    # 계산 중에는 이 영역만 0.5초마다 다시 그려 완료를 확인한다
+    def show_montecarlo():
+        if mc_job is None:
+            return
+        if not mc_job.done():
+            st.info("⏳ 계산 중…")
+            return
+        if mc_running:
+            # 폴링을 끝내기 위해 한 번 전체 rerun
+            rerun()
+        if mc_job.exception() is not None:
+            st.error(f"시뮬레이션 실패: {mc_job.exception()}")
+            return
+        result = mc_job.result()
+        summary = result["summary"]
+        st.caption(f"{result['paths']:,} 경로 × {result['horizon']} 거래 ({result['method']})")
+        st.dataframe(
+            summary.assign(
+                ruin_prob=summary.ruin_prob * 100,
+                position_ratio=summary.position_ratio * 100,
+                **{c: summary[c] * 100 for c in ("mdd_p50", "mdd_p90", "mdd_p99")},
+            ).rename(columns={
+                "leverage": "레버리지", "position_ratio": "비중(%)", "ruin_prob": "파산 확률(%)",
+                "mdd_p50": "낙폭 p50(%)", "mdd_p90": "낙폭 p90(%)", "mdd_p99": "낙폭 p99(%)",
+                "final_p5": "최종 p5", "final_p25": "최종 p25", "final_p50": "최종 p50",
+                "final_p75": "최종 p75", "final_p95": "최종 p95", "final_mean": "최종 평균",
+            }).round(2),
+            hide_index=True, width="stretch",
+        )
+        # 최종 잔고 분포 (조합 1개, 50구간 히스토그램만 전송)
+        pick = st.selectbox(
+            "최종 잔고 분포", summary.index,
+            format_func=lambda i: f"{summary.leverage[i]:g}x / {summary.position_ratio[i] * 100:g}%",
+            key="mc_pick",
+        )
+        counts, edges = np.histogram(result["final"][pick], bins=50)
+        st.bar_chart(pd.DataFrame({"경로 수": counts}, index=pd.Index(edges[:-1].round(0), name="최종 잔고")))
+
+    st.fragment(run_every=0.5 if mc_running else None)(show_montecarlo)()
+
+# =====================
+# 🛠 rerun 지표 (?debug=1 일 때만 사이드바에 표시)
+# =====================
+if METRICS_ENABLED:
+    record = metrics.end(st.session_state, metrics_sink())
+    if DEBUG:
+        with st.sidebar.expander("🛠 rerun 지표", expanded=False):
+            st.json(record)
+            st.code(metrics_sink().prometheus(), language="text")
\ No newline at end of file
@@ -0,0 +1,244 @@
+import argparse
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from engine import START_BALANCE
+from market_data import BIN_FILE, CSV_FILE, OHLCV_COLUMNS, CandleStore, load_binary, load_candles
+from orders import LONG, SHORT
+
+
+# =====================
+# 신호 → 체결 (전 구간 벡터 연산)
+# =====================
+def pair_signals(entries, exits):
+    """진입/청산 신호 배열에서 겹치지 않는 (진입 idx, 청산 idx) 쌍을 찾는다.
+
+    포지션이 없을 때의 첫 진입 신호에서 들어가고, 그 뒤 첫 청산 신호에서 나온다.
+    같은 캔들에 둘 다 있으면 청산이 우선한다. 끝까지 열려 있으면 마지막 캔들에서 청산한다.
+    """
+    entries = np.asarray(entries, dtype=bool)
+    exits = np.asarray(exits, dtype=bool)
+    n = len(entries)
+    if n == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+    # 마지막 이벤트(진입=1, 청산=0)를 forward-fill 해서 캔들별 보유 상태를 만든다
+    event = entries | exits
+    last = np.where(event, np.arange(n), -1)
+    np.maximum.accumulate(last, out=last)
+    state = np.where(last >= 0, entries[np.maximum(last, 0)] & ~exits[np.maximum(last, 0)], False)
+
+    change = np.diff(state.astype(np.int8), prepend=np.int8(0))
+    entry_idx = np.flatnonzero(change == 1)
+    exit_idx = np.flatnonzero(change == -1)
+    if len(exit_idx) < len(entry_idx):
+        exit_idx = np.append(exit_idx, n - 1)
+    return entry_idx, exit_idx
+
+
+def trade_returns(close, entry_idx, exit_idx, direction: str = LONG):
+    entry_price = close[entry_idx]
+    exit_price = close[exit_idx]
+    if direction == LONG:
+        return (exit_price - entry_price) / entry_price
+    return (entry_price - exit_price) / entry_price
+
+
+def apply_sizing(returns, leverage, position_ratio, balance: float = START_BALANCE):
+    """close_position 과 같은 복리 규칙: pnl = 잔고 × 비중 × 레버리지 × 수익률.
+
+    leverage / position_ratio 는 스칼라 또는 같은 길이의 1-D 배열이며,
+    배열이면 조합마다 한 행씩 (조합 수, 거래 수) 결과를 만든다. 잔고가 0 이하로
+    떨어지면 파산으로 보고 이후 거래는 0 으로 처리한다.
+    """
+    returns = np.asarray(returns, dtype=np.float64)
+    scale = np.atleast_1d(np.asarray(leverage, dtype=np.float64) * np.asarray(position_ratio, dtype=np.float64))
+    factor = np.maximum(1.0 + scale[:, None] * returns[None, :], 0.0)
+    balance_after = balance * np.cumprod(factor, axis=1)
+    balance_before = np.concatenate([np.full((len(scale), 1), balance), balance_after[:, :-1]], axis=1)
+    pnl = balance_after - balance_before
+    return pnl, balance_after
+
+
+def run_backtest(store, entries, exits, direction: str = LONG, leverage=5, position_ratio: float = 0.05,
+                 balance: float = START_BALANCE) -> dict:
+    """단일 백테스트. 거래별 체결/손익과 캔들별 실현 잔고 경로를 반환한다."""
+    close = np.asarray(store.close)
+    entry_idx, exit_idx = pair_signals(entries, exits)
+    returns = trade_returns(close, entry_idx, exit_idx, direction)
+    pnl, balance_after = apply_sizing(returns, leverage, position_ratio, balance)
+    pnl, balance_after = pnl[0], balance_after[0]
+
+    # 캔들별 실현 잔고: 청산 캔들부터 해당 거래 후 잔고
+    path = np.full(len(close), balance)
+    if len(exit_idx):
+        k = np.searchsorted(exit_idx, np.arange(len(close)), side="right") - 1
+        has = k >= 0
+        path[has] = balance_after[k[has]]
+
+    return {
+        "entry_idx": entry_idx,
+        "exit_idx": exit_idx,
+        "entry_price": close[entry_idx],
+        "exit_price": close[exit_idx],
+        "returns": returns,
+        "pnl": pnl,
+        "balance_after": balance_after,
+        "balance_path": path,
+        "trades": len(entry_idx),
+        "win": int((pnl > 0).sum()),
+        "lose": int((pnl <= 0).sum()),
+        "final_balance": float(balance_after[-1]) if len(balance_after) else balance,
+    }
+
+
+# =====================
+# 규칙 기반 전략 (진입/청산 신호 생성)
+# =====================
+def _sma(x, window: int):
+    c = np.cumsum(np.insert(np.asarray(x, dtype=np.float64), 0, 0.0))
+    out = np.full(len(x), np.nan)
+    if window <= len(x):
+        out[window - 1:] = (c[window:] - c[:-window]) / window
+    return out
+
+
+def sma_cross(store, fast: int, slow: int):
+    """빠른 이평이 느린 이평 위로 교차하면 진입, 아래로 교차하면 청산 (LONG 기준)."""
+    close = np.asarray(store.close)
+    above = _sma(close, fast) > _sma(close, slow)
+    prev = np.concatenate([[False], above[:-1]])
+    return above & ~prev, ~above & prev
+
+
+def breakout(store, window: int, exit_window: int):
+    """직전 window 캔들 고가 돌파 시 진입, 직전 exit_window 캔들 저가 이탈 시 청산."""
+    high = pd.Series(np.asarray(store.high))
+    low = pd.Series(np.asarray(store.low))
+    close = np.asarray(store.close)
+    upper = high.rolling(window).max().shift(1).to_numpy()
+    lower = low.rolling(exit_window).min().shift(1).to_numpy()
+    return close > upper, close < lower
+
+
+STRATEGIES = {
+    "sma_cross": sma_cross,
+    "breakout": breakout,
+}
+
+
+# =====================
+# 파라미터 스윕 (프로세스 풀)
+# =====================
+_worker_store = None
+
+
+def _init_worker(bin_path, columns):
+    # 바이너리 파일이 있으면 워커마다 memory-map 해서 OS 페이지 캐시를 공유하고,
+    # 없으면 받은 컬럼 배열로 저장소를 다시 만든다 (저장소 객체 자체는 보내지 않는다)
+    global _worker_store
+    _worker_store = load_binary(bin_path) if bin_path else CandleStore(**columns)
+
+
+def _sweep_chunk(strategy: str, param_sets: list, direction: str, leverage, position_ratio, balance):
+    store = _worker_store
+    close = np.asarray(store.close)
+    rows = []
+    for params in param_sets:
+        entries, exits = STRATEGIES[strategy](store, **params)
+        entry_idx, exit_idx = pair_signals(entries, exits)
+        returns = trade_returns(close, entry_idx, exit_idx, direction)
+        # 레버리지 × 비중 조합은 한 번의 브로드캐스트로 계산한다
+        pnl, balance_after = apply_sizing(returns, leverage, position_ratio, balance)
+        n = len(returns)
+        if n:
+            peak = np.maximum.accumulate(np.concatenate([np.full((len(leverage), 1), balance), balance_after], axis=1), axis=1)
+            mdd = ((peak[:, 1:] - balance_after) / peak[:, 1:]).max(axis=1)
+            final = balance_after[:, -1]
+            wins = (pnl > 0).sum(axis=1)
+        else:
+            mdd = np.zeros(len(leverage))
+            final = np.full(len(leverage), balance)
+            wins = np.zeros(len(leverage), dtype=int)
+        for j in range(len(leverage)):
+            rows.append({
+                **params,
+                "leverage": leverage[j],
+                "position_ratio": position_ratio[j],
+                "trades": n,
+                "win": int(wins[j]),
+                "lose": n - int(wins[j]),
+                "final_balance": float(final[j]),
+                "total_pnl": float(final[j] - balance),
+                "max_drawdown": float(mdd[j]),
+            })
+    return rows
+
+
+def sweep(strategy: str, param_grid: dict, leverages, position_ratios, direction: str = LONG,
+          store=None, bin_path: str = None, balance: float = START_BALANCE,
+          max_workers: int = None, chunk_size: int = 8) -> pd.DataFrame:
+    """leverage × position_ratio × 전략 파라미터 그리드를 프로세스 풀로 나눠 백테스트한다."""
+    global _worker_store
+    if store is None and bin_path is None:
+        bin_path = BIN_FILE
+        load_candles(CSV_FILE, BIN_FILE)
+
+    names = list(param_grid)
+    param_sets = [dict(zip(names, values)) for values in itertools.product(*param_grid.values())]
+    combos = list(itertools.product(leverages, position_ratios))
+    leverage = np.array([c[0] for c in combos], dtype=np.float64)
+    position_ratio = np.array([c[1] for c in combos], dtype=np.float64)
+
+    chunks = [param_sets[i:i + chunk_size] for i in range(0, len(param_sets), chunk_size)]
+    max_workers = max_workers or os.cpu_count() or 1
+    rows = []
+    if max_workers == 1:
+        _worker_store = load_binary(bin_path) if bin_path else store
+        for chunk in chunks:
+            rows.extend(_sweep_chunk(strategy, chunk, direction, leverage, position_ratio, balance))
+    else:
+        # spawn/forkserver 워커에는 경로나 NumPy 컬럼만 넘긴다 (ChunkedStore 같은 저장소도 배열로 읽어 보낸다)
+        columns = None if bin_path else {
+            name: np.asarray(getattr(store, name)) for name in ("open_time", *OHLCV_COLUMNS)
+        }
+        with ProcessPoolExecutor(max_workers, initializer=_init_worker, initargs=(bin_path, columns)) as pool:
+            futures = [
+                pool.submit(_sweep_chunk, strategy, chunk, direction, leverage, position_ratio, balance)
+                for chunk in chunks
+            ]
+            for future in futures:
+                rows.extend(future.result())
+
+    df = pd.DataFrame(rows)
+    if not df.empty:
+        df = df.sort_values("final_balance", ascending=False, ignore_index=True)
+    return df
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Full-history backtest parameter sweep.")
+    parser.add_argument("--strategy", choices=sorted(STRATEGIES), default="sma_cross")
+    parser.add_argument("--direction", choices=[LONG, SHORT], default=LONG)
+    parser.add_argument("--a", type=int, nargs="+", default=[5, 10, 20, 30, 50],
+                        help="sma_cross: fast / breakout: window")
+    parser.add_argument("--b", type=int, nargs="+", default=[50, 100, 150, 200],
+                        help="sma_cross: slow / breakout: exit_window")
+    parser.add_argument("--leverage", type=float, nargs="+", default=[1, 2, 5, 10, 20])
+    parser.add_argument("--ratio", type=float, nargs="+", default=[0.05, 0.1, 0.25, 0.5])
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    keys = ("fast", "slow") if args.strategy == "sma_cross" else ("window", "exit_window")
+    df = sweep(args.strategy, {keys[0]: args.a, keys[1]: args.b}, args.leverage, args.ratio,
+               direction=args.direction, max_workers=args.workers)
+    print(df.head(args.top).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
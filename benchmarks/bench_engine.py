@@ -0,0 +1,69 @@
+"""헤드리스 엔진 처리량: 전체 히스토리를 스크립트 주문으로 리플레이한다.
+
+    python benchmarks/bench_engine.py [--replays 20] [--synthetic N] [--intrabar]
+
+--intrabar 는 합성 1분봉(N×60)에서 1시간봉을 만들어 MinuteIndex 체결 경로로 리플레이한다.
+"""
+import argparse
+import time
+
+from common import aggregate, synthetic_store
+
+from engine import Engine
+from intrabar import MinuteIndex
+from market_data import load_candles
+from orders import LONG, SHORT
+
+
+def replay(store, hold: int = 12, every: int = 24, intrabar=None):
+    # 24캔들마다 종가 ±0.5% 지정가를 걸고, 체결 후 12캔들 보유 뒤 청산
+    engine = Engine(store, start_idx=0, current_step=1, leverage=10, position_ratio=0.1, intrabar=intrabar)
+    trades = []
+    held = 0
+    for i in range(len(store) - 1):
+        engine.step()
+        if engine.position is not None:
+            held += 1
+            if held >= hold:
+                trades.append(engine.close(reason="SCRIPT EXIT"))
+                held = 0
+        elif i % every == 0:
+            engine.cancel_order()
+            price = engine.price
+            if (i // every) % 2:
+                engine.submit_order(LONG, price * 0.995)
+            else:
+                engine.submit_order(SHORT, price * 1.005)
+    return engine, trades
+
+
+def run(store, replays: int, intrabar=None):
+    replay(store, intrabar=intrabar)  # 워밍업
+    t0 = time.perf_counter()
+    for _ in range(replays):
+        engine, trades = replay(store, intrabar=intrabar)
+    elapsed = (time.perf_counter() - t0) / replays
+
+    candles = len(store) - 1
+    print(f"candles/replay : {candles}")
+    print(f"trades/replay  : {len(trades)}")
+    print(f"final balance  : {engine.account.balance:,.2f}")
+    print(f"ms/replay      : {elapsed * 1e3:.2f}")
+    print(f"candles/s      : {candles / elapsed:,.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--replays", type=int, default=20)
+    parser.add_argument("--synthetic", type=int, default=0, help="btc_1h 대신 N개 합성 캔들 사용")
+    parser.add_argument("--intrabar", action="store_true", help="합성 1분봉으로 봉 안 체결 순서 결정")
+    args = parser.parse_args()
+    if args.intrabar:
+        minutes = synthetic_store((args.synthetic or 8760) * 60, step_ms=60_000, vol=0.01 / 60 ** 0.5)
+        hours = aggregate(minutes, 60)
+        t0 = time.perf_counter()
+        index = MinuteIndex(hours, minutes)
+        print(f"index build    : {(time.perf_counter() - t0) * 1e3:.2f} ms")
+        run(hours, args.replays, index)
+    else:
+        run(synthetic_store(args.synthetic) if args.synthetic else load_candles(), args.replays)
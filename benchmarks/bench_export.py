@@ -0,0 +1,111 @@
+"""trade_log 내보내기/가져오기: keyset 페이지 스트리밍 vs 전체를 DataFrame 으로 읽는 방식.
+
+    python benchmarks/bench_export.py [--rows 1000000] [--page-size 10000]
+
+단계마다 새 프로세스에서 실행해 그 단계의 최대 RSS 를 따로 잰다.
+download 단계는 앱 다운로드 버튼과 같은 경로(export_bytes → streamlit 변환)가 동작하는지도 확인한다.
+"""
+import argparse
+import multiprocessing as mp
+import os
+import resource
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import common  # noqa: F401  (저장소 루트를 sys.path 에 추가)
+
+from streamlit.runtime.download_data_util import convert_data_to_bytes_and_infer_mime
+
+from storage import SQLiteTradeStore
+from trade_export import CSV, PARQUET, SCHEMA, export_bytes, export_trades, import_trades
+
+SESSIONS = 1000
+
+
+def make_parquet(path: str, rows: int):
+    rng = np.random.default_rng(0)
+    pnl = rng.normal(0.0, 20.0, rows)
+    session = rng.integers(0, SESSIONS, rows)
+    table = pa.table({
+        "trade_id": np.arange(1, rows + 1),
+        "session_id": [f"session-{s:04d}" for s in session],
+        "idempotency_key": [f"k{i}" for i in range(rows)],
+        "entry_time": ["2024-01-01T00:00:00"] * rows,
+        "exit_time": ["2024-01-01T05:00:00"] * rows,
+        "play_hours": np.full(rows, 5.0),
+        "direction": np.where(pnl > 0, "LONG", "SHORT"),
+        "entry_price": np.full(rows, 40_000.0),
+        "exit_price": 40_000.0 + pnl,
+        "leverage": np.full(rows, 10.0),
+        "position_ratio": np.full(rows, 10),
+        "entry_capital": np.full(rows, 100.0),
+        "pnl_dollar": pnl,
+        "balance_after": 1000.0 + pnl,
+        "reason": ["SCRIPT EXIT"] * rows,
+    }, schema=SCHEMA)
+    pq.write_table(table, path, row_group_size=50_000)
+
+
+def download(db: str, fmt: str):
+    # 앱 다운로드 버튼의 지연 data 경로: 반환값을 streamlit 이 파일 내용으로 바꿀 수 있어야 한다
+    data = export_bytes(SQLiteTradeStore(db), fmt)
+    payload, _ = convert_data_to_bytes_and_infer_mime(data, TypeError(f"unsupported download type {type(data)}"))
+    return len(payload)
+
+
+def naive_export(db: str, out: str):
+    # 기존 방식: 전체 행을 한 번에 DataFrame 으로
+    store = SQLiteTradeStore(db)
+    frame = pd.read_sql_query("SELECT * FROM trade_log ORDER BY trade_id", store._conn)
+    frame.to_csv(out, index=False)
+    return len(frame)
+
+
+def phase(result, fn, *args):
+    t0 = time.perf_counter()
+    count = fn(*args)
+    result.put((time.perf_counter() - t0, count, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024))
+
+
+def run_phase(name: str, fn, *args):
+    result = mp.Queue()
+    proc = mp.Process(target=phase, args=(result, fn, *args))
+    proc.start()
+    seconds, count, rss = result.get()
+    proc.join()
+    rate = f"{count / seconds:12,.0f} rows/s" if count else ""
+    print(f"{name:<26} {seconds:8.2f} s {rate}  max RSS {rss:8.1f} MB")
+
+
+def run(rows: int, page_size: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, "source.parquet")
+        db = os.path.join(tmp, "trades.sqlite3")
+        run_phase("generate parquet", make_parquet, source, rows)
+        run_phase("import parquet", lambda: import_trades(SQLiteTradeStore(db), source, PARQUET))
+        for fmt in (CSV, PARQUET):
+            out = os.path.join(tmp, f"export.{fmt}")
+            run_phase(f"export {fmt}", lambda fmt=fmt, out=out: export_trades(SQLiteTradeStore(db), out, fmt,
+                                                                              page_size=page_size))
+            print(f"{'':<26} {os.path.getsize(out) / 1e6:8.1f} MB on disk")
+            t0 = time.perf_counter()
+            size = download(db, fmt)
+            print(f"{f'download {fmt} (bytes)':<26} {time.perf_counter() - t0:8.2f} s {size / 1e6:12.1f} MB")
+        run_phase("naive export csv (pandas)", naive_export, db, os.path.join(tmp, "naive.csv"))
+        csv_db = os.path.join(tmp, "restore.sqlite3")
+        run_phase("import csv", lambda: import_trades(SQLiteTradeStore(csv_db), os.path.join(tmp, "export.csv"), CSV))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--page-size", type=int, default=10_000)
+    args = parser.parse_args()
+    # 단계별 RSS 를 따로 재기 위해 fork 로 자식 프로세스를 띄운다 (람다 전달)
+    mp.set_start_method("fork")
+    run(args.rows, args.page_size)
@@ -0,0 +1,70 @@
+"""리더보드: 트리거로 갱신되는 session_summary vs 전체 trade_log 를 pandas 로 집계하는 방식.
+
+    python benchmarks/bench_leaderboard.py [--trades 1000000] [--sessions 20000]
+
+trades 개 청산 기록을 sessions 개 세션에 나눠 넣고(트리거 켠 채 배치 insert),
+상위 20개 페이지 / 내 순위 조회 / 일괄 rollup 시간을 잰다.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from common import fmt_ms, timeit
+
+from storage import SQLiteTradeStore
+
+BATCH = 10_000
+
+
+def trade_batches(trades: int, sessions: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    session = rng.integers(0, sessions, trades)
+    pnl = rng.normal(0.0, 20.0, trades)
+    balance = np.full(sessions, 1000.0)
+    for lo in range(0, trades, BATCH):
+        rows = []
+        for i in range(lo, min(lo + BATCH, trades)):
+            s = session[i]
+            balance[s] += pnl[i]
+            rows.append({
+                "session_id": f"session-{s:06d}", "idempotency_key": f"k{i}",
+                "pnl_dollar": float(pnl[i]), "balance_after": float(balance[s]),
+            })
+        yield rows
+
+
+def run(trades: int, sessions: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SQLiteTradeStore(os.path.join(tmp, "trades.sqlite3"))
+        t0 = time.perf_counter()
+        for rows in trade_batches(trades, sessions):
+            store.insert_trades(rows)
+        elapsed = time.perf_counter() - t0
+        print(f"insert (trigger)        {elapsed:10.2f} s  ({trades / elapsed:,.0f} trades/s)")
+
+        me = "session-000000"
+        print(f"leaderboard top 20      {fmt_ms(timeit(lambda: store.leaderboard('total_pnl', 20)))}")
+        print(f"leaderboard page 50     {fmt_ms(timeit(lambda: store.leaderboard('win_rate', 20, 1000, 5)))}")
+        print(f"session_rank            {fmt_ms(timeit(lambda: store.session_rank(me, 'max_drawdown')))}")
+
+        # 기존 방식: 전체 행을 읽어 pandas 로 집계
+        def naive():
+            frame = pd.read_sql_query("SELECT session_id, pnl_dollar FROM trade_log", store._conn)
+            return frame.groupby("session_id").pnl_dollar.sum().nlargest(20)
+        print(f"naive pandas top 20     {fmt_ms(timeit(naive, repeat=1))}")
+
+        store._conn.execute("DELETE FROM session_summary")
+        print(f"rollup (all sessions)   {fmt_ms(timeit(store.rollup_summaries, repeat=1))}")
+        print(f"rollup (nothing stale)  {fmt_ms(timeit(store.rollup_summaries, repeat=1))}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--trades", type=int, default=1_000_000)
+    parser.add_argument("--sessions", type=int, default=20_000)
+    args = parser.parse_args()
+    run(args.trades, args.sessions)
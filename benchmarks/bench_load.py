@@ -0,0 +1,397 @@
+"""동시 세션 부하 테스트: 실제 streamlit 서버 1개에 N 개 헤드리스 클라이언트가 클릭 스크립트를 돌린다.
+
+    python benchmarks/bench_load.py [--sessions 1 50 500] [--actions 30] [--think 1.0] [--latency 0.02]
+                                    [--save load.json]
+
+클라이언트는 브라우저처럼 /_stcore/stream websocket 으로 BackMsg(rerun_script) 를 보내고
+script_finished 까지의 ForwardMsg 를 받는다 (fragment 안 위젯은 fragment_id 를 붙여 부분 rerun).
+저장소는 로컬 SQLite 이고 --latency 초만큼 호출마다 지연을 넣어 원격 왕복을 흉내낸다.
+
+- 지연: 클릭 → script_finished 까지 (동작별 p50/p95/p99)
+- 메모리: 서버 프로세스 RSS. 세션 1개로 캐시를 데운 뒤를 기준으로 (최대 RSS - 기준) / N
+- 원격 호출: 앱의 rerun 계측(?metrics_id=)에서 동작별 동기 호출 수, write-behind 전송 묶음 수
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from collections import defaultdict
+
+import websockets
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+from common import ROOT_DIR
+
+APP = os.path.join(ROOT_DIR, "app.py")
+# script_finished 상태: 0 전체 rerun 완료, 1 컴파일 오류, 2 st.rerun() 으로 중단, 3 fragment rerun 완료
+RUN_DONE = {0, 1, 3}
+FRAGMENT_DONE = 3
+CONNECT_TIMEOUT = 120.0
+
+
+# =====================
+# 서버 (세션 수마다 새 프로세스 + 새 저장소)
+# =====================
+class Server:
+    def __init__(self, port: int, latency: float):
+        self.port = port
+        self.dir = tempfile.TemporaryDirectory()
+        root = self.dir.name
+        self.metrics_file = os.path.join(root, "metrics.jsonl")
+        self.prom_file = os.path.join(root, "metrics.prom")
+        os.makedirs(os.path.join(root, ".streamlit"))
+        secrets = {
+            "STORAGE_BACKEND": "sqlite",
+            "SQLITE_PATH": os.path.join(root, "trades.sqlite3"),
+            "SQLITE_LATENCY": latency,
+            "QUEUE_FILE": os.path.join(root, "trade_queue.sqlite3"),
+            "DATA_DIR": os.path.join(root, "data"),
+            "METRICS": True,
+            "METRICS_FILE": self.metrics_file,
+            "METRICS_PROM_FILE": self.prom_file,
+            "METRICS_PROM_INTERVAL": 1.0,
+        }
+        with open(os.path.join(root, ".streamlit", "secrets.toml"), "w", encoding="utf-8") as f:
+            f.writelines(f"{k} = {json.dumps(v)}\n" for k, v in secrets.items())
+        self.log = open(os.path.join(root, "server.log"), "w")
+        self.proc = subprocess.Popen(
+            [sys.executable, "-m", "streamlit", "run", APP, "--server.headless=true", f"--server.port={port}",
+             "--server.fileWatcherType=none", "--browser.gatherUsageStats=false"],
+            cwd=root, stdout=self.log, stderr=subprocess.STDOUT,
+        )
+        self.url = f"ws://127.0.0.1:{port}/_stcore/stream"
+
+    def wait_ready(self, timeout: float = 60.0):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.proc.poll() is not None:
+                raise RuntimeError(f"server exited with {self.proc.returncode}")
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{self.port}/_stcore/health", timeout=1) as res:
+                    if res.status == 200:
+                        return
+            except OSError:
+                time.sleep(0.2)
+        raise TimeoutError("server did not become healthy")
+
+    def rss_mb(self) -> float:
+        with open(f"/proc/{self.proc.pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+        return math.nan
+
+    def prom_value(self, name: str) -> float:
+        try:
+            with open(self.prom_file) as f:
+                for line in f:
+                    if line.startswith(f"trading_sim_{name} "):
+                        return float(line.split()[1])
+        except OSError:
+            pass
+        return math.nan
+
+    def records(self) -> dict:
+        by_session = defaultdict(list)
+        with open(self.metrics_file, encoding="utf-8") as f:
+            for line in f:
+                record = json.loads(line)
+                by_session[record["session"]].append(record)
+        return by_session
+
+    def stop(self):
+        self.proc.terminate()
+        try:
+            self.proc.wait(10)
+        except subprocess.TimeoutExpired:
+            self.proc.kill()
+        self.log.close()
+        self.dir.cleanup()
+
+
+# =====================
+# 헤드리스 클라이언트 (브라우저 탭 1개)
+# =====================
+class Client:
+    def __init__(self, url: str, name: str):
+        self.url = url
+        self.name = name
+        self.ws = None
+        self.widgets = {}   # label 또는 key → (widget id, fragment id)
+        self.price = None
+        self.actions = []   # (동작, 초, 받은 바이트)
+
+    async def connect(self):
+        # 포화된 서버는 핸드셰이크/ping 응답이 늦다. 브라우저처럼 끊지 않고 기다린다
+        self.ws = await websockets.connect(self.url, subprotocols=["streamlit"], max_size=None,
+                                           open_timeout=CONNECT_TIMEOUT, ping_interval=None)
+
+    async def close(self):
+        if self.ws is not None:
+            await self.ws.close()
+
+    def _collect(self, msg: ForwardMsg, seen: dict):
+        delta = msg.delta
+        if delta.WhichOneof("type") != "new_element":
+            return
+        element = delta.new_element
+        kind = element.WhichOneof("type")
+        body = getattr(element, kind)
+        if kind == "exception":
+            raise RuntimeError(f"{body.type}: {body.message}")
+        widget_id = getattr(body, "id", "")
+        if widget_id:
+            entry = (widget_id, delta.fragment_id)
+            seen[getattr(body, "label", "") or widget_id] = entry
+            # key 가 있는 위젯은 id 끝이 "-<key>"
+            key = widget_id.rsplit("-", 1)[-1]
+            if key != "None":
+                seen[f"key:{key}"] = entry
+        if kind == "component_instance":
+            # 차트가 받은 마지막 종가 (지정가 주문 가격 계산용)
+            update = json.loads(body.json_args or "{}").get("update") or {}
+            if update.get("candles"):
+                close = json.loads(update["candles"]).get("close")
+                if close:
+                    self.price = close[-1]
+
+    async def rerun(self, name: str, states=(), fragment: str = ""):
+        back = BackMsg()
+        state = back.rerun_script
+        state.query_string = f"metrics_id={self.name}"
+        state.page_script_hash = ""
+        state.fragment_id = fragment
+        state.widget_states.widgets.extend(states)
+
+        t0 = time.perf_counter()
+        await self.ws.send(back.SerializeToString())
+        received = 0
+        seen = {}
+        while True:
+            raw = await self.ws.recv()
+            received += len(raw)
+            msg = ForwardMsg.FromString(raw)
+            kind = msg.WhichOneof("type")
+            if kind == "new_session":
+                # st.rerun() 으로 다시 시작한 run 이면 앞 run 의 위젯은 버린다
+                seen = {}
+            elif kind == "delta":
+                self._collect(msg, seen)
+            elif kind == "script_finished" and msg.script_finished in RUN_DONE:
+                break
+        elapsed = time.perf_counter() - t0
+
+        if msg.script_finished == FRAGMENT_DONE:
+            self.widgets = {k: v for k, v in self.widgets.items() if v[1] != fragment}
+            self.widgets.update(seen)
+        else:
+            self.widgets = seen
+        self.actions.append((name, elapsed, received))
+        return elapsed
+
+    def has(self, label: str) -> bool:
+        return label in self.widgets
+
+    async def click(self, name: str, label: str):
+        widget_id, fragment = self.widgets[label]
+        return await self.rerun(name, [WidgetState(id=widget_id, trigger_value=True)], fragment)
+
+    async def set_number(self, name: str, label: str, value: float):
+        widget_id, fragment = self.widgets[label]
+        return await self.rerun(name, [WidgetState(id=widget_id, double_value=value)], fragment)
+
+
+# =====================
+# 클릭 스크립트
+# =====================
+async def step(client: Client, rng: random.Random):
+    """현재 화면에 보이는 버튼으로 다음 동작 하나 (지정가 진입은 가격 입력 + 클릭 2 rerun)."""
+    roll = rng.random()
+    if client.has("🔁 새 매매 시작"):
+        await client.click("new_round", "🔁 새 매매 시작")
+    elif roll < 0.005:
+        await client.click("reset", "🔄 성과 초기화 + 새 매매 시작")
+    elif client.has("전체 청산"):
+        if roll < 0.15:
+            await client.click("exit", "전체 청산" if roll < 0.1 else "50% 청산")
+        else:
+            await client.click("next_candle", "key:next_candle")
+    elif client.has("❌"):
+        if roll < 0.05:
+            await client.click("cancel_order", "지정가 취소")
+        else:
+            await client.click("next_candle", "key:next_candle")
+    elif roll < 0.15 and client.price:
+        await client.set_number("limit_price", "지정가 가격", round(client.price * rng.uniform(0.995, 0.999), 2))
+        await client.click("limit_entry", "지정가 진입")
+    elif roll < 0.22:
+        await client.click("market_entry", rng.choice(["🟢 LONG 진입", "🔴 SHORT 진입"]))
+    else:
+        await client.click("next_candle", "key:next_candle")
+
+
+async def drive(client: Client, actions: int, think: float, delay: float, seed: int, errors: list):
+    rng = random.Random(seed)
+    await asyncio.sleep(delay)
+    try:
+        await client.connect()
+        await client.rerun("load")
+        while len(client.actions) <= actions:
+            await asyncio.sleep(max(rng.expovariate(1 / think), 0.05) if think else 0)
+            await step(client, rng)
+    except Exception as e:  # noqa: BLE001 - 실패도 결과로 보고한다
+        errors.append(f"{client.name}: {e!r}")
+    finally:
+        await client.close()
+
+
+async def sample_rss(server: Server, peak: list, stop: asyncio.Event):
+    while not stop.is_set():
+        peak[0] = max(peak[0], server.rss_mb())
+        await asyncio.sleep(0.2)
+
+
+async def run_load(server: Server, sessions: int, actions: int, think: float, ramp: float, tag: str):
+    clients = [Client(server.url, f"{tag}-{i}") for i in range(sessions)]
+    errors = []
+    peak = [0.0]
+    stop = asyncio.Event()
+    sampler = asyncio.create_task(sample_rss(server, peak, stop))
+    t0 = time.perf_counter()
+    await asyncio.gather(*(
+        drive(c, actions, think, ramp * i / max(sessions, 1), i, errors) for i, c in enumerate(clients)
+    ))
+    elapsed = time.perf_counter() - t0
+    stop.set()
+    await sampler
+    return clients, errors, peak[0], elapsed
+
+
+# =====================
+# 집계
+# =====================
+def percentile(values, q: float) -> float:
+    if not values:
+        return math.nan
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+
+def join_records(clients, records: dict):
+    """클라이언트 동작 순서와 그 세션의 rerun 기록을 맞춘다 (st.rerun 으로 끊긴 기록은 다음 기록에 합친다)."""
+    calls = defaultdict(lambda: defaultdict(int))
+    server_ms = defaultdict(list)
+    matched = 0
+    for client in clients:
+        merged = []
+        pending = defaultdict(int)
+        wall = 0.0
+        for record in records.get(client.name, []):
+            for k, v in record["calls"].items():
+                pending[k] += v
+            wall += record["wall_ms"]
+            if record["status"] != "rerun":
+                merged.append((dict(pending), wall))
+                pending = defaultdict(int)
+                wall = 0.0
+        if len(merged) != len(client.actions):
+            continue
+        matched += 1
+        for (name, _, _), (counts, wall) in zip(client.actions, merged):
+            calls[name]["_actions"] += 1
+            server_ms[name].append(wall)
+            for k, v in counts.items():
+                calls[name][k] += v
+    return calls, server_ms, matched
+
+
+def report(sessions: int, clients, errors, base_rss: float, peak_rss: float, elapsed: float, server: Server) -> dict:
+    by_action = defaultdict(list)
+    payload = defaultdict(list)
+    for client in clients:
+        for name, seconds, received in client.actions:
+            by_action[name].append(seconds * 1e3)
+            payload[name].append(received)
+    every = [v for values in by_action.values() for v in values]
+    calls, server_ms, matched = join_records(clients, server.records())
+    server_ms["all"] = [v for values in server_ms.values() for v in values]
+    payload["all"] = [v for values in payload.values() for v in values]
+    batches = server.prom_value("trade_writer_batches")
+
+    print(f"\n== sessions={sessions}  actions={len(every)}  errors={len(errors)}  "
+          f"{elapsed:.1f} s  ({len(every) / elapsed:.1f} actions/s)")
+    print(f"{'action':<14} {'count':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'server p50':>11} "
+          f"{'KB/rerun':>9}  remote calls/action")
+    rows = {}
+    for name in sorted(by_action, key=lambda n: -len(by_action[n])) + ["all"]:
+        values = every if name == "all" else by_action[name]
+        action_calls = calls.get(name, {})
+        n = action_calls.get("_actions", 0)
+        per_action = {k: v / n for k, v in action_calls.items() if k != "_actions"} if n else {}
+        rows[name] = {
+            "count": len(values),
+            "p50_ms": percentile(values, 0.5),
+            "p95_ms": percentile(values, 0.95),
+            "p99_ms": percentile(values, 0.99),
+            "server_p50_ms": percentile(server_ms.get(name, []), 0.5),
+            "kb_per_rerun": sum(payload[name]) / max(len(payload[name]), 1) / 1024,
+            "calls_per_action": per_action,
+        }
+        r = rows[name]
+        print(f"{name:<14} {r['count']:>6} {r['p50_ms']:9.1f} {r['p95_ms']:9.1f} {r['p99_ms']:9.1f} "
+              f"{r['server_p50_ms']:11.1f} {r['kb_per_rerun']:9.1f}  "
+              + ", ".join(f"{k} {v:.2f}" for k, v in sorted(per_action.items())))
+    per_session = (peak_rss - base_rss) / sessions
+    print(f"RSS base {base_rss:.1f} MB, peak {peak_rss:.1f} MB → {per_session:.2f} MB/session")
+    print(f"write-behind insert batches: {batches:.0f} ({batches / max(len(every), 1):.3f}/action); "
+          f"records matched for {matched}/{len(clients)} sessions")
+    for line in errors[:5]:
+        print(f"  error: {line}")
+    return {
+        "sessions": sessions, "elapsed_s": elapsed, "errors": len(errors), "actions": rows,
+        "rss_base_mb": base_rss, "rss_peak_mb": peak_rss, "rss_per_session_mb": per_session,
+        "writer_batches": batches, "matched_sessions": matched,
+    }
+
+
+def measure(sessions: int, args) -> dict:
+    server = Server(args.port, args.latency)
+    try:
+        server.wait_ready()
+        # 공유 캐시(캔들 카탈로그, 인코더, 시나리오 색인 등)를 데운 뒤의 RSS 를 기준으로 삼는다
+        asyncio.run(run_load(server, 1, 0, 0, 0, "warmup"))
+        time.sleep(1.0)
+        base = server.rss_mb()
+        clients, errors, peak, elapsed = asyncio.run(
+            run_load(server, sessions, args.actions, args.think, args.ramp, f"s{sessions}"))
+        # write-behind 전송과 prom 갱신(1초 주기)을 기다린 뒤 한 번 더 접속해 gauge 를 내보낸다
+        time.sleep(2.0)
+        asyncio.run(run_load(server, 1, 0, 0, 0, "probe"))
+        return report(sessions, clients, errors, base, peak, elapsed, server)
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 50, 500])
+    parser.add_argument("--actions", type=int, default=30, help="세션당 동작 수 (첫 로드 제외)")
+    parser.add_argument("--think", type=float, default=1.0, help="동작 사이 평균 대기(초, 지수분포)")
+    parser.add_argument("--ramp", type=float, default=10.0, help="세션 접속을 이 시간(초)에 걸쳐 나눠 시작")
+    parser.add_argument("--latency", type=float, default=0.02, help="저장소 호출당 지연(초)")
+    parser.add_argument("--port", type=int, default=8599)
+    parser.add_argument("--save", default=None, help="결과 JSON 경로")
+    args = parser.parse_args()
+    results = [measure(n, args) for n in args.sessions]
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
@@ -0,0 +1,40 @@
+"""몬테카를로 위험 분석: 경로 수 × 거래 수별 소요 시간과 워커 수에 따른 결과 동일성.
+
+    python benchmarks/bench_montecarlo.py [--paths 100000] [--trades 50 200 1000] [--workers 1 4]
+"""
+import argparse
+import time
+
+import numpy as np
+
+import common  # noqa: F401  (저장소 루트를 sys.path 에 추가)
+
+from montecarlo import METHODS, simulate
+
+LEVERAGES = [1, 10, 50, 100]
+RATIOS = [0.1, 0.5]
+
+
+def run(paths: int, trades: list, workers: list):
+    for n in trades:
+        returns = np.random.default_rng(n).normal(0.001, 0.01, n)
+        for method in METHODS:
+            baseline = None
+            for w in workers:
+                t0 = time.perf_counter()
+                result = simulate(returns, LEVERAGES, RATIOS, paths, method=method, seed=0, max_workers=w)
+                elapsed = time.perf_counter() - t0
+                same = "" if baseline is None else ("  same" if result["summary"].equals(baseline) else "  DIFFERENT")
+                baseline = result["summary"] if baseline is None else baseline
+                scenarios = len(LEVERAGES) * len(RATIOS)
+                print(f"{method:<9} trades={n:<5} workers={w:<2} {elapsed:8.2f} s "
+                      f"({paths * n * scenarios / elapsed / 1e6:6.1f} M trade-steps/s){same}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--paths", type=int, default=100_000)
+    parser.add_argument("--trades", type=int, nargs="+", default=[50, 200, 1000])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4])
+    args = parser.parse_args()
+    run(args.paths, args.trades, args.workers)
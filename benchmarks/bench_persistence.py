@@ -0,0 +1,85 @@
+"""write-behind 저장 부하 테스트 (네트워크 없이 SQLite 저장소 + 인위적 지연).
+
+    python benchmarks/bench_persistence.py [--trades 20000] [--latency 0.05] [--fail 0.1]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import common  # noqa: F401  (sys.path 설정)
+
+from persistence import LocalQueue, WriteBehindWriter
+from storage import SQLiteTradeStore
+
+
+class FlakyStore(SQLiteTradeStore):
+    """호출마다 latency 초 지연, fail 확률로 실패 (절반은 저장 후 응답 유실)."""
+
+    def __init__(self, latency: float, fail: float, seed: int = 0):
+        super().__init__(":memory:", latency)
+        self.fail = fail
+        self.calls = 0
+        self._rng = random.Random(seed)
+
+    def insert_trades(self, rows: list):
+        self.calls += 1
+        roll = self._rng.random()
+        if roll < self.fail / 2:
+            self._wait()
+            raise ConnectionError("simulated outage")
+        super().insert_trades(rows)
+        if roll < self.fail:
+            raise TimeoutError("simulated lost response")
+
+
+def trade_row(i: int) -> dict:
+    return {
+        "session_id": f"bench-{i % 8}",
+        "entry_time": "2024-01-01T00:00:00", "exit_time": "2024-01-01T05:00:00",
+        "play_hours": 5.0, "direction": "LONG",
+        "entry_price": 42_000.0, "exit_price": 42_100.0 + i,
+        "leverage": 5, "position_ratio": 5, "entry_capital": 50.0,
+        "pnl_dollar": 0.6, "balance_after": 1000.6, "reason": "MANUAL EXIT",
+    }
+
+
+def run(trades: int, latency: float, fail: float, batch_size: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        store = FlakyStore(latency, fail)
+        writer = WriteBehindWriter(
+            LocalQueue(os.path.join(tmp, "queue.sqlite3")), store,
+            batch_size=batch_size, flush_interval=0.05, max_pending=trades + 1, max_backoff=0.2,
+        ).start()
+
+        submit = []
+        t0 = time.perf_counter()
+        for i in range(trades):
+            s = time.perf_counter()
+            writer.submit(trade_row(i))
+            submit.append(time.perf_counter() - s)
+        enqueued = time.perf_counter() - t0
+        drained = writer.flush(timeout=600)
+        total = time.perf_counter() - t0
+        writer.stop()
+
+        stored = sum(len(store.load_trades(f"bench-{k}")) for k in range(8))
+        submit.sort()
+        print(f"trades          : {trades}")
+        print(f"store latency   : {latency * 1e3:.0f} ms/call, fail {fail:.0%}")
+        print(f"submit p50/p99  : {submit[len(submit) // 2] * 1e6:.0f} / {submit[int(len(submit) * 0.99)] * 1e6:.0f} us")
+        print(f"enqueue rate    : {trades / enqueued:,.0f} trades/s")
+        print(f"end-to-end rate : {trades / total:,.0f} trades/s")
+        print(f"store calls     : {store.calls} (failures {writer.failures})")
+        print(f"stored rows     : {stored} (drained={drained}, exactly once={stored == trades})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--trades", type=int, default=20_000)
+    parser.add_argument("--latency", type=float, default=0.05, help="저장소 호출당 지연(초)")
+    parser.add_argument("--fail", type=float, default=0.1, help="저장소 호출 실패 확률")
+    parser.add_argument("--batch", type=int, default=200)
+    args = parser.parse_args()
+    run(args.trades, args.latency, args.fail, args.batch)
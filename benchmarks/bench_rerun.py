@@ -0,0 +1,302 @@
+"""Streamlit rerun 1회를 단계별로 나눠 잰다 (브라우저 없이).
+
+    python benchmarks/bench_rerun.py [--candles 10k 100k 1M 10M] [--trades 0 1k 10k 100k]
+                                     [--save out.json] [--compare baseline.json]
+
+단계 이름은 "<단계>[candles=N]" / "<단계>[trades=M]" 이고 값은 호출 1회당 초.
+--save 로 저장한 JSON 을 다음 실행에서 --compare 로 주면 단계별 배율을 출력하고,
+threshold 배 넘게 느려진 단계가 있으면 종료 코드 1 로 끝난다.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from common import fmt_ms, synthetic_store, timeit
+
+from catalog import Catalog
+from chart_component import ChartSync, build_update
+from chart_payload import CandleEncoder, WideContext, marker_payload
+from engine import LONG, Engine
+from indicators import IndicatorOverlay, IndicatorSet
+from levels import PivotIndex
+from market_data import OHLCV_COLUMNS, convert_csv, load_binary, write_binary
+from performance import Analytics, TradeStats
+from persistence import LocalQueue, WriteBehindWriter
+from scenarios import ScenarioIndex, dataset_end
+from storage import SQLiteTradeStore
+from timeframes import TimeframePyramid
+
+WINDOW = 300
+SESSION = "bench-session"
+STATS_COLUMNS = [
+    "trade_id", "idempotency_key", "entry_time", "play_hours", "leverage",
+    "pnl_dollar", "entry_capital", "balance_after",
+]
+
+
+def parse_size(text: str) -> int:
+    text = text.lower()
+    scale = {"k": 1_000, "m": 1_000_000}.get(text[-1], 1)
+    return int(float(text.rstrip("km")) * scale)
+
+
+# =====================
+# 캔들 단계
+# =====================
+def bench_candles(n: int, tmp: str, csv_max: int, index_max: int) -> dict:
+    out = {}
+    store = synthetic_store(n)
+
+    # 데이터 로드 (generate_chart): CSV → 바이너리 변환은 최초 1회, 이후에는 memory-map 열기
+    bin_path = os.path.join(tmp, f"{n}.candles")
+    if n <= csv_max:
+        csv_path = os.path.join(tmp, f"{n}.csv")
+        frame = pd.DataFrame({"open_time": np.asarray(store.open_time),
+                              **{k: np.asarray(getattr(store, k)) for k in OHLCV_COLUMNS}})
+        frame.to_csv(csv_path, index=False)
+        out["data.convert_csv"] = timeit(lambda: convert_csv(csv_path, bin_path), repeat=1)
+        os.remove(csv_path)
+    else:
+        write_binary(bin_path, store.open_time, {k: getattr(store, k) for k in OHLCV_COLUMNS})
+    out["data.load_binary"] = timeit(lambda: load_binary(bin_path))
+    store = load_binary(bin_path)
+
+    # 청크 카탈로그: 여는 비용은 index.json 만, 윈도우는 닿는 청크만 memory-map
+    root = os.path.join(tmp, f"catalog-{n}")
+    Catalog(root).install("SYM", "1h", store.open_time, {k: getattr(store, k) for k in OHLCV_COLUMNS})
+    out["catalog.open"] = timeit(lambda: Catalog(root).open("SYM", "1h"))
+    starts = iter(np.random.default_rng(0).integers(0, n - WINDOW, 10_000).tolist())
+
+    def random_window():
+        dataset = Catalog(root, max_chunks=4).open("SYM", "1h")
+        s = next(starts)
+        return CandleEncoder(dataset).encode(s, s + WINDOW)
+    out["catalog.random_window"] = timeit(random_window, number=20)
+
+    start = n - WINDOW - 200
+    end = start + WINDOW
+
+    # 윈도우 진행: Next Candle 1회 (대기 주문 1개)
+    def step():
+        engine = Engine(store, start_idx=start)
+        engine.submit_order(LONG, engine.price * 0.5)
+        engine.step()
+        return engine.price, engine.end
+    out["window.step"] = timeit(step, number=100)
+
+    # 캔들 직렬화
+    out["serialize.cold"] = timeit(lambda: CandleEncoder(store).encode(start, end), number=20)
+    encoder = CandleEncoder(store)
+    encoder.encode(start, end)
+    turns = iter(range(end + 1, end + 10_000))
+    out["serialize.next_turn"] = timeit(lambda: encoder.encode(start, next(turns)), number=50)
+    out["serialize.delta"] = timeit(lambda: encoder.encode_range(end, end + 1), number=100)
+
+    # 컴포넌트 payload (기존 html 템플릿 치환 대신 build_update + Streamlit 인자 JSON 직렬화)
+    markers = marker_payload([{"time": store.time_at(start + i), "label": LONG, "color": "green"}
+                              for i in range(0, WINDOW, 30)])
+
+    def full_payload():
+        return json.dumps(build_update(ChartSync(), encoder, start, end, markers, []))
+
+    sync = ChartSync()
+    build_update(sync, encoder, start, end, markers, [])
+    delta_ends = iter(range(end + 1, end + 10_000))
+
+    def delta_payload():
+        return json.dumps(build_update(sync, encoder, start, next(delta_ends), markers, []))
+
+    out["payload.full"] = timeit(full_payload, number=20)
+    out["payload.delta"] = timeit(delta_payload, number=20)
+
+    # 넓은 맥락: start 이전 최대 1년(8760 캔들)을 400 개 묶음 봉으로 (start 별 최초 1회) + 전체 payload
+    wide_starts = iter(range(start, 0, -1))
+    out["payload.wide_context_cold"] = timeit(
+        lambda: WideContext(encoder, 8760).encode_context(next(wide_starts)), number=20)
+    wide = WideContext(encoder, 8760)
+    out["payload.wide_full"] = timeit(lambda: json.dumps(build_update(ChartSync(), wide, start, end, markers, [])),
+                                      number=20)
+
+    # 보조지표: 전체 구간 1회 계산 + rerun 당 delta
+    bars = encoder.bars()
+    out["indicators.build"] = timeit(lambda: IndicatorSet(bars).series("rsi:14"), repeat=1)
+    indicator_set = IndicatorSet(bars)
+    overlay = IndicatorOverlay(encoder, indicator_set, ["sma:20", "bb:20:2", "rsi:14"])
+    overlay.encode(start, end)
+    out["indicators.delta"] = timeit(lambda: overlay.encode_range(end, end + 1), number=100)
+
+    # 인덱스 구조는 메모리(수 GB)를 고려해 index_max 까지만 만든다
+    if n <= index_max:
+        out["timeframes.build"] = timeit(lambda: TimeframePyramid(store), repeat=1)
+        level = TimeframePyramid(store)["1d"]
+        out["timeframes.window_1d"] = timeit(lambda: level.encode(start, end), number=50)
+        out["levels.build"] = timeit(lambda: PivotIndex(store), repeat=1)
+        pivots = PivotIndex(store)
+        price = float(store.close[end - 1])
+        out["levels.query"] = timeit(lambda: pivots.levels(start, end, price), number=50)
+        # 시나리오: 윈도우 특성 + 국면 역색인 1회, 국면 지정 추첨은 배열 인덱싱
+        out["scenarios.build"] = timeit(lambda: ScenarioIndex(store), repeat=1)
+        scenarios = ScenarioIndex(store)
+        # 앱 시작 시에는 설치 때 저장한 색인을 읽기만 한다
+        index_path = os.path.join(tmp, f"regimes-{n}.npz")
+        scenarios.save(index_path, len(store), dataset_end(store))
+        out["scenarios.load"] = timeit(lambda: ScenarioIndex.load(index_path, len(store), dataset_end(store)))
+        seeds = iter(range(10_000))
+        out["scenarios.draw"] = timeit(lambda: scenarios.draw("crash", next(seeds)), number=100)
+    return out
+
+
+# =====================
+# 매매 기록 단계
+# =====================
+def trade_rows(m: int, seed: int = 0) -> list:
+    rng = np.random.default_rng(seed)
+    capital = rng.uniform(10, 100, m)
+    pnl = rng.normal(0, 3, m)
+    return [
+        {
+            "session_id": SESSION, "idempotency_key": f"k{i}",
+            "entry_time": "2024-01-01T00:00:00", "exit_time": "2024-01-01T05:00:00",
+            "play_hours": 5.0, "direction": LONG, "entry_price": 42_000.0, "exit_price": 42_100.0,
+            "leverage": 5, "position_ratio": 5, "entry_capital": float(capital[i]),
+            "pnl_dollar": float(pnl[i]), "balance_after": 1000.0, "reason": "MANUAL EXIT",
+        }
+        for i in range(m)
+    ]
+
+
+def legacy_stats(df: pd.DataFrame):
+    # user-010 이전 get_trade_return_stats 와 같은 계산
+    if df.empty:
+        return 0.0, 0.0, 0.0
+    df["return_pct"] = df["pnl_dollar"] / df["entry_capital"] * 100
+    return (df["return_pct"].mean(),
+            df[df["return_pct"] > 0]["return_pct"].mean(),
+            df[df["return_pct"] <= 0]["return_pct"].mean())
+
+
+def bench_trades(m: int, tmp: str, latency: float) -> dict:
+    out = {}
+    # Supabase 대신 로컬 SQLite (latency 초만큼 호출마다 지연)
+    store = SQLiteTradeStore(os.path.join(tmp, f"trades-{m}.sqlite3"))
+    rows = trade_rows(m)
+    for i in range(0, m, 10_000):
+        store.insert_trades(rows[i:i + 10_000])
+    store.latency = latency
+
+    # 세션 복원: 필요한 컬럼만 읽어 누적 통계를 채운다 (세션당 1회)
+    out["restore.load_projected"] = timeit(lambda: store.load_trades(SESSION, STATS_COLUMNS), repeat=3)
+    projected = store.load_trades(SESSION, STATS_COLUMNS)
+    row_one = trade_rows(1)[0]
+    out["restore.seed_stats"] = timeit(lambda: TradeStats().seed(projected), repeat=3)
+    out["restore.seed_analytics"] = timeit(lambda: Analytics().seed(projected), repeat=3)
+
+    # 이전 방식: rerun 마다 select * → DataFrame → 평균
+    out["stats.legacy_rerun"] = timeit(
+        lambda: legacy_stats(pd.DataFrame(store.load_trades(SESSION))), repeat=3)
+    stats = TradeStats().seed(projected)
+    out["stats.rerun"] = timeit(lambda: (stats.avg_return, stats.win_avg_return, stats.loss_avg_return),
+                                number=1000)
+
+    # 자산 곡선: 청산 1건 추가 후 LTTB 다시 계산 / 변경 없는 rerun 은 캐시
+    analytics = Analytics().seed(projected)
+    out["analytics.add_and_downsample"] = timeit(
+        lambda: (analytics.add(projected[-1] if projected else row_one), analytics.equity_points()), number=20)
+    out["analytics.rerun"] = timeit(analytics.equity_points, number=1000)
+
+    # close_position 저장: 동기 insert vs write-behind 큐
+    row = row_one
+    keys = iter(range(10**9))
+
+    def sync_insert():
+        store.insert_trades([dict(row, idempotency_key=f"s{next(keys)}")])
+
+    out["persist.sync_insert"] = timeit(sync_insert, number=50)
+    writer = WriteBehindWriter(LocalQueue(os.path.join(tmp, f"queue-{m}.sqlite3")), store, flush_interval=0.05)
+    writer.start()
+    engine = Engine(synthetic_store(WINDOW + 10), start_idx=0)
+
+    def close_position():
+        engine.submit_order(LONG)
+        writer.submit(dict(engine.close(), session_id=SESSION))
+
+    out["persist.close_position"] = timeit(close_position, number=50)
+    writer.flush(60)
+    writer.stop()
+    return out
+
+
+# =====================
+# 실행 / 저장 / 비교
+# =====================
+def run(candle_sizes, trade_sizes, csv_max: int, index_max: int, latency: float = 0.0) -> dict:
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in candle_sizes:
+            t0 = time.perf_counter()
+            for stage, seconds in bench_candles(n, tmp, csv_max, index_max).items():
+                results[f"{stage}[candles={n}]"] = seconds
+                print(f"{stage + f'[candles={n}]':<40} {fmt_ms(seconds)}")
+            print(f"{'':<40} ({time.perf_counter() - t0:.1f} s)", file=sys.stderr)
+        for m in trade_sizes:
+            for stage, seconds in bench_trades(m, tmp, latency).items():
+                results[f"{stage}[trades={m}]"] = seconds
+                print(f"{stage + f'[trades={m}]':<40} {fmt_ms(seconds)}")
+    return results
+
+
+def compare(results: dict, baseline_path: str, threshold: float, min_delta: float) -> bool:
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)["results"]
+    ok = True
+    print(f"\n{'stage':<40} {'baseline':>13} {'now':>13} {'ratio':>7}")
+    for name, seconds in results.items():
+        if name not in baseline:
+            continue
+        ratio = seconds / baseline[name] if baseline[name] else float("inf")
+        # 수 µs 단계의 잡음은 min_delta 초 미만이면 무시한다
+        slower = ratio > threshold and seconds - baseline[name] > min_delta
+        flag = " !" if slower else ""
+        ok &= not slower
+        print(f"{name:<40} {fmt_ms(baseline[name])} {fmt_ms(seconds)} {ratio:6.2f}x{flag}")
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--candles", nargs="+", default=["10k", "100k", "1M", "10M"])
+    parser.add_argument("--trades", nargs="+", default=["0", "1k", "10k", "100k"])
+    parser.add_argument("--csv-max", default="1M", help="이 크기까지만 CSV 변환 단계를 잰다")
+    parser.add_argument("--index-max", default="1M", help="이 크기까지만 타임프레임/피벗 인덱스를 만든다")
+    parser.add_argument("--save", help="결과 JSON 경로")
+    parser.add_argument("--compare", help="비교할 기준 JSON 경로")
+    parser.add_argument("--threshold", type=float, default=1.5)
+    parser.add_argument("--min-delta-ms", type=float, default=0.05)
+    parser.add_argument("--store-latency", type=float, default=0.0, help="저장소 호출당 지연(초)")
+    args = parser.parse_args()
+
+    results = run([parse_size(s) for s in args.candles], [parse_size(s) for s in args.trades],
+                  parse_size(args.csv_max), parse_size(args.index_max), args.store_latency)
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump({
+                "meta": {
+                    "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                    "python": platform.python_version(),
+                    "numpy": np.__version__,
+                    "pandas": pd.__version__,
+                    "machine": platform.platform(),
+                    "cpus": os.cpu_count(),
+                },
+                "results": results,
+            }, f, indent=1)
+    if args.compare and not compare(results, args.compare, args.threshold, args.min_delta_ms / 1e3):
+        sys.exit(1)
@@ -0,0 +1,62 @@
+"""rerun 1회당 캔들 직렬화 시간 (기존 DataFrame.apply 경로 vs chart_payload).
+
+    python benchmarks/bench_serialization.py [--sizes 300 5000 50000]
+"""
+import argparse
+import json
+
+import pandas as pd
+
+from common import fmt_ms, synthetic_store, timeit
+
+from chart_payload import CandleEncoder, encode_candles
+
+LEGACY_TEMPLATE = "<script>const data = __CANDLE_DATA__; const markers = __MARKER_DATA__;</script>"
+
+
+def legacy_serialize(df_view: pd.DataFrame) -> str:
+    # 기존 app.py 의 행 단위 경로를 그대로 재현
+    df_reset = df_view.reset_index()
+    candles = df_reset.apply(
+        lambda r: {
+            "time": int(pd.to_datetime(r["open_time"]).timestamp()),
+            "open": float(r["open"]),
+            "high": float(r["high"]),
+            "low": float(r["low"]),
+            "close": float(r["close"]),
+            "volume": float(r.get("volume", 0))
+        },
+        axis=1
+    ).tolist()
+    html = LEGACY_TEMPLATE.replace("__CANDLE_DATA__", json.dumps(candles))
+    return html.replace("__MARKER_DATA__", json.dumps([]))
+
+
+def run(sizes):
+    print(f"{'candles':>8} | {'legacy apply':>13} | {'columnar cold':>13} | {'prefix N+1':>13} | {'delta 1':>13}")
+    for n in sizes:
+        store = synthetic_store(n + 1)
+        df_view = store.frame(0, n)
+
+        legacy = timeit(lambda: legacy_serialize(df_view), repeat=3)
+        cold = timeit(lambda: encode_candles(store, 0, n))
+
+        # 턴 N+1: N 캔들 prefix 가 캐시된 상태에서 1개 추가
+        def next_turn():
+            encoder = CandleEncoder(store)
+            encoder.encode(0, n)
+            return encoder
+
+        warm = []
+        for _ in range(5):
+            encoder = next_turn()
+            warm.append(timeit(lambda: encoder.encode(0, n + 1), repeat=1))
+        delta = timeit(lambda: encoder.encode_range(n, n + 1), number=100)
+
+        print(f"{n:>8} | {fmt_ms(legacy)} | {fmt_ms(cold)} | {fmt_ms(min(warm))} | {fmt_ms(delta)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[300, 5_000, 50_000])
+    run(parser.parse_args().sizes)
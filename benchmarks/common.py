@@ -0,0 +1,52 @@
+import os
+import sys
+import time
+
+import numpy as np
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from market_data import CandleStore  # noqa: E402
+
+
+# =====================
+# 합성 OHLCV (랜덤워크, 1시간봉)
+# =====================
+def synthetic_store(n: int, seed: int = 0, start_ms: int = 1_640_995_200_000, step_ms: int = 3_600_000,
+                    vol: float = 0.01) -> CandleStore:
+    rng = np.random.default_rng(seed)
+    close = 40_000 * np.exp(np.cumsum(rng.normal(0, vol, n)))
+    open_ = np.empty(n)
+    open_[0] = close[0]
+    open_[1:] = close[:-1]
+    wick = np.abs(rng.normal(0, vol * 0.4, (2, n))) * close
+    high = np.maximum(open_, close) + wick[0]
+    low = np.minimum(open_, close) - wick[1]
+    volume = rng.gamma(2.0, 1500.0, n)
+    open_time = start_ms + np.arange(n, dtype=np.int64) * step_ms
+    return CandleStore(open_time, open_, high, low, close, volume)
+
+
+def aggregate(store: CandleStore, factor: int) -> CandleStore:
+    """factor 개씩 묶어 상위 봉을 만든다 (합성 1분봉 → 1시간봉)."""
+    n = len(store) // factor * factor
+    cut = lambda col: np.asarray(col)[:n].reshape(-1, factor)  # noqa: E731
+    return CandleStore(cut(store.open_time)[:, 0], cut(store.open)[:, 0], cut(store.high).max(axis=1),
+                       cut(store.low).min(axis=1), cut(store.close)[:, -1], cut(store.volume).sum(axis=1))
+
+
+def timeit(fn, repeat: int = 5, number: int = 1) -> float:
+    """repeat 회 중 최솟값(호출 1회당 초)."""
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for _ in range(number):
+            fn()
+        best = min(best, (time.perf_counter() - t0) / number)
+    return best
+
+
+def fmt_ms(seconds: float) -> str:
+    return f"{seconds * 1e3:10.3f} ms"
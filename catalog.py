@@ -0,0 +1,311 @@
+import argparse
+import bisect
+import json
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from market_data import BASE_DIR, OHLCV_COLUMNS, clean_candles, load_binary, to_epoch_ms, write_binary
+from scenarios import INDEX_FILE as SCENARIO_FILE, build_dataset_index
+
+DATA_DIR = os.path.join(BASE_DIR, "data")
+INDEX_FILE = "index.json"
+CHUNK_ROWS = 8192
+DEFAULT_SYMBOL = "BTCUSDT"
+MINUTE_TIMEFRAME = "1m"
+
+COLUMNS = ("open_time", *OHLCV_COLUMNS)
+
+# =====================
+# 디렉터리 구조
+# =====================
+# data/<symbol>/<timeframe>/index.json      청크 목록 (행 수, 첫/마지막 open_time ms)
+# data/<symbol>/<timeframe>/000000.candles  market_data 바이너리 포맷 청크 (chunk_rows 행씩)
+# data/<symbol>/<timeframe>/regimes.npz     라운드 시작 위치의 국면 색인 (scenarios, 1분봉 제외)
+#
+# 카탈로그를 열 때는 디렉터리 이름만 읽고, 데이터셋을 열 때 index.json 만 읽는다.
+# 청크 파일은 윈도우가 실제로 닿을 때 memory-map 하고, 열린 청크 수는 max_chunks 로 제한한다.
+
+
+# =====================
+# 청크 단위 컬럼 (CandleStore 컬럼과 같은 인덱싱)
+# =====================
+class ChunkedColumn:
+    """정수 인덱스 / 연속 슬라이스는 닿는 청크만 열고, np.asarray() 는 전체를 한 번 모은다."""
+
+    __slots__ = ("dataset", "name", "dtype")
+
+    def __init__(self, dataset, name: str, dtype):
+        self.dataset = dataset
+        self.name = name
+        self.dtype = np.dtype(dtype)
+
+    def __len__(self):
+        return len(self.dataset)
+
+    def __getitem__(self, key):
+        ds = self.dataset
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(ds))
+            if step != 1:
+                return np.asarray(self)[key]
+            if stop <= start:
+                return np.empty(0, dtype=self.dtype)
+            pieces = []
+            c = ds.chunk_of(start)
+            while start < stop:
+                offset = ds.offsets[c]
+                hi = min(stop, ds.offsets[c + 1])
+                pieces.append(getattr(ds.chunk(c), self.name)[start - offset:hi - offset])
+                start = hi
+                c += 1
+            # 한 청크 안이면 memmap 뷰를 그대로 돌려준다 (복사 없음)
+            return pieces[0] if len(pieces) == 1 else np.concatenate(pieces)
+        idx = int(key)
+        if idx < 0:
+            idx += len(ds)
+        if not 0 <= idx < len(ds):
+            raise IndexError(f"index {key} out of range for {len(ds)} rows")
+        c = ds.chunk_of(idx)
+        return getattr(ds.chunk(c), self.name)[idx - ds.offsets[c]]
+
+    def __array__(self, dtype=None, copy=None):
+        # 전체 구간 지표/상위 타임프레임 등 전체 이력이 필요한 곳에서만 쓴다
+        ds = self.dataset
+        out = np.empty(len(ds), dtype=self.dtype)
+        for c in range(len(ds.chunks)):
+            out[ds.offsets[c]:ds.offsets[c + 1]] = getattr(ds.chunk(c), self.name)
+        out.setflags(write=False)
+        return out if dtype is None else out.astype(dtype, copy=False)
+
+
+# =====================
+# 데이터셋 1개 (symbol × timeframe)
+# =====================
+class ChunkedStore:
+    """CandleStore 와 같은 인터페이스(컬럼 인덱싱, time_at, times, frame)를 청크 위에 제공한다."""
+
+    def __init__(self, catalog, symbol: str, timeframe: str, index: dict):
+        self.catalog = catalog
+        self.symbol = symbol
+        self.timeframe = timeframe
+        self.path = catalog.dataset_dir(symbol, timeframe)
+        self.chunks = index["chunks"]
+        self.offsets = [0, *np.cumsum([c["rows"] for c in self.chunks]).tolist()]
+        self.starts = [c["start"] for c in self.chunks]
+        self.open_time = ChunkedColumn(self, "open_time", np.int64)
+        for name in OHLCV_COLUMNS:
+            setattr(self, name, ChunkedColumn(self, name, np.float64))
+
+    def __len__(self):
+        return self.offsets[-1]
+
+    def chunk_of(self, idx: int) -> int:
+        return bisect.bisect_right(self.offsets, idx) - 1
+
+    def chunk(self, c: int):
+        return self.catalog.chunk(os.path.join(self.path, self.chunks[c]["file"]))
+
+    def locate(self, time_ms: int) -> int:
+        """open_time >= time_ms 인 첫 행 번호 (청크 시간 범위로 청크 1개만 연다)."""
+        c = bisect.bisect_right(self.starts, time_ms) - 1
+        if c < 0:
+            return 0
+        if time_ms > self.chunks[c]["end"]:
+            return self.offsets[c + 1]
+        return self.offsets[c] + int(np.searchsorted(self.chunk(c).open_time, time_ms))
+
+    def locate_many(self, times_ms) -> np.ndarray:
+        """locate() 의 배열 버전. 청크 순서대로 한 번씩만 열어 메모리가 전체 이력에 비례하지 않는다."""
+        t = np.asarray(times_ms, dtype=np.int64)
+        out = np.zeros(len(t), dtype=np.int64)
+        c = np.searchsorted(np.asarray(self.starts, dtype=np.int64), t, side="right") - 1
+        for n in np.unique(c[c >= 0]).tolist():
+            m = c == n
+            out[m] = self.offsets[n] + np.searchsorted(self.chunk(n).open_time, t[m])
+        return out
+
+    def prefetch(self, idx: int):
+        """idx 가 속한 청크와 다음 청크를 백그라운드에서 미리 연다."""
+        if not self.chunks:
+            return
+        c = self.chunk_of(min(max(idx, 0), len(self) - 1))
+        for n in (c, c + 1):
+            if 0 <= n < len(self.chunks):
+                self.catalog.prefetch(os.path.join(self.path, self.chunks[n]["file"]))
+
+    # 차트/체결은 초 단위 시간을 사용한다
+    def time_at(self, idx: int) -> int:
+        return int(self.open_time[idx]) // 1000
+
+    def times(self, start: int, end: int) -> np.ndarray:
+        return self.open_time[start:end] // 1000
+
+    def frame(self, start: int = 0, end: int = None) -> pd.DataFrame:
+        sl = slice(start, end)
+        index = pd.to_datetime(self.open_time[sl], unit="ms")
+        index.name = "open_time"
+        return pd.DataFrame(
+            {name: getattr(self, name)[sl] for name in OHLCV_COLUMNS},
+            index=index,
+        )
+
+
+# =====================
+# 카탈로그 (프로세스당 1개)
+# =====================
+class Catalog:
+    """symbol / timeframe 별 청크 데이터셋 목록. 열린 청크는 프로세스 전체에서 max_chunks 개까지만 유지한다."""
+
+    def __init__(self, root: str = DATA_DIR, max_chunks: int = 32):
+        self.root = root
+        self.max_chunks = max_chunks
+        self._chunks = OrderedDict()
+        self._datasets = {}
+        self._inflight = set()
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="catalog-prefetch")
+
+    def dataset_dir(self, symbol: str, timeframe: str) -> str:
+        return os.path.join(self.root, symbol, timeframe)
+
+    def symbols(self, timeframe: str = None) -> list:
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(
+            s for s in os.listdir(self.root)
+            if os.path.isdir(os.path.join(self.root, s)) and (timeframe is None or timeframe in self.timeframes(s))
+        )
+
+    def timeframes(self, symbol: str) -> list:
+        path = os.path.join(self.root, symbol)
+        if not os.path.isdir(path):
+            return []
+        return sorted(tf for tf in os.listdir(path) if os.path.exists(os.path.join(path, tf, INDEX_FILE)))
+
+    def open(self, symbol: str, timeframe: str) -> ChunkedStore:
+        key = (symbol, timeframe)
+        with self._lock:
+            dataset = self._datasets.get(key)
+        if dataset is None:
+            with open(os.path.join(self.dataset_dir(symbol, timeframe), INDEX_FILE), encoding="utf-8") as f:
+                dataset = ChunkedStore(self, symbol, timeframe, json.load(f))
+            with self._lock:
+                dataset = self._datasets.setdefault(key, dataset)
+        return dataset
+
+    # ---------------------
+    # 청크 캐시 (LRU)
+    # ---------------------
+    def chunk(self, path: str):
+        with self._lock:
+            store = self._chunks.get(path)
+            if store is not None:
+                self._chunks.move_to_end(path)
+                return store
+        store = load_binary(path)
+        with self._lock:
+            store = self._chunks.setdefault(path, store)
+            self._chunks.move_to_end(path)
+            # 밀려난 청크의 memmap 은 참조가 없어지면 해제된다
+            while len(self._chunks) > self.max_chunks:
+                self._chunks.popitem(last=False)
+        return store
+
+    def prefetch(self, path: str):
+        with self._lock:
+            if path in self._chunks or path in self._inflight:
+                return
+            self._inflight.add(path)
+        self._pool.submit(self._warm, path)
+
+    def _warm(self, path: str):
+        try:
+            store = self.chunk(path)
+            # 페이지를 미리 읽어 두어 다음 턴의 인덱싱이 디스크를 기다리지 않게 한다
+            for name in COLUMNS:
+                np.add.reduce(getattr(store, name))
+        except OSError:
+            pass
+        finally:
+            with self._lock:
+                self._inflight.discard(path)
+
+    # ---------------------
+    # 설치
+    # ---------------------
+    def install(self, symbol: str, timeframe: str, open_time_ms, ohlcv: dict, chunk_rows: int = CHUNK_ROWS) -> dict:
+        """정렬/정제된 캔들을 chunk_rows 행씩 나눠 쓰고 index.json 을 마지막에 교체한다."""
+        t = np.asarray(open_time_ms, dtype=np.int64)
+        path = self.dataset_dir(symbol, timeframe)
+        os.makedirs(path, exist_ok=True)
+
+        chunks = []
+        for i, lo in enumerate(range(0, len(t), chunk_rows)):
+            hi = min(lo + chunk_rows, len(t))
+            name = f"{i:06d}.candles"
+            write_binary(os.path.join(path, name), t[lo:hi], {k: np.asarray(ohlcv[k])[lo:hi] for k in OHLCV_COLUMNS})
+            chunks.append({"file": name, "rows": hi - lo, "start": int(t[lo]), "end": int(t[hi - 1])})
+
+        index = {"symbol": symbol, "timeframe": timeframe, "chunk_rows": chunk_rows, "rows": int(len(t)), "chunks": chunks}
+        tmp_path = os.path.join(path, f"{INDEX_FILE}.tmp{os.getpid()}")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(index, f)
+        os.replace(tmp_path, os.path.join(path, INDEX_FILE))
+
+        # 이전 설치에서 남은 청크 파일 정리
+        keep = {c["file"] for c in chunks}
+        for name in os.listdir(path):
+            if name.endswith(".candles") and name not in keep:
+                os.remove(os.path.join(path, name))
+        with self._lock:
+            self._datasets.pop((symbol, timeframe), None)
+            for key in [k for k in self._chunks if os.path.dirname(k) == path]:
+                del self._chunks[key]
+
+        # 국면 색인은 데이터가 바뀔 때 여기서 한 번만 계산하고, 앱은 저장된 파일을 읽기만 한다
+        if timeframe != MINUTE_TIMEFRAME:
+            build_dataset_index(self.open(symbol, timeframe), self.scenario_path(symbol, timeframe))
+        return {"rows": int(len(t)), "chunks": len(chunks)}
+
+    def scenario_path(self, symbol: str, timeframe: str) -> str:
+        return os.path.join(self.dataset_dir(symbol, timeframe), SCENARIO_FILE)
+
+    def install_csv(self, symbol: str, timeframe: str, csv_path: str, chunk_rows: int = CHUNK_ROWS) -> dict:
+        df = pd.read_csv(csv_path)
+        ohlcv = {k: df[k] if k in df else np.zeros(len(df)) for k in OHLCV_COLUMNS}
+        t, cols, stats = clean_candles(to_epoch_ms(df["open_time"]), ohlcv)
+        return {**stats, **self.install(symbol, timeframe, t, cols, chunk_rows)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage the chunked candle catalog.")
+    parser.add_argument("--root", default=DATA_DIR)
+    sub = parser.add_subparsers(dest="command", required=True)
+    install = sub.add_parser("install", help="install an OHLCV CSV as <symbol>/<timeframe>")
+    install.add_argument("symbol")
+    install.add_argument("timeframe")
+    install.add_argument("csv")
+    install.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    sub.add_parser("list", help="list installed datasets")
+    args = parser.parse_args(argv)
+
+    catalog = Catalog(args.root)
+    if args.command == "install":
+        stats = catalog.install_csv(args.symbol, args.timeframe, args.csv, args.chunk_rows)
+        print(
+            f"{args.symbol}/{args.timeframe}: {stats['rows']} rows in {stats['chunks']} chunks "
+            f"(dropped {stats['dropped_invalid']} invalid, {stats['dropped_duplicate']} duplicate)"
+        )
+    else:
+        for symbol in catalog.symbols():
+            for timeframe in catalog.timeframes(symbol):
+                print(f"{symbol}/{timeframe}: {len(catalog.open(symbol, timeframe))} rows")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+import json
+import os
+
+import streamlit as st
+import streamlit.components.v1 as components
+
+import metrics
+
+FRONTEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "frontend")
+
+_component = components.declare_component("trading_chart", path=FRONTEND_DIR)
+
+
+# =====================
+# 세션별 차트 동기화 상태
+# =====================
+class ChartSync:
+    """브라우저 차트에 마지막으로 보낸 상태. rev 는 보낸 update 의 일련번호."""
+
+    __slots__ = ("rev", "source_key", "overlay_key", "start", "end", "marker_count", "lines", "resync_token")
+
+    def __init__(self):
+        self.rev = 0
+        self.source_key = None
+        self.overlay_key = None
+        self.start = None
+        self.end = 0
+        self.marker_count = 0
+        self.lines = None
+        self.resync_token = None
+
+
+def build_update(sync: ChartSync, encoder, start: int, end: int, markers: list, lines: list,
+                 overlay=None, resync=False) -> dict:
+    """마지막으로 보낸 상태와 비교해 새 캔들/마커/지표값/변경된 가격선만 담은 update 를 만든다.
+
+    encoder 는 encode(start, end) / encode_range(start, end) 와 key 를 갖는 캔들 소스
+    (CandleEncoder 또는 상위 타임프레임 TimeframeLevel). overlay(IndicatorOverlay)도 같은
+    인터페이스로 지표 선을 만든다. key 가 바뀌면 전체를 다시 보낸다.
+    encoder 가 encode_context(start) 를 가지면(WideContext) 전체 전송 때 윈도우 앞 묶음 봉도 보낸다.
+    """
+    overlay_key = overlay.key if overlay is not None else None
+    reset = (
+        resync
+        or sync.source_key != encoder.key
+        or sync.overlay_key != overlay_key
+        or sync.start != start
+        or end < sync.end
+        or len(markers) < sync.marker_count
+    )
+
+    if reset:
+        sync.rev += 1
+        update = {
+            "rev": sync.rev,
+            "reset": True,
+            "candles": encoder.encode(start, end),
+            "context": encoder.encode_context(start) if hasattr(encoder, "encode_context") else None,
+            "markers": markers,
+            "lines": lines,
+            "series": overlay.encode(start, end) if overlay is not None else [],
+        }
+    else:
+        new_candles = encoder.encode_range(sync.end, end) if end > sync.end else None
+        new_points = overlay.encode_range(sync.end, end) if overlay is not None and new_candles else None
+        new_markers = markers[sync.marker_count:]
+        changed_lines = lines if lines != sync.lines else None
+        if new_candles is None and not new_markers and changed_lines is None:
+            # 변경 없음: 프런트엔드는 같은 rev 를 무시한다
+            return {"rev": sync.rev, "base": sync.rev, "reset": False}
+        sync.rev += 1
+        update = {
+            "rev": sync.rev,
+            "base": sync.rev - 1,
+            "reset": False,
+            "candles": new_candles,
+            "markers": new_markers,
+            "lines": changed_lines,
+            "points": new_points,
+        }
+
+    sync.source_key = encoder.key
+    sync.overlay_key = overlay_key
+    sync.start = start
+    sync.end = end
+    sync.marker_count = len(markers)
+    sync.lines = list(lines)
+    return update
+
+
+# =====================
+# 차트 컴포넌트 렌더링
+# =====================
+def trading_chart(sync: ChartSync, encoder, start: int, end: int, markers: list, lines: list,
+                  overlay=None, key="trading_chart"):
+    # 프런트엔드가 delta 를 이어붙이지 못하면(새로고침, iframe 재생성 등) resync 를 요청한다
+    value = st.session_state.get(key)
+    resync = False
+    if isinstance(value, dict) and value.get("resync") and value["resync"] != sync.resync_token:
+        sync.resync_token = value["resync"]
+        resync = True
+
+    with metrics.section("chart_payload"):
+        update = build_update(sync, encoder, start, end, markers, lines, overlay, resync=resync)
+    if metrics.current() is not None:
+        metrics.add_bytes("chart_payload", len(json.dumps(update)))
+    with metrics.section("chart_render"):
+        _component(update=update, key=key, default=None)
+    return update
@@ -0,0 +1,191 @@
+import json
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from downsample import ohlc_buckets
+from indicators import Bars
+
+CANDLE_FIELDS = ("time", "open", "high", "low", "close", "volume")
+
+
+# =====================
+# 컬럼 단위 직렬화
+# =====================
+# 캔들은 {"time": [...], "open": [...], ...} 형태의 JSON 문자열로 보내고
+# 프런트엔드에서 행 객체로 풀어쓴다. 행마다 dict 를 만들지 않으므로
+# NumPy → list → json 이 모두 C 루프에서 끝난다.
+def candle_columns(store, start: int, end: int) -> dict:
+    return {
+        "time": store.times(start, end).tolist(),
+        "open": store.open[start:end].tolist(),
+        "high": store.high[start:end].tolist(),
+        "low": store.low[start:end].tolist(),
+        "close": store.close[start:end].tolist(),
+        "volume": store.volume[start:end].tolist(),
+    }
+
+
+def _encode_bodies(columns: dict) -> dict:
+    # "[1,2,3]" → "1,2,3" (이어붙이기 위해 대괄호 제거)
+    return {
+        name: json.dumps(values, separators=(",", ":"))[1:-1]
+        for name, values in columns.items()
+    }
+
+
+def _join(bodies: dict) -> str:
+    return "{" + ",".join(f'"{name}":[{bodies[name]}]' for name in CANDLE_FIELDS) + "}"
+
+
+def encode_columns(columns: dict) -> str:
+    return _join(_encode_bodies(columns))
+
+
+def encode_candles(store, start: int, end: int) -> str:
+    return encode_columns(candle_columns(store, start, end))
+
+
+# =====================
+# 윈도우 prefix 캐시 (프로세스 공용)
+# =====================
+class _Prefix:
+    __slots__ = ("end", "bodies", "text")
+
+    def __init__(self, end, bodies):
+        self.end = end
+        self.bodies = bodies
+        self.text = _join(bodies)
+
+
+class CandleEncoder:
+    """start_idx 별로 이미 인코딩한 [start:end] prefix 를 보관해 새 캔들만 인코딩한다."""
+
+    key = "base"
+
+    def __init__(self, store, max_windows: int = 256):
+        self.store = store
+        self.max_windows = max_windows
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def encode(self, start: int, end: int) -> str:
+        with self._lock:
+            entry = self._cache.get(start)
+            if entry is not None:
+                self._cache.move_to_end(start)
+
+            if entry is not None and entry.end == end:
+                return entry.text
+            if entry is not None and entry.end > end:
+                # 되감기: 캐시는 더 긴 prefix 를 유지한다
+                return encode_candles(self.store, start, end)
+
+            if entry is None or entry.end == start:
+                bodies = _encode_bodies(candle_columns(self.store, start, end))
+            else:
+                tail = _encode_bodies(candle_columns(self.store, entry.end, end))
+                bodies = {
+                    name: f"{entry.bodies[name]},{tail[name]}" if tail[name] else entry.bodies[name]
+                    for name in CANDLE_FIELDS
+                }
+
+            entry = _Prefix(end, bodies)
+            self._cache[start] = entry
+            while len(self._cache) > self.max_windows:
+                self._cache.popitem(last=False)
+            return entry.text
+
+    def encode_range(self, start: int, end: int) -> str:
+        # delta 전송용 (보통 캔들 1개)
+        return encode_candles(self.store, start, end)
+
+    # 넓은 맥락(WideContext)용: 봉 번호 [lo:hi) 의 NumPy 컬럼
+    def columns(self, lo: int, hi: int) -> dict:
+        store = self.store
+        return {
+            "time": store.times(lo, hi), "open": store.open[lo:hi], "high": store.high[lo:hi],
+            "low": store.low[lo:hi], "close": store.close[lo:hi], "volume": store.volume[lo:hi],
+        }
+
+    # 지표 오버레이용: 기본 캔들은 인덱스가 곧 봉 번호이고 진행 중 봉이 없다
+    def bars(self) -> Bars:
+        store = self.store
+        return Bars(store.times(0, len(store)), store.open, store.high, store.low, store.close, store.volume)
+
+    @staticmethod
+    def span(start: int, end: int):
+        return start, end, None
+
+    span_range = span
+
+    @staticmethod
+    def bar_time(t: int) -> int:
+        return t
+
+
+# =====================
+# 넓은 맥락 (윈도우 앞 구간을 묶은 봉으로)
+# =====================
+class WideContext:
+    """source(CandleEncoder / TimeframeLevel) 윈도우 앞에 start 이전 context 개 기본 캔들 구간을
+    budget 개 이하의 OHLC 봉으로 묶어 붙인다. 윈도우 [start:end] 는 원래 해상도 그대로다.
+
+    묶음 봉은 start 에만 의존하므로 start 별로 캐시하고, 턴이 진행돼도 다시 만들지 않는다.
+    나머지 인코더 인터페이스는 source 에 그대로 넘긴다.
+    """
+
+    def __init__(self, source, context: int, budget: int = 400, max_windows: int = 256):
+        self.source = source
+        self.context = context
+        self.budget = budget
+        self.key = (source.key, "wide", context, budget)
+        self.max_windows = max_windows
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        return getattr(self.source, name)
+
+    def encode_context(self, start: int) -> str:
+        with self._lock:
+            text = self._cache.get(start)
+            if text is not None:
+                self._cache.move_to_end(start)
+                return text
+        source = self.source
+        # 봉 번호로 바꾼다 (상위 타임프레임은 start 가 속한 봉 앞까지만)
+        b0 = source.span(max(start - self.context, 0), start + 1)[0]
+        b1 = source.span(start, start + 1)[0]
+        columns = ohlc_buckets(source.columns(b0, b1), self.budget)
+        text = encode_columns({name: np.asarray(columns[name]).tolist() for name in CANDLE_FIELDS})
+        with self._lock:
+            self._cache[start] = text
+            while len(self._cache) > self.max_windows:
+                self._cache.popitem(last=False)
+        return text
+
+
+# =====================
+# 마커 / 가격선
+# =====================
+def marker_payload(trade_markers: list, bar_time=None) -> list:
+    """bar_time 이 있으면 마커 시간을 해당 타임프레임 봉 시간으로 맞춘다."""
+    return [
+        {
+            "time": bar_time(m["time"]) if bar_time else m["time"],
+            "position": "belowBar" if m["label"] == "LONG" else "aboveBar",
+            "color": m["color"],
+            "shape": "arrowUp" if m["label"] == "LONG" else "arrowDown",
+            "text": m["label"],
+        }
+        for m in trade_markers
+    ]
+
+
+def level_lines(levels, color: str, title: str) -> list:
+    return [
+        {"price": float(p), "color": color, "lineWidth": 1, "lineStyle": 2, "title": title}
+        for p in levels
+    ]
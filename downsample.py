@@ -0,0 +1,63 @@
+import numpy as np
+
+
+# =====================
+# LTTB (Largest-Triangle-Three-Buckets)
+# =====================
+def lttb(x, y, threshold: int) -> np.ndarray:
+    """모양을 유지하면서 threshold 개 점만 고른 인덱스 배열 (첫 점/끝 점 포함).
+
+    가운데 점들을 threshold-2 개 구간으로 나누고, 구간마다 직전에 고른 점과
+    다음 구간 평균점이 이루는 삼각형 넓이가 가장 큰 점을 고른다.
+    """
+    y = np.asarray(y, dtype=np.float64)
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    # 구간 평균은 누적합으로 한 번에 구한다 (마지막 구간의 "다음 구간"은 끝 점)
+    cx = np.concatenate(([0.0], np.cumsum(x)))
+    cy = np.concatenate(([0.0], np.cumsum(y)))
+    lo = np.append(edges[1:-1], n - 1)
+    hi = np.append(edges[2:], n)
+    width = np.maximum(hi - lo, 1)
+    avg_x = (cx[hi] - cx[lo]) / width
+    avg_y = (cy[hi] - cy[lo]) / width
+
+    out = np.empty(threshold, dtype=np.int64)
+    out[0] = a = 0
+    out[-1] = n - 1
+    for i in range(threshold - 2):
+        b0, b1 = edges[i], max(edges[i + 1], edges[i] + 1)
+        bx, by = x[b0:b1], y[b0:b1]
+        area = np.abs((x[a] - avg_x[i]) * (by - y[a]) - (x[a] - bx) * (avg_y[i] - y[a]))
+        a = b0 + int(np.argmax(area))
+        out[i + 1] = a
+    return out
+
+
+# =====================
+# OHLC 구간 묶기
+# =====================
+def ohlc_buckets(columns: dict, budget: int) -> dict:
+    """time/open/high/low/close/volume 배열을 budget 개 이하의 같은 폭 봉으로 묶는다.
+
+    구간은 끝에서부터 잘라 마지막 봉이 항상 원래 마지막 캔들에서 끝나고, 남는 앞쪽만 짧아진다.
+    """
+    n = len(columns["time"])
+    if n <= budget:
+        return columns
+    width = -(-n // budget)
+    first = np.arange(n, 0, -width)[::-1] - width
+    first[0] = 0
+    last = np.append(first[1:] - 1, n - 1)
+    return {
+        "time": np.asarray(columns["time"])[first],
+        "open": np.asarray(columns["open"])[first],
+        "high": np.maximum.reduceat(np.asarray(columns["high"]), first),
+        "low": np.minimum.reduceat(np.asarray(columns["low"]), first),
+        "close": np.asarray(columns["close"])[last],
+        "volume": np.add.reduceat(np.asarray(columns["volume"]), first),
+    }
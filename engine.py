@@ -0,0 +1,289 @@
+from datetime import datetime, timezone
+
+from orders import LIMIT, LONG, STOP, Order, OrderBook
+
+WINDOW = 300
+START_BALANCE = 1000.0
+
+
+def utc_iso(ts: int) -> str:
+    return datetime.fromtimestamp(ts, timezone.utc).replace(tzinfo=None).isoformat()
+
+
+def calc_pnl(direction: str, entry: float, exit_price: float, capital: float, leverage) -> float:
+    return ((exit_price - entry)/entry*capital*leverage
+            if direction == LONG
+            else (entry - exit_price)/entry*capital*leverage)
+
+
+# =====================
+# 계좌 / 포지션 상태
+# =====================
+class Account:
+    __slots__ = ("balance", "total_pnl", "trade_count", "win", "lose")
+
+    def __init__(self, balance: float = START_BALANCE):
+        self.balance = balance
+        self.total_pnl = 0.0
+        self.trade_count = 0
+        self.win = 0
+        self.lose = 0
+
+
+class Position:
+    __slots__ = ("direction", "entry_price", "entry_capital", "entry_time", "stop_loss_price")
+
+    def __init__(self, direction, entry_price, entry_capital, entry_time):
+        self.direction = direction
+        self.entry_price = entry_price
+        self.entry_capital = entry_capital
+        self.entry_time = entry_time
+        self.stop_loss_price = None
+
+
+# =====================
+# 시뮬레이션 엔진 (Streamlit 비의존)
+# =====================
+class Engine:
+    """CandleStore 위에서 한 세션의 리플레이를 진행한다.
+
+    step() 으로 캔들을 한 개씩 공개하고, submit_order() / submit_exit() / close() 로
+    주문을 낸다. 청산은 저장할 trade_log 행(dict)을 돌려주며 저장은 호출한 쪽이 맡는다.
+    기존 앱과 같이 손익은 청산 시점의 leverage / position_ratio 설정으로 계산한다.
+
+    대기 주문은 OrderBook 에 쌓이고, 한 캔들 안에서는 양봉이면 시가→저가→고가,
+    음봉이면 시가→고가→저가 경로를 따라 가격이 지나가는 순서대로 체결된다.
+    intrabar(MinuteIndex)가 있으면 같은 규칙을 그 시간의 1분봉마다 차례로 적용한다.
+    """
+
+    __slots__ = (
+        "store", "start_idx", "current_step", "turn_count",
+        "leverage", "position_ratio",
+        "account", "position", "book", "markers", "intrabar", "_in_flight",
+    )
+
+    def __init__(self, store, start_idx: int = 0, current_step: int = WINDOW,
+                 balance: float = START_BALANCE, leverage=5, position_ratio: float = 0.05, intrabar=None):
+        self.store = store
+        self.intrabar = intrabar
+        self.leverage = leverage
+        self.position_ratio = position_ratio
+        self.account = Account(balance)
+        self.reset_round(start_idx, current_step)
+
+    # ---------------------
+    # 조회
+    # ---------------------
+    @property
+    def index(self) -> int:
+        return self.start_idx + self.current_step - 1
+
+    @property
+    def end(self) -> int:
+        return min(self.start_idx + self.current_step, len(self.store))
+
+    @property
+    def price(self) -> float:
+        return float(self.store.close[self.end - 1])
+
+    @property
+    def time(self) -> int:
+        return self.store.time_at(self.index)
+
+    def unrealized(self, price: float = None):
+        """(가격 변화율, 레버리지 반영 손익 $). 포지션이 없으면 None."""
+        pos = self.position
+        if pos is None:
+            return None
+        price = self.price if price is None else price
+        if pos.direction == LONG:
+            price_change = (price - pos.entry_price) / pos.entry_price
+        else:
+            price_change = (pos.entry_price - price) / pos.entry_price
+        return price_change, pos.entry_capital * price_change * self.leverage
+
+    # ---------------------
+    # 라운드
+    # ---------------------
+    def reset_round(self, start_idx: int, current_step: int = WINDOW):
+        self.start_idx = start_idx
+        self.current_step = current_step
+        self.turn_count = 0
+        self.position = None
+        self.book = OrderBook()
+        self.markers = []
+        self._in_flight = ()
+
+    # ---------------------
+    # 주문
+    # ---------------------
+    def submit_order(self, direction: str, price: float = None, kind: str = LIMIT):
+        """price 가 없으면 현재가로 즉시 진입(체결 시 청산된 trade_log 행 목록 반환),
+        있으면 대기 진입 주문으로 등록하고 Order 를 반환한다(가격이 0 이하면 None)."""
+        if price is None:
+            trades = []
+            self._enter(direction, self.price, trades)
+            return trades
+        if price <= 0:
+            return None
+        return self.book.add(Order(direction, kind, price))
+
+    def submit_exit(self, price: float, ratio: float = 1.0, kind: str = LIMIT):
+        """보유 포지션의 ratio 만큼 청산하는 지정가(LIMIT)/손절(STOP) 주문. 포지션이 없으면 None."""
+        pos = self.position
+        if pos is None or price <= 0:
+            return None
+        order = self.book.add(Order(pos.direction, kind, price, ratio=ratio, reduce_only=True))
+        if kind == STOP and ratio >= 1:
+            pos.stop_loss_price = order.price
+        return order
+
+    def set_stop_loss(self, price: float):
+        return self.submit_exit(price, 1.0, STOP)
+
+    def cancel_order(self, order_id: int = None):
+        """order_id 가 없으면 대기 중인 진입 주문을 모두 취소한다."""
+        if order_id is not None:
+            return self.book.cancel(order_id)
+        return self.book.cancel_where(lambda o: not o.reduce_only)
+
+    def _enter(self, direction: str, price: float, trades: list) -> Position:
+        pos = self.position
+        # 반대 방향 진입은 기존 포지션을 먼저 청산한다
+        if pos is not None and pos.direction != direction:
+            trades.append(self.close(price, "REVERSE"))
+            pos = None
+
+        # ✅ 현재 캔들의 시간 (고정)
+        entry_time = self.time
+        capital = self.account.balance * self.position_ratio
+        if pos is None:
+            self.position = Position(direction, price, capital, entry_time)
+        else:
+            # 같은 방향 추가 진입: 손익이 보존되도록 자본 가중 조화평균 진입가
+            total = pos.entry_capital + capital
+            if total > 0:
+                pos.entry_price = total / (pos.entry_capital / pos.entry_price + capital / price)
+            pos.entry_capital = total
+        self.markers.append({
+            "time": entry_time,
+            "label": direction,
+            "color": "green" if direction == LONG else "red",
+            "symbol": "arrow"
+        })
+        return self.position
+
+    def close(self, price: float = None, reason: str = "MANUAL EXIT", ratio: float = 1.0):
+        """포지션의 ratio 만큼 청산하고 trade_log 행을 반환한다. 포지션이 없으면 None."""
+        pos = self.position
+        if pos is None:
+            return None
+        exit_price = self.price if price is None else price
+        exit_ts = self.time
+
+        ratio = min(max(ratio, 0.0), 1.0)
+        capital = pos.entry_capital * ratio
+        full = ratio >= 1.0 or pos.entry_capital - capital <= 1e-9
+        if full:
+            capital = pos.entry_capital
+
+        pnl = calc_pnl(pos.direction, pos.entry_price, exit_price, capital, self.leverage)
+
+        acct = self.account
+        acct.balance += pnl
+        acct.total_pnl += pnl
+        acct.trade_count += 1
+        acct.win += int(pnl > 0)
+        acct.lose += int(pnl <= 0)
+
+        if full:
+            self.position = None
+            # 남은 청산/손절 주문은 포지션과 함께 사라진다
+            self.book.cancel_where(lambda o: o.reduce_only)
+            for order in self._in_flight:
+                if order.reduce_only:
+                    order.active = False
+        else:
+            pos.entry_capital -= capital
+
+        self.markers.append({
+            "time": exit_ts,
+            "price": exit_price,
+            "label": reason,
+            "color": "red" if pnl < 0 else "green",
+            "symbol": "x"
+        })
+
+        return {
+            "entry_time": utc_iso(pos.entry_time),
+            "exit_time": utc_iso(exit_ts),
+            "play_hours": (exit_ts - pos.entry_time) / 3600,
+            "direction": pos.direction,
+            "entry_price": pos.entry_price,
+            "exit_price": exit_price,
+            "leverage": self.leverage,
+            "position_ratio": int(self.position_ratio * 100),
+            "entry_capital": capital,
+            "pnl_dollar": pnl,
+            "balance_after": acct.balance,
+            "reason": reason
+        }
+
+    # ---------------------
+    # 진행
+    # ---------------------
+    def step(self) -> list:
+        """다음 캔들을 공개하고 발동한 대기 주문을 체결한다. 청산된 trade_log 행 목록을 반환한다."""
+        self.current_step += 1
+        self.turn_count += 1
+
+        book = self.book
+        if not book:
+            return []
+
+        store = self.store
+        idx = self.index
+        low, high = store.low[idx], store.high[idx]
+        path = None
+        # 1분봉 경로는 이 캔들에서 발동할 주문이 있을 때만 읽는다
+        if self.intrabar is not None and book.touched(low, high):
+            path = self.intrabar.path(idx)
+        if path is None:
+            path = ((store.open[idx], low, high, store.close[idx]),)
+
+        trades = []
+        for open_price, low, high, close in path:
+            if not book:
+                break
+            for leg in ((0, 1) if close >= open_price else (1, 0)):
+                hit = book.pop_low(low) if leg == 0 else book.pop_high(high)
+                if hit:
+                    self._in_flight = hit
+                    for order in hit:
+                        self._fill(order, open_price, trades)
+                    self._in_flight = ()
+        return trades
+
+    def _fill(self, order: Order, open_price: float, trades: list):
+        if not order.active:
+            return
+        order.active = False
+
+        price = order.price
+        if order.kind == STOP:
+            # 시가가 이미 스탑 가격을 넘어 갭이 났다면 시가에 체결
+            if order.is_buy and open_price > price:
+                price = float(open_price)
+            elif not order.is_buy and open_price < price:
+                price = float(open_price)
+
+        if not order.reduce_only:
+            self._enter(order.direction, price, trades)
+            return
+
+        pos = self.position
+        if pos is None or pos.direction != order.direction:
+            return
+        reason = ("STOP LOSS" if order.kind == STOP else
+                  "LIMIT EXIT" if order.ratio >= 1 else f"{int(round(order.ratio * 100))}% LIMIT EXIT")
+        trades.append(self.close(price, reason, order.ratio))
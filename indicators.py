@@ -0,0 +1,443 @@
+import json
+import math
+import threading
+from collections import OrderedDict, deque
+
+import numpy as np
+import pandas as pd
+
+PRICE_SCALE = "right"
+
+
+# =====================
+# 봉 배열 (전체 히스토리)
+# =====================
+class Bars:
+    """지표 계산용 OHLCV 배열. time 은 초 단위."""
+
+    __slots__ = ("time", "open", "high", "low", "close", "volume")
+
+    def __init__(self, time, open, high, low, close, volume):
+        self.time = np.asarray(time)
+        self.open = np.asarray(open, dtype=np.float64)
+        self.high = np.asarray(high, dtype=np.float64)
+        self.low = np.asarray(low, dtype=np.float64)
+        self.close = np.asarray(close, dtype=np.float64)
+        self.volume = np.asarray(volume, dtype=np.float64)
+
+    def __len__(self):
+        return len(self.close)
+
+    def bar(self, k: int) -> tuple:
+        return (int(self.time[k]), self.open[k], self.high[k], self.low[k], self.close[k], self.volume[k])
+
+
+# =====================
+# 지표 (전체 구간 벡터 계산 + O(1) 스트리밍 상태)
+# =====================
+# 각 지표 클래스는
+#   compute(bars, *params) -> {선 이름: 값 배열}  전체 구간 벡터 계산 (i 번째 값은 i 이하 봉만 사용)
+#   seed(bars, series, k)                        k 번째 봉까지 반영된 상태로 맞춘다
+#   update(bar) / peek(bar)                      봉 1개 반영 (peek 는 상태를 바꾸지 않음), 반환값은 {선 이름: 값}
+# 을 갖는다. bar 는 (time, open, high, low, close, volume) 튜플.
+_NAN = float("nan")
+
+
+def _wilder(x, period: int):
+    # Wilder 평활 = alpha 1/period 지수평활 (첫 값에서 시작)
+    return pd.Series(x).ewm(alpha=1.0 / period, adjust=False).mean().to_numpy()
+
+
+class SMA:
+    name = "sma"
+    title = "SMA"
+    defaults = (20,)
+    scale = PRICE_SCALE
+    colors = {"": "#FF9800"}
+
+    def __init__(self, period=20):
+        self.period = int(period)
+        self._window = deque()
+        self._sum = 0.0
+
+    @staticmethod
+    def compute(bars, period=20) -> dict:
+        period = int(period)
+        c = np.concatenate([[0.0], np.cumsum(bars.close)])
+        out = np.full(len(bars), np.nan)
+        if period <= len(bars):
+            out[period - 1:] = (c[period:] - c[:-period]) / period
+        return {"": out}
+
+    def seed(self, bars, series, k: int):
+        window = bars.close[max(k - self.period + 1, 0):k + 1]
+        self._window = deque(window.tolist())
+        self._sum = float(window.sum())
+        return self
+
+    def update(self, bar) -> dict:
+        x = bar[4]
+        self._window.append(x)
+        self._sum += x
+        if len(self._window) > self.period:
+            self._sum -= self._window.popleft()
+        return {"": self._sum / self.period if len(self._window) == self.period else _NAN}
+
+    def peek(self, bar) -> dict:
+        x = bar[4]
+        n = len(self._window) + 1
+        total = self._sum + x
+        if n > self.period:
+            total -= self._window[0]
+            n = self.period
+        return {"": total / self.period if n == self.period else _NAN}
+
+
+class EMA:
+    name = "ema"
+    title = "EMA"
+    defaults = (50,)
+    scale = PRICE_SCALE
+    colors = {"": "#9C27B0"}
+
+    def __init__(self, period=50):
+        self.period = int(period)
+        self.alpha = 2.0 / (self.period + 1)
+        self.value = None
+        self.count = 0
+
+    @staticmethod
+    def compute(bars, period=50) -> dict:
+        period = int(period)
+        raw = pd.Series(bars.close).ewm(span=period, adjust=False).mean().to_numpy()
+        out = raw.copy()
+        out[:period - 1] = np.nan
+        return {"": out, "_raw": raw}
+
+    def seed(self, bars, series, k: int):
+        self.count = k + 1
+        self.value = float(series["_raw"][k]) if k >= 0 else None
+        return self
+
+    def _next(self, x):
+        return x if self.value is None else self.value + self.alpha * (x - self.value)
+
+    def update(self, bar) -> dict:
+        self.value = self._next(bar[4])
+        self.count += 1
+        return {"": self.value if self.count >= self.period else _NAN}
+
+    def peek(self, bar) -> dict:
+        return {"": self._next(bar[4]) if self.count + 1 >= self.period else _NAN}
+
+
+class RSI:
+    name = "rsi"
+    title = "RSI"
+    defaults = (14,)
+    scale = "rsi"
+    colors = {"": "#7E57C2"}
+
+    def __init__(self, period=14):
+        self.period = int(period)
+        self.prev_close = None
+        self.avg_gain = None
+        self.avg_loss = None
+        self.count = 0
+
+    @staticmethod
+    def _rsi(avg_gain, avg_loss):
+        total = avg_gain + avg_loss
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(total > 0, 100.0 * avg_gain / np.where(total > 0, total, 1.0), np.nan)
+
+    @staticmethod
+    def compute(bars, period=14) -> dict:
+        period = int(period)
+        delta = np.diff(bars.close, prepend=np.nan)
+        avg_gain = _wilder(np.where(np.isnan(delta), np.nan, np.maximum(delta, 0.0)), period)
+        avg_loss = _wilder(np.where(np.isnan(delta), np.nan, np.maximum(-delta, 0.0)), period)
+        out = RSI._rsi(avg_gain, avg_loss)
+        out[:period] = np.nan
+        return {"": out, "_gain": avg_gain, "_loss": avg_loss}
+
+    def seed(self, bars, series, k: int):
+        self.count = k + 1
+        self.prev_close = float(bars.close[k]) if k >= 0 else None
+        self.avg_gain = float(series["_gain"][k]) if k >= 1 else None
+        self.avg_loss = float(series["_loss"][k]) if k >= 1 else None
+        return self
+
+    def _next(self, x):
+        if self.prev_close is None:
+            return None, None
+        gain = max(x - self.prev_close, 0.0)
+        loss = max(self.prev_close - x, 0.0)
+        if self.avg_gain is None:
+            return gain, loss
+        a = 1.0 / self.period
+        return self.avg_gain + a * (gain - self.avg_gain), self.avg_loss + a * (loss - self.avg_loss)
+
+    def _value(self, avg_gain, avg_loss, count):
+        if avg_gain is None or count <= self.period or avg_gain + avg_loss <= 0:
+            return _NAN
+        return 100.0 * avg_gain / (avg_gain + avg_loss)
+
+    def update(self, bar) -> dict:
+        self.avg_gain, self.avg_loss = self._next(bar[4])
+        self.prev_close = bar[4]
+        self.count += 1
+        return {"": self._value(self.avg_gain, self.avg_loss, self.count)}
+
+    def peek(self, bar) -> dict:
+        avg_gain, avg_loss = self._next(bar[4])
+        return {"": self._value(avg_gain, avg_loss, self.count + 1)}
+
+
+class BollingerBands:
+    name = "bb"
+    title = "BB"
+    defaults = (20, 2)
+    scale = PRICE_SCALE
+    colors = {"upper": "#26A69A", "mid": "#B0BEC5", "lower": "#26A69A"}
+
+    def __init__(self, period=20, width=2):
+        self.period = int(period)
+        self.width = float(width)
+        self._window = deque(maxlen=self.period)
+
+    @staticmethod
+    def compute(bars, period=20, width=2) -> dict:
+        period = int(period)
+        close = pd.Series(bars.close)
+        mid = close.rolling(period).mean().to_numpy()
+        std = close.rolling(period).std(ddof=0).to_numpy()
+        return {"upper": mid + width * std, "mid": mid, "lower": mid - width * std}
+
+    def seed(self, bars, series, k: int):
+        self._window = deque(bars.close[max(k - self.period + 1, 0):k + 1].tolist(), maxlen=self.period)
+        return self
+
+    def _bands(self, values) -> dict:
+        if len(values) < self.period:
+            return {"upper": _NAN, "mid": _NAN, "lower": _NAN}
+        mid = math.fsum(values) / self.period
+        std = math.sqrt(math.fsum((v - mid) ** 2 for v in values) / self.period)
+        return {"upper": mid + self.width * std, "mid": mid, "lower": mid - self.width * std}
+
+    def update(self, bar) -> dict:
+        self._window.append(bar[4])
+        return self._bands(self._window)
+
+    def peek(self, bar) -> dict:
+        values = list(self._window)[1:] if len(self._window) == self.period else list(self._window)
+        values.append(bar[4])
+        return self._bands(values)
+
+
+class ATR:
+    name = "atr"
+    title = "ATR"
+    defaults = (14,)
+    scale = "atr"
+    colors = {"": "#795548"}
+
+    def __init__(self, period=14):
+        self.period = int(period)
+        self.prev_close = None
+        self.value = None
+        self.count = 0
+
+    @staticmethod
+    def compute(bars, period=14) -> dict:
+        period = int(period)
+        prev = np.concatenate([[np.nan], bars.close[:-1]])
+        tr = np.fmax(bars.high - bars.low, np.fmax(np.abs(bars.high - prev), np.abs(bars.low - prev)))
+        raw = _wilder(tr, period)
+        out = raw.copy()
+        out[:period - 1] = np.nan
+        return {"": out, "_raw": raw}
+
+    def seed(self, bars, series, k: int):
+        self.count = k + 1
+        self.prev_close = float(bars.close[k]) if k >= 0 else None
+        self.value = float(series["_raw"][k]) if k >= 0 else None
+        return self
+
+    def _next(self, bar):
+        high, low = bar[2], bar[3]
+        tr = high - low
+        if self.prev_close is not None:
+            tr = max(tr, abs(high - self.prev_close), abs(low - self.prev_close))
+        return tr if self.value is None else self.value + (tr - self.value) / self.period
+
+    def update(self, bar) -> dict:
+        self.value = self._next(bar)
+        self.prev_close = bar[4]
+        self.count += 1
+        return {"": self.value if self.count >= self.period else _NAN}
+
+    def peek(self, bar) -> dict:
+        return {"": self._next(bar) if self.count + 1 >= self.period else _NAN}
+
+
+class VWAP:
+    """anchor 시간(기본 24시간, UTC 기준)마다 누적을 새로 시작하는 VWAP."""
+
+    name = "vwap"
+    title = "VWAP"
+    defaults = (24,)
+    scale = PRICE_SCALE
+    colors = {"": "#00BCD4"}
+
+    def __init__(self, anchor_hours=24):
+        self.anchor = int(anchor_hours) * 3600
+        self.bucket = None
+        self.pv = 0.0
+        self.v = 0.0
+
+    @staticmethod
+    def compute(bars, anchor_hours=24) -> dict:
+        anchor = int(anchor_hours) * 3600
+        typical = (bars.high + bars.low + bars.close) / 3
+        groups = pd.Series(bars.time // anchor)
+        pv = pd.Series(typical * bars.volume).groupby(groups).cumsum().to_numpy()
+        v = pd.Series(bars.volume).groupby(groups).cumsum().to_numpy()
+        with np.errstate(invalid="ignore", divide="ignore"):
+            out = np.where(v > 0, pv / np.where(v > 0, v, 1.0), typical)
+        return {"": out, "_pv": pv, "_v": v}
+
+    def seed(self, bars, series, k: int):
+        if k < 0:
+            self.bucket, self.pv, self.v = None, 0.0, 0.0
+        else:
+            self.bucket = int(bars.time[k]) // self.anchor
+            self.pv = float(series["_pv"][k])
+            self.v = float(series["_v"][k])
+        return self
+
+    def _next(self, bar):
+        bucket = bar[0] // self.anchor
+        typical = (bar[2] + bar[3] + bar[4]) / 3
+        pv, v = (self.pv, self.v) if bucket == self.bucket else (0.0, 0.0)
+        pv += typical * bar[5]
+        v += bar[5]
+        return bucket, pv, v, (pv / v if v > 0 else typical)
+
+    def update(self, bar) -> dict:
+        self.bucket, self.pv, self.v, value = self._next(bar)
+        return {"": value}
+
+    def peek(self, bar) -> dict:
+        return {"": self._next(bar)[3]}
+
+
+INDICATORS = {cls.name: cls for cls in (SMA, EMA, BollingerBands, VWAP, RSI, ATR)}
+
+
+def spec_key(name: str, *params) -> str:
+    """"sma:20", "bb:20:2" 같은 지표 키."""
+    params = params or INDICATORS[name].defaults
+    return ":".join([name, *(f"{p:g}" if isinstance(p, float) else str(p) for p in params)])
+
+
+def parse_key(key: str):
+    name, *params = key.split(":")
+    cls = INDICATORS[name]
+    values = [int(float(p)) if isinstance(d, int) else float(p) for d, p in zip(cls.defaults, params)]
+    return cls, tuple(values) + cls.defaults[len(values):]
+
+
+# =====================
+# 소스별 지표 캐시 (프로세스 공용)
+# =====================
+class IndicatorSet:
+    """한 봉 배열(기본 1h 또는 상위 타임프레임)에 대한 지표 전체 구간 값을 키별로 캐시한다."""
+
+    def __init__(self, bars: Bars, max_specs: int = 32):
+        self.bars = bars
+        self.max_specs = max_specs
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def series(self, key: str) -> dict:
+        with self._lock:
+            values = self._cache.get(key)
+            if values is not None:
+                self._cache.move_to_end(key)
+                return values
+        cls, params = parse_key(key)
+        values = cls.compute(self.bars, *params)
+        for arr in values.values():
+            arr.setflags(write=False)
+        with self._lock:
+            self._cache[key] = values
+            while len(self._cache) > self.max_specs:
+                self._cache.popitem(last=False)
+        return values
+
+    def state_at(self, key: str, k: int):
+        """k 번째 봉까지 반영된 스트리밍 상태 (k=-1 이면 빈 상태)."""
+        cls, params = parse_key(key)
+        return cls(*params).seed(self.bars, self.series(key), k)
+
+    def window(self, key: str, b0: int, b1: int, partial=None) -> dict:
+        """봉 [b0:b1] 의 지표 값 + (있으면) 진행 중 봉 partial 의 값. {선 이름: (time, value)}"""
+        series = self.series(key)
+        times = self.bars.time[b0:b1]
+        out = {line: (times, values[b0:b1]) for line, values in series.items() if not line.startswith("_")}
+        if partial is not None:
+            last = self.state_at(key, b1 - 1).peek(partial)
+            out = {
+                line: (np.append(t, partial[0]), np.append(v, last[line]))
+                for line, (t, v) in out.items()
+            }
+        return out
+
+
+# =====================
+# 차트 오버레이 페이로드
+# =====================
+def _encode_points(times, values) -> str:
+    ok = ~np.isnan(values)
+    return json.dumps(
+        {"time": np.asarray(times)[ok].tolist(), "value": np.asarray(values)[ok].tolist()},
+        separators=(",", ":"),
+    )
+
+
+class IndicatorOverlay:
+    """차트 소스(CandleEncoder / TimeframeLevel)와 같은 (start, end) 인터페이스로 지표 선을 만든다.
+
+    소스의 span(start, end) 는 (b0, b1, 진행 중 봉 또는 None) 을 돌려준다.
+    """
+
+    def __init__(self, source, indicator_set: IndicatorSet, keys):
+        self.source = source
+        self.indicators = indicator_set
+        self.keys = tuple(keys)
+        self.key = (source.key, self.keys)
+
+    def _lines(self, span):
+        for key in self.keys:
+            cls, params = parse_key(key)
+            label = " ".join([cls.title, *(f"{p:g}" for p in params)])
+            for line, (times, values) in self.indicators.window(key, *span).items():
+                yield {
+                    "id": f"{key}:{line}" if line else key,
+                    "title": label if line in ("", "mid") else "",
+                    "color": cls.colors[line],
+                    "scale": cls.scale,
+                }, times, values
+
+    def encode(self, start: int, end: int) -> list:
+        return [
+            dict(style, data=_encode_points(times, values))
+            for style, times, values in self._lines(self.source.span(start, end))
+        ]
+
+    def encode_range(self, start: int, end: int) -> dict:
+        return {
+            style["id"]: _encode_points(times, values)
+            for style, times, values in self._lines(self.source.span_range(start, end))
+        }
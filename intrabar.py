@@ -0,0 +1,37 @@
+import numpy as np
+
+from timeframes import HOUR_MS
+
+
+# =====================
+# 1시간봉 → 1분봉 행 범위 인덱스
+# =====================
+class MinuteIndex:
+    """기본 캔들 i 에 속한 1분봉 행 범위 [lo[i], hi[i]) 를 한 번 계산해 둔다.
+
+    체결 경로가 필요할 때는 그 시간의 1분봉(보통 60행)만 슬라이스하므로
+    1분봉 저장소는 memory-map / 청크 카탈로그 그대로 두어도 된다.
+    """
+
+    __slots__ = ("minutes", "lo", "hi")
+
+    def __init__(self, hours, minutes, period_ms: int = HOUR_MS):
+        self.minutes = minutes
+        t = np.asarray(hours.open_time, dtype=np.int64)
+        if hasattr(minutes, "locate_many"):
+            locate = minutes.locate_many
+        else:
+            minute_time = np.asarray(minutes.open_time, dtype=np.int64)
+
+            def locate(x):
+                return np.searchsorted(minute_time, x)
+        self.lo = locate(t)
+        self.hi = locate(t + period_ms)
+
+    def path(self, i: int):
+        """i 번째 캔들 안의 1분봉 (open, low, high, close) 목록. 1분봉이 없으면 None."""
+        lo, hi = int(self.lo[i]), int(self.hi[i])
+        if lo >= hi:
+            return None
+        m = self.minutes
+        return list(zip(m.open[lo:hi].tolist(), m.low[lo:hi].tolist(), m.high[lo:hi].tolist(), m.close[lo:hi].tolist()))
@@ -0,0 +1,36 @@
+import argparse
+
+from storage import LEADERBOARD_METRICS, STORE_FILE, SUPABASE_SUMMARY_SQL, SQLiteTradeStore
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Session leaderboard backed by the session_summary table.")
+    parser.add_argument("--sqlite", default=STORE_FILE, help="SQLite trade store path")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("rollup", help="recompute summaries of sessions missing or behind trade_log")
+    top = sub.add_parser("top", help="print one page of the leaderboard")
+    top.add_argument("--metric", choices=list(LEADERBOARD_METRICS), default="total_pnl")
+    top.add_argument("--limit", type=int, default=20)
+    top.add_argument("--offset", type=int, default=0)
+    top.add_argument("--min-trades", type=int, default=1)
+    # Supabase(Postgres)에서는 SQL 편집기에서 실행하고, 일괄 갱신은 select rollup_session_summary(); 로 한다
+    sub.add_parser("ddl", help="print the Postgres/Supabase summary table, trigger and rollup function")
+    args = parser.parse_args(argv)
+
+    if args.command == "ddl":
+        print(SUPABASE_SUMMARY_SQL.strip())
+        return
+    store = SQLiteTradeStore(args.sqlite)
+    if args.command == "rollup":
+        print(f"{store.rollup_summaries()} sessions updated")
+        return
+    rows = store.leaderboard(args.metric, args.limit, args.offset, args.min_trades)
+    for rank, row in enumerate(rows, args.offset + 1):
+        print(
+            f"{rank:>5}  {row['session_id'][:8]}  trades {row['trades']:>6}  pnl {row['total_pnl']:>12,.2f}  "
+            f"win {row['win_rate'] * 100:6.2f}%  mdd {row['max_drawdown'] * 100:6.2f}%"
+        )
+
+
+if __name__ == "__main__":
+    main()
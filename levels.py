@@ -0,0 +1,103 @@
+import numpy as np
+
+
+# =====================
+# 구간 최대/최소 (sparse table)
+# =====================
+class SparseTable:
+    """O(n log n) 전처리 후 [lo, hi) 구간 최대(또는 최소)를 O(1) 로 답한다."""
+
+    def __init__(self, values, op=np.maximum):
+        self.op = op
+        table = [np.asarray(values, dtype=np.float64)]
+        span = 1
+        while span * 2 <= len(table[0]):
+            prev = table[-1]
+            table.append(op(prev[:-span], prev[span:]))
+            span *= 2
+        self.table = table
+
+    def query(self, lo: int, hi: int) -> float:
+        j = int(hi - lo).bit_length() - 1
+        t = self.table[j]
+        return self.op(t[lo], t[hi - (1 << j)])
+
+    def query_many(self, lo, hi):
+        """lo/hi 배열에 대한 구간 값 (hi > lo 인 원소만 유효)."""
+        lo = np.asarray(lo, dtype=np.int64)
+        hi = np.asarray(hi, dtype=np.int64)
+        length = np.maximum(hi - lo, 1)
+        level = np.floor(np.log2(length)).astype(np.int64)
+        out = np.empty(len(lo))
+        for j in np.unique(level):
+            m = level == j
+            t = self.table[j]
+            out[m] = self.op(t[lo[m]], t[hi[m] - (1 << j)])
+        return out
+
+
+# =====================
+# 스윙 고점/저점 인덱스 (전체 구간 1회 계산)
+# =====================
+class PivotIndex:
+    """좌우 k 캔들 안에서 가장 높은 고가 / 가장 낮은 저가를 피벗으로 잡는다.
+
+    피벗 i 는 i+k 캔들까지 봐야 확정되므로 윈도우 끝(end) 기준 i < end-k 인 피벗만 쓴다.
+    """
+
+    def __init__(self, store, k: int = 5, tolerance: float = 0.003):
+        self.k = k
+        self.tolerance = tolerance
+        high = np.asarray(store.high, dtype=np.float64)
+        low = np.asarray(store.low, dtype=np.float64)
+        self.max_high = SparseTable(high, np.maximum)
+        self.min_low = SparseTable(low, np.minimum)
+
+        n = len(high)
+        i = np.arange(k, n - k)
+        if len(i):
+            # 같은 값이 이어지면 첫 캔들만 피벗 (왼쪽은 strict)
+            is_high = (high[i] >= self.max_high.query_many(i, i + k + 1)) & (high[i] > self.max_high.query_many(i - k, i))
+            is_low = (low[i] <= self.min_low.query_many(i, i + k + 1)) & (low[i] < self.min_low.query_many(i - k, i))
+        else:
+            is_high = is_low = np.zeros(0, dtype=bool)
+        self.high_idx = i[is_high]
+        self.low_idx = i[is_low]
+        self.high_price = high[self.high_idx]
+        self.low_price = low[self.low_idx]
+
+    def _unbroken(self, idx, price, end: int, table: SparseTable, above: bool):
+        # 피벗 이후 end 까지 가격이 tolerance 넘게 뚫지 않은 피벗만 남긴다
+        has_after = idx + 1 < end
+        after = table.query_many(np.minimum(idx + 1, end - 1), np.full(len(idx), end))
+        if above:
+            ok = after <= price * (1 + self.tolerance)
+        else:
+            ok = after >= price * (1 - self.tolerance)
+        return ok | ~has_after
+
+    def levels(self, start: int, end: int, price: float, count: int = 3):
+        """[start:end] 윈도우에서 현재가 아래 지지선 / 위 저항선을 가까운 순으로 count 개씩."""
+        last = end - self.k
+        a, b = np.searchsorted(self.low_idx, [start, last])
+        idx, p = self.low_idx[a:b], self.low_price[a:b]
+        keep = self._unbroken(idx, p, end, self.min_low, above=False) & (p <= price)
+        support = cluster(p[keep], self.tolerance)
+
+        a, b = np.searchsorted(self.high_idx, [start, last])
+        idx, p = self.high_idx[a:b], self.high_price[a:b]
+        keep = self._unbroken(idx, p, end, self.max_high, above=True) & (p >= price)
+        resistance = cluster(p[keep], self.tolerance)
+
+        support = sorted(support, key=lambda x: price - x)[:count]
+        resistance = sorted(resistance, key=lambda x: x - price)[:count]
+        return support, resistance
+
+
+def cluster(prices, tolerance: float) -> list:
+    """tolerance 비율 안에 붙어 있는 가격을 하나의 레벨(평균)로 묶는다."""
+    prices = np.sort(np.asarray(prices, dtype=np.float64))
+    if not len(prices):
+        return []
+    breaks = np.flatnonzero(np.diff(prices) > prices[:-1] * tolerance) + 1
+    return [round(float(group.mean()), 2) for group in np.split(prices, breaks)]
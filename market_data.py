@@ -0,0 +1,215 @@
+import argparse
+import os
+import struct
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CSV_FILE = os.path.join(BASE_DIR, "btc_1h.csv")
+BIN_FILE = os.path.join(BASE_DIR, "btc_1h.candles")
+
+OHLCV_COLUMNS = ("open", "high", "low", "close", "volume")
+
+# =====================
+# 바이너리 포맷 (리틀엔디언, 컬럼 단위)
+# =====================
+# [헤더 64B: magic 8B | version u32 | column 수 u32 | row 수 u64 | 패딩]
+# [open_time int64 × n][open f64 × n][high][low][close][volume]
+MAGIC = b"TSCANDLE"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<8sIIQ")
+HEADER_SIZE = 64
+
+
+# =====================
+# 타임스탬프 정규화 (s / ms / us → epoch ms)
+# =====================
+def to_epoch_ms(values) -> np.ndarray:
+    """숫자형 open_time 을 epoch ms(float64, 실패는 NaN)로 변환한다."""
+    t = pd.to_numeric(pd.Series(values), errors="coerce").to_numpy(dtype="float64")
+    # 1e14 초과는 마이크로초, 1e12 초과는 밀리초, 그 외는 초 단위로 본다
+    return np.where(t > 1e14, t / 1e3, np.where(t > 1e12, t, t * 1e3))
+
+
+# =====================
+# 공용 캔들 저장소 (프로세스당 1개, 읽기 전용)
+# =====================
+class CandleStore:
+    """open_time(epoch ms) 오름차순으로 정렬된 연속 OHLCV NumPy 배열 묶음."""
+
+    __slots__ = ("open_time", "open", "high", "low", "close", "volume")
+
+    def __init__(self, open_time, open, high, low, close, volume):
+        columns = {
+            "open_time": np.ascontiguousarray(open_time, dtype=np.int64),
+            "open": np.ascontiguousarray(open, dtype=np.float64),
+            "high": np.ascontiguousarray(high, dtype=np.float64),
+            "low": np.ascontiguousarray(low, dtype=np.float64),
+            "close": np.ascontiguousarray(close, dtype=np.float64),
+            "volume": np.ascontiguousarray(volume, dtype=np.float64),
+        }
+        n = len(columns["open_time"])
+        for name, arr in columns.items():
+            if arr.ndim != 1 or len(arr) != n:
+                raise ValueError(f"column '{name}' must be 1-D with {n} rows")
+            if arr.flags.writeable:
+                arr.setflags(write=False)
+            object.__setattr__(self, name, arr)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("CandleStore is immutable")
+
+    def __reduce__(self):
+        # __setattr__ 를 막았으므로 pickle 은 __init__ 으로 다시 만든다 (memmap 컬럼은 배열로 복사된다)
+        return CandleStore, tuple(getattr(self, name) for name in self.__slots__)
+
+    def __len__(self):
+        return len(self.open_time)
+
+    # 차트/체결은 초 단위 시간을 사용한다
+    def time_at(self, idx: int) -> int:
+        return int(self.open_time[idx]) // 1000
+
+    def times(self, start: int, end: int) -> np.ndarray:
+        return self.open_time[start:end] // 1000
+
+    def frame(self, start: int = 0, end: int = None) -> pd.DataFrame:
+        """[start:end] 구간을 기존 df_chart 와 같은 모양의 DataFrame 으로 반환한다."""
+        sl = slice(start, end)
+        index = pd.to_datetime(self.open_time[sl], unit="ms")
+        index.name = "open_time"
+        return pd.DataFrame(
+            {name: getattr(self, name)[sl] for name in OHLCV_COLUMNS},
+            index=index,
+        )
+
+
+def load_csv(path: str = CSV_FILE) -> CandleStore:
+    df = pd.read_csv(path)
+    open_time = to_epoch_ms(df["open_time"])
+    valid = ~np.isnan(open_time)
+    # 동일 시각은 파일 순서를 유지하도록 안정 정렬
+    order = np.argsort(open_time[valid], kind="stable")
+    volume = df["volume"] if "volume" in df else np.zeros(len(df))
+    return CandleStore(
+        np.rint(open_time[valid][order]),
+        df["open"].to_numpy(dtype="float64")[valid][order],
+        df["high"].to_numpy(dtype="float64")[valid][order],
+        df["low"].to_numpy(dtype="float64")[valid][order],
+        df["close"].to_numpy(dtype="float64")[valid][order],
+        np.asarray(volume, dtype="float64")[valid][order],
+    )
+
+
+# =====================
+# CSV → 바이너리 변환 (1회성)
+# =====================
+def clean_candles(open_time_ms, ohlcv: dict):
+    """유효하지 않은 행을 버리고 시간 중복을 제거한 뒤 (open_time, ohlcv, 통계)를 반환한다."""
+    o, h, l, c, v = (np.asarray(ohlcv[k], dtype="float64") for k in OHLCV_COLUMNS)
+    t = np.asarray(open_time_ms, dtype="float64")
+
+    valid = np.isfinite(t) & np.isfinite(o) & np.isfinite(h) & np.isfinite(l) & np.isfinite(c)
+    valid &= (l > 0) & (h >= l) & (h >= np.maximum(o, c)) & (l <= np.minimum(o, c))
+    valid &= ~(v < 0)
+    dropped_invalid = int((~valid).sum())
+
+    t = np.rint(t[valid]).astype(np.int64)
+    order = np.argsort(t, kind="stable")
+    t = t[order]
+    cols = {k: arr[valid][order] for k, arr in zip(OHLCV_COLUMNS, (o, h, l, c, v))}
+    cols["volume"] = np.nan_to_num(cols["volume"], nan=0.0)
+
+    # 같은 시각이 여러 번 나오면 파일에서 나중에 나온 행을 남긴다
+    keep = np.ones(len(t), dtype=bool)
+    keep[:-1] = t[1:] != t[:-1]
+    dropped_duplicate = int((~keep).sum())
+    t = t[keep]
+    cols = {k: arr[keep] for k, arr in cols.items()}
+
+    stats = {
+        "rows": int(len(t)),
+        "dropped_invalid": dropped_invalid,
+        "dropped_duplicate": dropped_duplicate,
+    }
+    return t, cols, stats
+
+
+def write_binary(path: str, open_time_ms, ohlcv: dict):
+    t = np.ascontiguousarray(open_time_ms, dtype="<i8")
+    if len(t) > 1 and not np.all(t[1:] > t[:-1]):
+        raise ValueError("open_time must be strictly increasing")
+
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, 1 + len(OHLCV_COLUMNS), len(t)).ljust(HEADER_SIZE, b"\0"))
+        f.write(t.tobytes())
+        for name in OHLCV_COLUMNS:
+            col = np.ascontiguousarray(ohlcv[name], dtype="<f8")
+            if len(col) != len(t):
+                raise ValueError(f"column '{name}' has {len(col)} rows, expected {len(t)}")
+            f.write(col.tobytes())
+    # 여러 워커가 동시에 변환해도 완성된 파일만 보이도록 교체한다
+    os.replace(tmp_path, path)
+
+
+def convert_csv(csv_path: str = CSV_FILE, out_path: str = BIN_FILE) -> dict:
+    df = pd.read_csv(csv_path)
+    ohlcv = {k: df[k] if k in df else np.zeros(len(df)) for k in OHLCV_COLUMNS}
+    t, cols, stats = clean_candles(to_epoch_ms(df["open_time"]), ohlcv)
+    write_binary(out_path, t, cols)
+    return stats
+
+
+# =====================
+# 바이너리 로드 (memory-map)
+# =====================
+def load_binary(path: str = BIN_FILE) -> CandleStore:
+    with open(path, "rb") as f:
+        magic, version, n_columns, n_rows = HEADER.unpack(f.read(HEADER.size))
+    if magic != MAGIC:
+        raise ValueError(f"{path}: not a candle file")
+    if version != FORMAT_VERSION or n_columns != 1 + len(OHLCV_COLUMNS):
+        raise ValueError(f"{path}: unsupported format version {version}")
+    expected = HEADER_SIZE + n_rows * 8 * n_columns
+    if os.path.getsize(path) != expected:
+        raise ValueError(f"{path}: truncated file ({os.path.getsize(path)} != {expected} bytes)")
+
+    # OS 페이지 캐시를 통해 같은 파일을 여는 모든 프로세스가 페이지를 공유한다
+    def column(i, dtype):
+        return np.memmap(path, dtype=dtype, mode="r", offset=HEADER_SIZE + i * n_rows * 8, shape=(n_rows,))
+
+    if n_rows == 0:
+        return CandleStore(*([np.empty(0)] * n_columns))
+    return CandleStore(
+        column(0, "<i8"),
+        *(column(i + 1, "<f8") for i in range(len(OHLCV_COLUMNS))),
+    )
+
+
+def load_candles(csv_path: str = CSV_FILE, bin_path: str = BIN_FILE) -> CandleStore:
+    """바이너리가 없거나 CSV 보다 오래됐으면 먼저 변환한 뒤 memory-map 으로 연다."""
+    if not os.path.exists(bin_path) or (
+        os.path.exists(csv_path) and os.path.getmtime(csv_path) > os.path.getmtime(bin_path)
+    ):
+        convert_csv(csv_path, bin_path)
+    return load_binary(bin_path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert an OHLCV CSV into the memory-mapped candle format.")
+    parser.add_argument("csv", nargs="?", default=CSV_FILE)
+    parser.add_argument("out", nargs="?", default=None)
+    args = parser.parse_args(argv)
+
+    out = args.out or os.path.splitext(args.csv)[0] + ".candles"
+    stats = convert_csv(args.csv, out)
+    print(
+        f"{out}: {stats['rows']} rows "
+        f"(dropped {stats['dropped_invalid']} invalid, {stats['dropped_duplicate']} duplicate)"
+    )
+
+
+if __name__ == "__main__":
+    main()
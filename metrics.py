@@ -0,0 +1,194 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from contextlib import contextmanager, nullcontext
+
+_NULL = nullcontext()
+_local = threading.local()
+
+
+# =====================
+# rerun 1회 기록
+# =====================
+class Recorder:
+    """한 rerun 동안의 구간별 시간, 직렬화 바이트, 원격 호출 수."""
+
+    __slots__ = ("session", "started", "wall", "sections", "bytes", "calls", "status")
+
+    def __init__(self, session: str):
+        self.session = session
+        self.started = time.time()
+        self.wall = time.perf_counter()
+        self.sections = defaultdict(float)
+        self.bytes = defaultdict(int)
+        self.calls = defaultdict(int)
+        self.status = None
+
+    @contextmanager
+    def section(self, name: str):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.sections[name] += time.perf_counter() - t0
+
+    def finish(self, status: str) -> dict:
+        self.status = status
+        return {
+            "ts": round(self.started, 3),
+            "session": self.session,
+            "status": status,
+            "wall_ms": round((time.perf_counter() - self.wall) * 1e3, 3),
+            "sections_ms": {k: round(v * 1e3, 3) for k, v in self.sections.items()},
+            "bytes": dict(self.bytes),
+            "calls": dict(self.calls),
+        }
+
+
+# =====================
+# 모듈 함수 (현재 스레드의 Recorder 에 기록, 꺼져 있으면 아무것도 안 함)
+# =====================
+def current():
+    return getattr(_local, "recorder", None)
+
+
+def section(name: str):
+    rec = getattr(_local, "recorder", None)
+    return _NULL if rec is None else rec.section(name)
+
+
+def add_bytes(name: str, n: int):
+    rec = getattr(_local, "recorder", None)
+    if rec is not None:
+        rec.bytes[name] += n
+
+
+def count_call(name: str):
+    rec = getattr(_local, "recorder", None)
+    if rec is not None:
+        rec.calls[name] += 1
+
+
+def begin(session: str, state: dict, sink) -> Recorder:
+    """rerun 시작. end() 없이 끝난 이전 rerun(st.stop, 예외 등)은 status="rerun" 으로 마감한다."""
+    previous = state.get("_metrics_recorder")
+    if previous is not None and previous.status is None:
+        sink.write(previous.finish("rerun"))
+    rec = Recorder(session)
+    state["_metrics_recorder"] = rec
+    _local.recorder = rec
+    return rec
+
+
+def end(state: dict, sink, status: str = "ok") -> dict:
+    """rerun 마감. st.rerun() 으로 끊기 직전에는 status="rerun" 으로 부른다."""
+    rec = state.get("_metrics_recorder")
+    _local.recorder = None
+    if rec is None or rec.status is not None:
+        return None
+    record = rec.finish(status)
+    sink.write(record)
+    return record
+
+
+# =====================
+# 원격 호출 계측 래퍼
+# =====================
+class CountingStore:
+    """저장소 메서드 호출을 현재 rerun 의 원격 호출 수로 센다."""
+
+    def __init__(self, store):
+        self._store = store
+
+    def __getattr__(self, name):
+        attr = getattr(self._store, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            count_call(name)
+            with section(f"store.{name}"):
+                return attr(*args, **kwargs)
+        return call
+
+
+# =====================
+# 내보내기 (JSON-lines + Prometheus text, 프로세스 공용)
+# =====================
+class MetricsSink:
+    """rerun 기록을 jsonl_path 에 한 줄씩 추가하고, 누적값을 prom_path 에 Prometheus 텍스트로 쓴다.
+
+    prom 파일은 node_exporter textfile collector 등으로 수집한다 (prom_interval 초마다 교체).
+    last 는 최근 last_sessions 개 세션의 마지막 기록만 남긴다 (끝난 세션이 쌓이지 않도록 LRU).
+    """
+
+    def __init__(self, jsonl_path: str = None, prom_path: str = None, prom_interval: float = 5.0, gauges=None,
+                 last_sessions: int = 256):
+        self.jsonl_path = jsonl_path
+        self.prom_path = prom_path
+        self.prom_interval = prom_interval
+        self.gauges = gauges
+        self.last = OrderedDict()
+        self.last_sessions = last_sessions
+        self._lock = threading.Lock()
+        self._reruns = defaultdict(int)
+        self._wall = [0.0, 0]
+        self._sections = defaultdict(lambda: [0.0, 0])
+        self._bytes = defaultdict(int)
+        self._calls = defaultdict(int)
+        self._prom_written = 0.0
+
+    def write(self, record: dict):
+        with self._lock:
+            self.last[record["session"]] = record
+            self.last.move_to_end(record["session"])
+            while len(self.last) > self.last_sessions:
+                self.last.popitem(last=False)
+            self._reruns[record["status"]] += 1
+            self._wall[0] += record["wall_ms"] / 1e3
+            self._wall[1] += 1
+            for k, v in record["sections_ms"].items():
+                self._sections[k][0] += v / 1e3
+                self._sections[k][1] += 1
+            for k, v in record["bytes"].items():
+                self._bytes[k] += v
+            for k, v in record["calls"].items():
+                self._calls[k] += v
+            if self.jsonl_path:
+                with open(self.jsonl_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(record, separators=(",", ":")) + "\n")
+            now = time.monotonic()
+            if self.prom_path and now - self._prom_written >= self.prom_interval:
+                self._prom_written = now
+                tmp = f"{self.prom_path}.tmp{os.getpid()}"
+                with open(tmp, "w", encoding="utf-8") as f:
+                    f.write(self._prometheus())
+                os.replace(tmp, self.prom_path)
+
+    def prometheus(self) -> str:
+        with self._lock:
+            return self._prometheus()
+
+    def _prometheus(self) -> str:
+        lines = [
+            "# TYPE trading_sim_reruns_total counter",
+            *(f'trading_sim_reruns_total{{status="{k}"}} {v}' for k, v in self._reruns.items()),
+            "# TYPE trading_sim_rerun_seconds summary",
+            f"trading_sim_rerun_seconds_sum {self._wall[0]:.6f}",
+            f"trading_sim_rerun_seconds_count {self._wall[1]}",
+            "# TYPE trading_sim_section_seconds summary",
+        ]
+        for k, (total, count) in sorted(self._sections.items()):
+            lines.append(f'trading_sim_section_seconds_sum{{section="{k}"}} {total:.6f}')
+            lines.append(f'trading_sim_section_seconds_count{{section="{k}"}} {count}')
+        lines.append("# TYPE trading_sim_serialized_bytes_total counter")
+        lines += [f'trading_sim_serialized_bytes_total{{payload="{k}"}} {v}' for k, v in sorted(self._bytes.items())]
+        lines.append("# TYPE trading_sim_remote_calls_total counter")
+        lines += [f'trading_sim_remote_calls_total{{call="{k}"}} {v}' for k, v in sorted(self._calls.items())]
+        if self.gauges is not None:
+            for name, value in self.gauges().items():
+                lines.append(f"# TYPE trading_sim_{name} gauge")
+                lines.append(f"trading_sim_{name} {value}")
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,218 @@
+import argparse
+import io
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import popen_spawn_posix, reduction, spawn, util
+from multiprocessing.context import SpawnContext, SpawnProcess, set_spawning_popen
+
+import numpy as np
+import pandas as pd
+
+from engine import START_BALANCE
+from storage import STORE_FILE, SQLiteTradeStore
+
+BOOTSTRAP = "bootstrap"
+SHUFFLE = "shuffle"
+METHODS = (BOOTSTRAP, SHUFFLE)
+
+# 시작 잔고 대비 이 비율 이하로 떨어지면 파산으로 보고 거래를 멈춘다
+RUIN_FRACTION = 0.1
+# 워커 1회 작업의 (경로 × 거래) 원소 수 상한
+CHUNK_ELEMENTS = 2_000_000
+
+RETURN_COLUMNS = ["pnl_dollar", "entry_capital", "leverage", "idempotency_key"]
+
+
+# =====================
+# trade_log → 레버리지 1배 기준 수익률
+# =====================
+def base_returns(rows) -> np.ndarray:
+    """pnl_dollar / entry_capital 을 그 거래의 레버리지로 나눠 가격 변화율로 되돌린다."""
+    out = []
+    for row in rows:
+        capital = row.get("entry_capital") or 0
+        if not capital:
+            continue
+        out.append(row["pnl_dollar"] / capital / (row.get("leverage") or 1))
+    return np.asarray(out, dtype=np.float64)
+
+
+# =====================
+# 경로 시뮬레이션 (워커)
+# =====================
+def _simulate_chunk(returns, scale, paths: int, horizon: int, method: str, balance: float,
+                    ruin_level: float, seed):
+    """(조합 수, paths) 최대 낙폭 / 최종 잔고 / 파산 여부. 조합끼리 같은 난수 경로를 쓴다."""
+    rng = np.random.default_rng(seed)
+    if method == BOOTSTRAP:
+        sample = returns[rng.integers(0, len(returns), (paths, horizon))]
+    else:
+        sample = rng.permuted(np.broadcast_to(returns, (paths, len(returns))), axis=1)[:, :horizon]
+
+    steps = np.arange(horizon)
+    mdd = np.empty((len(scale), paths))
+    final = np.empty((len(scale), paths))
+    ruined = np.empty((len(scale), paths), dtype=bool)
+    for j, s in enumerate(scale):
+        # close_position 과 같은 복리: 잔고 × 비중 × 레버리지 × 가격 변화율
+        path = balance * np.cumprod(np.maximum(1.0 + s * sample, 0.0), axis=1)
+        peak = np.maximum(np.maximum.accumulate(path, axis=1), balance)
+        drawdown = (peak - path) / peak
+        hit = path <= ruin_level
+        ruin = hit.any(axis=1)
+        if ruin.any():
+            # 파산한 경로는 그 시점 잔고에서 멈춘다 (이후 구간은 낙폭/최종 잔고에서 제외)
+            first = np.where(ruin, hit.argmax(axis=1), horizon - 1)
+            drawdown[steps > first[:, None]] = 0.0
+            final[j] = path[np.arange(paths), first]
+        else:
+            final[j] = path[:, -1]
+        mdd[j] = drawdown.max(axis=1)
+        ruined[j] = ruin
+    return mdd, final, ruined
+
+
+# =====================
+# 워커 풀 (spawn, __main__ 재실행 없음)
+# =====================
+class _WorkerPopen(popen_spawn_posix.Popen):
+    """popen_spawn_posix.Popen 과 같고, 준비 데이터에서 __main__ 초기화 항목만 뺀다.
+
+    spawn 워커는 부모의 __main__ 을 다시 실행하는데 스트림릿에서는 그게 앱 스크립트다.
+    워커가 실행하는 함수는 모두 이 모듈에 있으므로 __main__ 없이 import 만으로 충분하다.
+    """
+
+    def _launch(self, process_obj):
+        from multiprocessing import resource_tracker
+        tracker_fd = resource_tracker.getfd()
+        self._fds.append(tracker_fd)
+        prep_data = spawn.get_preparation_data(process_obj._name)
+        prep_data.pop("init_main_from_path", None)
+        prep_data.pop("init_main_from_name", None)
+        fp = io.BytesIO()
+        set_spawning_popen(self)
+        try:
+            reduction.dump(prep_data, fp)
+            reduction.dump(process_obj, fp)
+        finally:
+            set_spawning_popen(None)
+
+        parent_r = child_w = child_r = parent_w = None
+        try:
+            parent_r, child_w = os.pipe()
+            child_r, parent_w = os.pipe()
+            cmd = spawn.get_command_line(tracker_fd=tracker_fd, pipe_handle=child_r)
+            self._fds.extend([child_r, child_w])
+            self.pid = util.spawnv_passfds(spawn.get_executable(), cmd, self._fds)
+            self.sentinel = parent_r
+            with open(parent_w, "wb", closefd=False) as f:
+                f.write(fp.getbuffer())
+        finally:
+            self.finalizer = util.Finalize(self, util.close_fds, [fd for fd in (parent_r, parent_w) if fd is not None])
+            for fd in (child_r, child_w):
+                if fd is not None:
+                    os.close(fd)
+
+
+class _WorkerProcess(SpawnProcess):
+    @staticmethod
+    def _Popen(process_obj):
+        return _WorkerPopen(process_obj)
+
+
+class WorkerContext(SpawnContext):
+    """앱 스크립트를 다시 실행하지 않는 spawn 컨텍스트 (ProcessPoolExecutor 의 mp_context 로 쓴다)."""
+    Process = _WorkerProcess
+
+
+def process_pool(max_workers: int) -> ProcessPoolExecutor:
+    """웹 서버 안에서 오래 쓸 spawn 워커 풀. 워커를 지금 모두 띄워 둔다.
+
+    fork 는 서버 스레드(write-behind, prefetch)가 쥔 락을 물려받을 수 있어 쓰지 않는다.
+    워커는 WorkerContext 로 띄우므로 전역 __main__ 을 건드리지 않는다.
+    """
+    pool = ProcessPoolExecutor(max_workers, mp_context=WorkerContext())
+    # spawn 풀은 submit 할 때 워커를 하나씩 띄운다
+    for f in [pool.submit(int) for _ in range(max_workers)]:
+        f.result()
+    return pool
+
+
+def simulate(returns, leverages, position_ratios, paths: int = 100_000, horizon: int = None,
+             method: str = BOOTSTRAP, balance: float = START_BALANCE, ruin_fraction: float = RUIN_FRACTION,
+             seed: int = 0, max_workers: int = None, pool=None, mp_context=None) -> dict:
+    """leverage × position_ratio 조합마다 paths 개 경로를 만들어 파산 확률과 분포를 요약한다.
+
+    bootstrap 은 실현 수익률을 복원 추출(horizon 개, 기본은 실현 거래 수), shuffle 은 같은 거래를
+    순서만 섞는다. 경로는 청크로 나눠 프로세스 풀에서 계산하고, 청크마다 SeedSequence 자식 시드를
+    쓰므로 워커 수와 관계없이 결과가 같다. pool 을 주면 그 풀을 쓰고 닫지 않는다.
+    """
+    returns = np.asarray(returns, dtype=np.float64)
+    if method not in METHODS:
+        raise ValueError(f"unknown method '{method}'")
+    if not len(returns):
+        raise ValueError("no realized trades to resample")
+    horizon = len(returns) if horizon is None or method == SHUFFLE else int(horizon)
+
+    combos = list(itertools.product(leverages, position_ratios))
+    scale = np.array([lev * ratio for lev, ratio in combos], dtype=np.float64)
+    ruin_level = balance * ruin_fraction
+
+    chunk_paths = max(1, CHUNK_ELEMENTS // horizon)
+    sizes = [min(chunk_paths, paths - i) for i in range(0, paths, chunk_paths)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    args = [(returns, scale, n, horizon, method, balance, ruin_level, s) for n, s in zip(sizes, seeds)]
+
+    max_workers = max_workers or os.cpu_count() or 1
+    if pool is not None:
+        parts = [f.result() for f in [pool.submit(_simulate_chunk, *a) for a in args]]
+    elif max_workers == 1 or len(args) == 1:
+        parts = [_simulate_chunk(*a) for a in args]
+    else:
+        with ProcessPoolExecutor(max_workers, mp_context=mp_context) as own:
+            parts = [f.result() for f in [own.submit(_simulate_chunk, *a) for a in args]]
+
+    mdd = np.concatenate([p[0] for p in parts], axis=1)
+    final = np.concatenate([p[1] for p in parts], axis=1)
+    ruined = np.concatenate([p[2] for p in parts], axis=1)
+
+    mdd_q = np.quantile(mdd, [0.5, 0.9, 0.99], axis=1)
+    final_q = np.quantile(final, [0.05, 0.25, 0.5, 0.75, 0.95], axis=1)
+    summary = pd.DataFrame({
+        "leverage": [c[0] for c in combos],
+        "position_ratio": [c[1] for c in combos],
+        "ruin_prob": ruined.mean(axis=1),
+        "mdd_p50": mdd_q[0], "mdd_p90": mdd_q[1], "mdd_p99": mdd_q[2],
+        "final_p5": final_q[0], "final_p25": final_q[1], "final_p50": final_q[2],
+        "final_p75": final_q[3], "final_p95": final_q[4],
+        "final_mean": final.mean(axis=1),
+    })
+    return {"summary": summary, "final": final, "mdd": mdd, "paths": paths, "horizon": horizon, "method": method}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Monte Carlo risk-of-ruin for a session's realized trades.")
+    parser.add_argument("--sqlite", default=STORE_FILE, help="SQLite trade store path")
+    parser.add_argument("--session", default=None, help="session id (default: latest session)")
+    parser.add_argument("--method", choices=METHODS, default=BOOTSTRAP)
+    parser.add_argument("--paths", type=int, default=100_000)
+    parser.add_argument("--horizon", type=int, default=None)
+    parser.add_argument("--leverage", type=float, nargs="+", default=[1, 5, 10, 25, 50, 100])
+    parser.add_argument("--ratio", type=float, nargs="+", default=[0.05, 0.1, 0.25, 0.5, 1.0])
+    parser.add_argument("--ruin", type=float, default=RUIN_FRACTION, help="ruin level as a fraction of the start balance")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    store = SQLiteTradeStore(args.sqlite)
+    session = args.session or store.active_session()
+    returns = base_returns(store.load_trades(session, RETURN_COLUMNS))
+    result = simulate(returns, args.leverage, args.ratio, args.paths, args.horizon, args.method,
+                      ruin_fraction=args.ruin, seed=args.seed, max_workers=args.workers)
+    print(f"{len(returns)} trades, {result['paths']} paths × {result['horizon']} trades ({result['method']})")
+    print(result["summary"].to_string(index=False, float_format=lambda x: f"{x:,.4g}"))
+
+
+if __name__ == "__main__":
+    main()
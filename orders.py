@@ -0,0 +1,132 @@
+from bisect import bisect_left, bisect_right
+
+LONG = "LONG"
+SHORT = "SHORT"
+
+LIMIT = "LIMIT"
+STOP = "STOP"
+
+_INF = float("inf")
+
+
+# =====================
+# 주문
+# =====================
+class Order:
+    """direction 은 포지션 방향. reduce_only 면 그 방향 포지션을 ratio 만큼 줄이는 청산 주문."""
+
+    __slots__ = ("id", "direction", "kind", "price", "ratio", "reduce_only", "active")
+
+    def __init__(self, direction: str, kind: str, price: float, ratio: float = 1.0, reduce_only: bool = False):
+        self.id = None
+        self.direction = direction
+        self.kind = kind
+        self.price = float(price)
+        self.ratio = ratio
+        self.reduce_only = reduce_only
+        self.active = True
+
+    @property
+    def is_buy(self) -> bool:
+        # LONG 진입 / SHORT 청산 = 매수
+        return (self.direction == LONG) != self.reduce_only
+
+    @property
+    def triggers_on_low(self) -> bool:
+        # 매수 지정가·매도 스탑은 가격이 내려와야(low <= price) 발동한다
+        return self.is_buy == (self.kind == LIMIT)
+
+    def __repr__(self):
+        tag = "EXIT" if self.reduce_only else "ENTRY"
+        return f"Order(#{self.id} {tag} {self.direction} {self.kind} @{self.price} x{self.ratio})"
+
+
+# =====================
+# 가격 정렬 주문장
+# =====================
+class OrderBook:
+    """low 로 발동하는 주문과 high 로 발동하는 주문을 (가격, id) 정렬 배열에 나눠 담는다.
+
+    캔들마다 bisect 로 발동 구간을 찾으므로 O(log n + k) 이다.
+    """
+
+    __slots__ = ("_low_keys", "_low", "_high_keys", "_high", "_by_id", "_seq")
+
+    def __init__(self):
+        self._low_keys = []
+        self._low = []
+        self._high_keys = []
+        self._high = []
+        self._by_id = {}
+        self._seq = 0
+
+    def __len__(self):
+        return len(self._by_id)
+
+    def __iter__(self):
+        return iter(sorted(self._by_id.values(), key=lambda o: o.id))
+
+    def add(self, order: Order) -> Order:
+        self._seq += 1
+        order.id = self._seq
+        key = (order.price, order.id)
+        keys, orders = (self._low_keys, self._low) if order.triggers_on_low else (self._high_keys, self._high)
+        i = bisect_right(keys, key)
+        keys.insert(i, key)
+        orders.insert(i, order)
+        self._by_id[order.id] = order
+        return order
+
+    def cancel(self, order_id: int) -> bool:
+        order = self._by_id.pop(order_id, None)
+        if order is None:
+            return False
+        order.active = False
+        keys, orders = (self._low_keys, self._low) if order.triggers_on_low else (self._high_keys, self._high)
+        i = bisect_left(keys, (order.price, order.id))
+        del keys[i]
+        del orders[i]
+        return True
+
+    def cancel_where(self, predicate) -> int:
+        ids = [o.id for o in self._by_id.values() if predicate(o)]
+        for order_id in ids:
+            self.cancel(order_id)
+        return len(ids)
+
+    def touched(self, low: float, high: float) -> bool:
+        """[low, high] 범위가 발동시킬 주문이 하나라도 있는지 (꺼내지 않고 확인만)."""
+        return bool(self._low_keys and self._low_keys[-1][0] >= low) or bool(self._high_keys and self._high_keys[0][0] <= high)
+
+    def clear(self):
+        for order in self._by_id.values():
+            order.active = False
+        self.__init__()
+
+    # ---------------------
+    # 발동 주문 꺼내기 (가격이 지나가는 순서대로)
+    # ---------------------
+    def pop_low(self, low: float) -> list:
+        """price >= low 인 주문을 높은 가격부터(하락 경로 순서) 꺼낸다."""
+        i = bisect_left(self._low_keys, (low, -1))
+        if i == len(self._low_keys):
+            return []
+        hit = self._low[i:]
+        del self._low_keys[i:]
+        del self._low[i:]
+        for order in hit:
+            del self._by_id[order.id]
+        hit.reverse()
+        return hit
+
+    def pop_high(self, high: float) -> list:
+        """price <= high 인 주문을 낮은 가격부터(상승 경로 순서) 꺼낸다."""
+        j = bisect_right(self._high_keys, (high, _INF))
+        if j == 0:
+            return []
+        hit = self._high[:j]
+        del self._high_keys[:j]
+        del self._high[:j]
+        for order in hit:
+            del self._by_id[order.id]
+        return hit
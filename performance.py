@@ -0,0 +1,193 @@
+import math
+from array import array
+
+import numpy as np
+
+from downsample import lttb
+
+# 레버리지 구간 상한 (이하)
+LEVERAGE_BUCKETS = (5, 10, 25, 50, 100)
+
+
+# =====================
+# 누적 매매 통계 (청산마다 O(1) 갱신)
+# =====================
+class TradeStats:
+    """trade_log 행 단위 누적 합계. 수익률(%) = pnl_dollar / entry_capital × 100.
+
+    세션 복원 때 한 번 채우고(seed) 이후에는 청산 행마다 add() 만 하므로
+    화면 갱신 때 trade_log 를 다시 읽을 필요가 없다.
+    """
+
+    __slots__ = (
+        "count", "wins", "losses", "return_sum", "return_sq_sum", "downside_sq_sum",
+        "win_return_sum", "loss_return_sum", "pnl_sum",
+    )
+
+    def __init__(self):
+        self.count = 0
+        self.wins = 0
+        self.losses = 0
+        self.return_sum = 0.0
+        self.return_sq_sum = 0.0
+        self.downside_sq_sum = 0.0
+        self.win_return_sum = 0.0
+        self.loss_return_sum = 0.0
+        self.pnl_sum = 0.0
+
+    def add(self, row: dict):
+        capital = row.get("entry_capital") or 0
+        if not capital:
+            return
+        r = row["pnl_dollar"] / capital * 100
+        self.count += 1
+        self.return_sum += r
+        self.return_sq_sum += r * r
+        self.pnl_sum += row["pnl_dollar"]
+        if r > 0:
+            self.wins += 1
+            self.win_return_sum += r
+        else:
+            self.losses += 1
+            self.loss_return_sum += r
+            self.downside_sq_sum += r * r
+
+    def seed(self, rows):
+        for row in rows:
+            self.add(row)
+        return self
+
+    @property
+    def avg_return(self) -> float:
+        return self.return_sum / self.count if self.count else 0.0
+
+    @property
+    def win_avg_return(self) -> float:
+        return self.win_return_sum / self.wins if self.wins else 0.0
+
+    @property
+    def loss_avg_return(self) -> float:
+        return self.loss_return_sum / self.losses if self.losses else 0.0
+
+    @property
+    def return_std(self) -> float:
+        """표본 표준편차 (pandas std 와 같은 ddof=1)."""
+        if self.count < 2:
+            return 0.0
+        var = (self.return_sq_sum - self.return_sum * self.return_sum / self.count) / (self.count - 1)
+        return math.sqrt(max(var, 0.0))
+
+    @property
+    def win_rate(self) -> float:
+        return self.wins / self.count * 100 if self.count else 0.0
+
+    # 트레이드 1회 기준 (연율화하지 않음, 무위험 수익률 0)
+    @property
+    def sharpe(self) -> float:
+        std = self.return_std
+        return self.avg_return / std if std else 0.0
+
+    @property
+    def sortino(self) -> float:
+        downside = math.sqrt(self.downside_sq_sum / self.count) if self.count else 0.0
+        return self.avg_return / downside if downside else 0.0
+
+
+def leverage_bucket(leverage) -> str:
+    lo = 1
+    for hi in LEVERAGE_BUCKETS:
+        if leverage <= hi:
+            return f"{lo}-{hi}x"
+        lo = hi + 1
+    return f"{lo}x+"
+
+
+# =====================
+# 자산 곡선 / 낙폭 / 노출 (청산마다 O(1) 갱신)
+# =====================
+class Analytics:
+    """청산 행(entry_time, play_hours, leverage, pnl_dollar, entry_capital, balance_after)으로
+    자산 곡선, 최대 낙폭과 기간, 포지션 보유 시간, 레버리지 구간별 통계를 누적한다.
+
+    낙폭 기간은 고점 이후 회복까지 걸린 청산 횟수이다.
+    """
+
+    __slots__ = (
+        "stats", "buckets", "equity", "peak", "peak_at", "max_drawdown", "max_drawdown_trades",
+        "exposure_hours", "_entry_time", "_play_hours", "_points",
+    )
+
+    def __init__(self):
+        self.stats = TradeStats()
+        self.buckets = {}
+        self.equity = array("d")
+        self.peak = 0.0
+        self.peak_at = 0
+        self.max_drawdown = 0.0
+        self.max_drawdown_trades = 0
+        self.exposure_hours = 0.0
+        self._entry_time = None
+        self._play_hours = 0.0
+        self._points = None
+
+    def add(self, row: dict):
+        self.stats.add(row)
+        if row.get("leverage") is not None:
+            bucket = leverage_bucket(row["leverage"])
+            stats = self.buckets.get(bucket)
+            if stats is None:
+                stats = self.buckets[bucket] = TradeStats()
+            stats.add(row)
+
+        # 부분 청산은 같은 entry_time 으로 여러 행이 생기므로 늘어난 시간만 더한다
+        hours = row.get("play_hours") or 0.0
+        if row.get("entry_time") is not None and row["entry_time"] == self._entry_time:
+            self.exposure_hours += max(hours - self._play_hours, 0.0)
+        else:
+            self.exposure_hours += hours
+        self._entry_time = row.get("entry_time")
+        self._play_hours = hours
+
+        balance = row["balance_after"]
+        if not self.equity:
+            # 첫 청산 직전 잔고를 시작점으로 둔다
+            self.equity.append(balance - row["pnl_dollar"])
+            self.peak = self.equity[0]
+        self.equity.append(balance)
+        i = len(self.equity) - 1
+        if balance >= self.peak:
+            # 이전 고점과 회복한 청산 사이의 청산 수 (낙폭 없이 이어진 고점이면 0)
+            self.max_drawdown_trades = max(self.max_drawdown_trades, i - self.peak_at - 1)
+            self.peak = balance
+            self.peak_at = i
+        elif self.peak > 0:
+            self.max_drawdown = max(self.max_drawdown, (self.peak - balance) / self.peak * 100)
+        self._points = None
+
+    def seed(self, rows):
+        for row in rows:
+            self.add(row)
+        return self
+
+    @property
+    def drawdown(self) -> float:
+        """현재 고점 대비 낙폭 (%)."""
+        if not self.equity or self.peak <= 0:
+            return 0.0
+        return (self.peak - self.equity[-1]) / self.peak * 100
+
+    @property
+    def drawdown_trades(self) -> int:
+        """아직 회복하지 못한 낙폭까지 포함한 최장 낙폭 기간 (청산 횟수)."""
+        if not self.equity:
+            return 0
+        return max(self.max_drawdown_trades, len(self.equity) - 1 - self.peak_at)
+
+    def equity_points(self, max_points: int = 500):
+        """LTTB 로 max_points 개 이하로 줄인 (청산 번호, 잔고). 곡선이 바뀔 때만 다시 계산한다."""
+        if self._points is None or self._points[0] != max_points:
+            y = np.frombuffer(self.equity, dtype=np.float64) if self.equity else np.empty(0)
+            x = np.arange(len(y))
+            idx = lttb(x, y, max_points)
+            self._points = (max_points, x[idx], y[idx])
+        return self._points[1], self._points[2]
@@ -0,0 +1,291 @@
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+QUEUE_FILE = "trade_queue.sqlite3"
+
+
+# =====================
+# 로컬 내구성 큐 (SQLite WAL)
+# =====================
+class LocalQueue:
+    """원격 저장 전의 trade_log 행을 보관하는 로컬 큐.
+
+    행은 커밋되는 즉시 디스크(WAL)에 남으므로 앱이 죽어도 다음 실행에서 다시 전송된다.
+    꺼낸 행은 lease 초 동안만 점유되고, ack 되지 않으면 다른 워커/프로세스가 다시 가져간다.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS outbox (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        key TEXT NOT NULL UNIQUE,
+        session_id TEXT,
+        payload TEXT NOT NULL,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        next_attempt REAL NOT NULL DEFAULT 0,
+        claimed_by TEXT,
+        claimed_at REAL
+    );
+    CREATE INDEX IF NOT EXISTS outbox_session ON outbox (session_id, id);
+    """
+
+    def __init__(self, path: str = QUEUE_FILE, lease: float = 30.0):
+        self.path = path
+        self.lease = lease
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        # :memory: 는 연결마다 DB 가 따로 생기므로 연결 하나를 공유한다
+        self._shared = self._connect() if path == ":memory:" else None
+        with self._conn() as conn:
+            conn.executescript(self.SCHEMA)
+        self._depth = self._count()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+        if self.path != ":memory:":
+            conn.execute("PRAGMA journal_mode=WAL")
+            # WAL + NORMAL: 프로세스가 죽어도 커밋된 행은 남는다 (전원 차단 시 마지막 몇 건은 제외)
+            conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _conn(self):
+        if self._shared is not None:
+            return _Locked(self._shared, self._lock)
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return _Locked(conn, None)
+
+    @contextmanager
+    def _transaction(self):
+        with self._conn() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    def _count(self) -> int:
+        with self._conn() as conn:
+            return conn.execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
+
+    def __len__(self):
+        # 이 프로세스 기준 근사값 (put/ack 마다 갱신, 재시작 시 다시 센다)
+        return self._depth
+
+    def put(self, row: dict) -> str:
+        key = row["idempotency_key"]
+        with self._conn() as conn:
+            cur = conn.execute(
+                "INSERT OR IGNORE INTO outbox (key, session_id, payload) VALUES (?, ?, ?)",
+                (key, row.get("session_id"), json.dumps(row)),
+            )
+        if cur.rowcount:
+            with self._lock:
+                self._depth += 1
+        return key
+
+    def claim(self, limit: int, owner: str) -> list:
+        """전송 가능한 행을 최대 limit 개 점유한다. [(id, row), ...]"""
+        now = time.time()
+        with self._transaction() as conn:
+            rows = conn.execute(
+                "SELECT id, payload FROM outbox "
+                "WHERE next_attempt <= ? AND (claimed_by IS NULL OR claimed_at < ?) "
+                "ORDER BY id LIMIT ?",
+                (now, now - self.lease, limit),
+            ).fetchall()
+            if rows:
+                conn.executemany(
+                    "UPDATE outbox SET claimed_by = ?, claimed_at = ? WHERE id = ?",
+                    [(owner, now, r[0]) for r in rows],
+                )
+        return [(r[0], json.loads(r[1])) for r in rows]
+
+    def ack(self, ids: list):
+        if not ids:
+            return
+        with self._transaction() as conn:
+            cur = conn.executemany("DELETE FROM outbox WHERE id = ?", [(i,) for i in ids])
+        with self._lock:
+            self._depth = max(self._depth - cur.rowcount, 0)
+
+    def release(self, ids: list, delay: float):
+        """전송 실패한 행의 점유를 풀고 delay 초 뒤에 다시 시도하게 한다."""
+        if not ids:
+            return
+        retry_at = time.time() + delay
+        with self._transaction() as conn:
+            conn.executemany(
+                "UPDATE outbox SET claimed_by = NULL, claimed_at = NULL, "
+                "attempts = attempts + 1, next_attempt = ? WHERE id = ?",
+                [(retry_at, i) for i in ids],
+            )
+
+    def pending(self, session_id: str) -> list:
+        """아직 원격에 반영되지 않은 해당 세션의 행 (입력 순서)."""
+        with self._conn() as conn:
+            rows = conn.execute(
+                "SELECT payload FROM outbox WHERE session_id = ? ORDER BY id", (session_id,)
+            ).fetchall()
+        return [json.loads(r[0]) for r in rows]
+
+    def discard(self, session_id: str) -> int:
+        with self._conn() as conn:
+            cur = conn.execute("DELETE FROM outbox WHERE session_id = ?", (session_id,))
+        with self._lock:
+            self._depth = max(self._depth - cur.rowcount, 0)
+        return cur.rowcount
+
+
+class _Locked:
+    """with 블록 동안 (공유 연결이면) 잠금을 잡고 연결을 돌려준다."""
+
+    __slots__ = ("conn", "lock")
+
+    def __init__(self, conn, lock):
+        self.conn = conn
+        self.lock = lock
+
+    def __enter__(self):
+        if self.lock is not None:
+            self.lock.acquire()
+        return self.conn
+
+    def __exit__(self, *exc):
+        if self.lock is not None:
+            self.lock.release()
+        return False
+
+
+# =====================
+# write-behind 전송기
+# =====================
+class WriteBehindWriter:
+    """submit() 은 로컬 큐에 쓰고 바로 돌아오고, 백그라운드 스레드가 batch_size 개씩 묶어 저장소로 보낸다.
+
+    - 실패하면 지수 백오프(최대 max_backoff 초)로 재시도한다.
+    - 행마다 idempotency_key 가 있어 재전송돼도 저장소에는 한 번만 들어간다.
+    - 큐가 max_pending 을 넘으면 submit 이 block_timeout 초까지 기다리고, 그래도 차 있으면 queue.Full.
+    """
+
+    def __init__(self, local_queue: LocalQueue, store, batch_size: int = 200, flush_interval: float = 0.5,
+                 max_pending: int = 50_000, max_backoff: float = 30.0, block_timeout: float = 5.0):
+        self.queue = local_queue
+        self.store = store
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.max_backoff = max_backoff
+        self.block_timeout = block_timeout
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.sent = 0
+        self.batches = 0
+        self.failures = 0
+        self.last_error = None
+        self._wake = threading.Event()
+        self._space = threading.Condition()
+        self._stop = threading.Event()
+        # claim → insert → ack/release 한 묶음 동안 잡는다. paused() 가 기다리는 동안은 다음 묶음을 시작하지 않는다
+        self._sending = threading.RLock()
+        self._pause = threading.Condition()
+        self._pauses = 0
+        self._thread = None
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="trade-writer", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def submit(self, row: dict) -> str:
+        if len(self.queue) >= self.max_pending:
+            with self._space:
+                if not self._space.wait_for(lambda: len(self.queue) < self.max_pending, self.block_timeout):
+                    raise queue.Full(f"trade queue has {len(self.queue)} pending rows")
+        row.setdefault("idempotency_key", uuid.uuid4().hex)
+        key = self.queue.put(row)
+        if len(self.queue) >= self.batch_size:
+            self._wake.set()
+        return key
+
+    def pending(self, session_id: str) -> list:
+        return self.queue.pending(session_id)
+
+    @contextmanager
+    def paused(self):
+        """전송 중인 묶음이 끝나길 기다렸다가, 블록 동안 새 묶음을 보내지 않는다.
+
+        세션 기록을 지울 때 이미 점유된 묶음이 삭제 뒤에 저장소에 들어가지 않도록 쓴다.
+        """
+        with self._pause:
+            self._pauses += 1
+        try:
+            with self._sending:
+                yield self
+        finally:
+            with self._pause:
+                self._pauses -= 1
+                self._pause.notify_all()
+
+    def discard(self, session_id: str) -> int:
+        with self.paused():
+            return self.queue.discard(session_id)
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """큐가 빌 때까지 기다린다. 비우지 못하면 False."""
+        deadline = time.monotonic() + timeout
+        while len(self.queue):
+            if time.monotonic() >= deadline:
+                return False
+            self._wake.set()
+            time.sleep(0.01)
+        return True
+
+    def _run(self):
+        backoff = 0.0
+        while not self._stop.is_set():
+            with self._pause:
+                self._pause.wait_for(lambda: not self._pauses)
+            with self._sending:
+                batch = self.queue.claim(self.batch_size, self.owner)
+                if batch:
+                    ids = [i for i, _ in batch]
+                    try:
+                        self.store.insert_trades([row for _, row in batch])
+                    except Exception as e:
+                        self.failures += 1
+                        self.last_error = repr(e)
+                        backoff = min(max(backoff * 2, 0.5), self.max_backoff)
+                        self.queue.release(ids, backoff)
+                        failed = True
+                    else:
+                        self.queue.ack(ids)
+                        failed = False
+            if not batch:
+                self._wake.wait(self.flush_interval)
+                self._wake.clear()
+                continue
+            if failed:
+                self._stop.wait(backoff)
+                continue
+
+            backoff = 0.0
+            self.sent += len(ids)
+            self.batches += 1
+            with self._space:
+                self._space.notify_all()
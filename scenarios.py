@@ -0,0 +1,271 @@
+import os
+import random
+import threading
+
+import numpy as np
+
+from engine import WINDOW
+
+# 라운드 하나가 쓰는 캔들 수: 처음 보이는 WINDOW 개 + 최대 50턴
+ROUND_TURNS = 50
+SPAN = WINDOW + ROUND_TURNS
+
+ANY = "any"
+# 국면 이름 → 표시 이름. 한 윈도우가 여러 국면에 동시에 속할 수 있다
+REGIMES = {
+    ANY: "전체 (랜덤)",
+    "crash": "급락",
+    "rally": "상승 추세",
+    "downtrend": "하락 추세",
+    "range": "횡보",
+    "high_vol": "고변동성",
+    "low_vol": "저변동성",
+    "high_volume": "거래량 급증",
+}
+
+# 추세 강도 = 윈도우 전체 추세 수익률 / (변동성 × √SPAN). 이 값보다 작으면 횡보
+TREND_Z = 1.0
+# 퍼센타일 경계 (전체 윈도우 분포 기준)
+HIGH_PCT = 0.8
+LOW_PCT = 0.2
+CRASH_PCT = 0.9
+# 최대 낙폭 계산 시 한 번에 처리하는 윈도우 수 (캐시에 머무는 크기)
+DRAWDOWN_CHUNK = 8192
+SEED_RANGE = 1_000_000
+# 청크 카탈로그의 데이터셋 디렉터리(index.json 옆)에 저장하는 색인 파일
+INDEX_FILE = "regimes.npz"
+FEATURES = ("volatility", "slope", "drawdown", "volume_pct")
+
+
+def percentile_rank(values: np.ndarray) -> np.ndarray:
+    """각 원소가 전체에서 몇 번째 퍼센타일인지 (0~1)."""
+    if len(values) < 2:
+        return np.zeros(len(values))
+    order = np.argsort(values, kind="stable")
+    rank = np.empty(len(values))
+    rank[order] = np.arange(len(values))
+    return rank / (len(values) - 1)
+
+
+# =====================
+# 윈도우 특성 + 국면 역색인 (데이터셋당 1회 계산)
+# =====================
+class ScenarioIndex:
+    """SPAN 캔들 윈도우마다 변동성 / 추세 기울기 / 최대 낙폭 / 거래량 퍼센타일을 계산하고
+    국면별 시작 인덱스 배열(역색인)을 만들어 둔다. 국면 지정 추첨은 배열 인덱싱 한 번이다.
+    """
+
+    def __init__(self, store, span: int = SPAN):
+        self.span = span
+        close = np.asarray(store.close, dtype=np.float64)
+        volume = np.asarray(store.volume, dtype=np.float64)
+        n = len(close)
+        count = max(n - span + 1, 0)
+        self.count = count
+
+        if count:
+            self.volatility, self.slope = self._trend(np.log(np.maximum(close, 1e-12)), span)
+            self.drawdown = self._drawdown(close, span)
+            vol_cum = np.concatenate(([0.0], np.cumsum(volume)))
+            self.volume_pct = percentile_rank(vol_cum[span:] - vol_cum[:-span])
+        else:
+            self.volatility = self.slope = self.drawdown = self.volume_pct = np.zeros(0)
+
+        # 데이터가 SPAN 보다 짧으면 처음부터만 시작한다
+        starts = np.arange(max(count, 1), dtype=np.int64)
+        self.buckets = {ANY: starts}
+        if count:
+            vol_pct = percentile_rank(self.volatility)
+            dd_pct = percentile_rank(self.drawdown)
+            strength = self.slope * span / np.maximum(self.volatility * np.sqrt(span), 1e-12)
+            masks = {
+                "crash": (dd_pct >= CRASH_PCT) & (self.slope < 0),
+                "rally": strength >= TREND_Z,
+                "downtrend": strength <= -TREND_Z,
+                "range": (np.abs(strength) < TREND_Z) & (vol_pct < HIGH_PCT),
+                "high_vol": vol_pct >= HIGH_PCT,
+                "low_vol": vol_pct <= LOW_PCT,
+                "high_volume": self.volume_pct >= HIGH_PCT,
+            }
+            for name, mask in masks.items():
+                self.buckets[name] = np.flatnonzero(mask)
+
+    @staticmethod
+    def _trend(y: np.ndarray, span: int):
+        """윈도우별 캔들 로그수익률 표준편차, 로그 종가의 최소제곱 기울기 (누적합으로 O(n))."""
+        r = np.diff(y)
+        r_cum = np.concatenate(([0.0], np.cumsum(r)))
+        r2_cum = np.concatenate(([0.0], np.cumsum(r * r)))
+        m = span - 1
+        r_sum = r_cum[m:] - r_cum[:-m]
+        r2_sum = r2_cum[m:] - r2_cum[:-m]
+        volatility = np.sqrt(np.maximum(r2_sum / m - (r_sum / m) ** 2, 0.0))
+
+        # 윈도우 안 t = 0..span-1 에 대한 기울기: Σ(t - t̄)(y - ȳ) / Σ(t - t̄)²
+        t = np.arange(len(y), dtype=np.float64)
+        y_cum = np.concatenate(([0.0], np.cumsum(y)))
+        ty_cum = np.concatenate(([0.0], np.cumsum(t * y)))
+        start = np.arange(len(y) - span + 1, dtype=np.float64)
+        y_sum = y_cum[span:] - y_cum[:-span]
+        ty_sum = ty_cum[span:] - ty_cum[:-span] - start * y_sum
+        t_mean = (span - 1) / 2
+        t_var = span * (span * span - 1) / 12
+        slope = (ty_sum - t_mean * y_sum) / t_var
+        return volatility, slope
+
+    @staticmethod
+    def _drawdown(close: np.ndarray, span: int) -> np.ndarray:
+        """윈도우별 최대 낙폭 (고점 대비 비율).
+
+        윈도우 축으로 누적하면 strided 접근이 되므로, 청크 안의 모든 윈도우를 윈도우 내
+        오프셋 k 순서로 함께 진행한다 (연속 슬라이스에 대한 벡터 연산 span 번).
+        """
+        count = len(close) - span + 1
+        out = np.empty(count)
+        for lo in range(0, count, DRAWDOWN_CHUNK):
+            hi = min(lo + DRAWDOWN_CHUNK, count)
+            peak = close[lo:hi].copy()
+            drawdown = np.zeros(hi - lo)
+            tmp = np.empty(hi - lo)
+            for k in range(1, span):
+                x = close[lo + k:hi + k]
+                np.maximum(peak, x, out=peak)
+                np.subtract(peak, x, out=tmp)
+                np.divide(tmp, peak, out=tmp)
+                np.maximum(drawdown, tmp, out=drawdown)
+            out[lo:hi] = drawdown
+        return out
+
+    # ---------------------
+    # 저장 / 불러오기 (데이터셋 설치 때 1회 계산, 이후 프로세스는 읽기만)
+    # ---------------------
+    def save(self, path: str, rows: int, end: int):
+        """rows / end(마지막 open_time) 는 불러올 때 데이터셋과 맞는지 확인하는 데 쓴다."""
+        arrays = {name: getattr(self, name) for name in FEATURES}
+        arrays.update({f"bucket_{name}": starts for name, starts in self.buckets.items() if name != ANY})
+        tmp_path = f"{path}.tmp{os.getpid()}.npz"
+        np.savez(tmp_path, meta=np.array([self.span, self.count, rows, end], dtype=np.int64), **arrays)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str, rows: int, end: int, span: int = SPAN):
+        """저장된 색인. 없거나 데이터셋/span 이 바뀌었으면 None."""
+        try:
+            with np.load(path) as data:
+                if data["meta"].tolist() != [span, max(rows - span + 1, 0), rows, end]:
+                    return None
+                index = cls.__new__(cls)
+                index.span = span
+                index.count = max(rows - span + 1, 0)
+                for name in FEATURES:
+                    setattr(index, name, data[name])
+                index.buckets = {ANY: np.arange(max(index.count, 1), dtype=np.int64)}
+                for key in data.files:
+                    if key.startswith("bucket_"):
+                        index.buckets[key[len("bucket_"):]] = data[key]
+        except (OSError, KeyError, ValueError):
+            return None
+        return index
+
+    def regimes(self) -> dict:
+        """국면 이름 → 해당 윈도우 수 (빈 국면 제외)."""
+        return {name: len(self.buckets[name]) for name in REGIMES if len(self.buckets.get(name, ()))}
+
+    def draw(self, regime: str = ANY, seed=None) -> int:
+        """국면에 속한 윈도우 시작 인덱스 하나. 같은 데이터·국면·seed 면 항상 같은 값."""
+        starts = self.buckets.get(regime)
+        if starts is None:
+            raise ValueError(f"unknown regime '{regime}'")
+        if not len(starts):
+            raise ValueError(f"no windows in regime '{regime}'")
+        rng = random.Random(seed) if seed is not None else random
+        return int(starts[rng.randrange(len(starts))])
+
+    def describe(self, start: int) -> dict:
+        """start 윈도우의 특성 값."""
+        if not self.count:
+            return {}
+        i = min(max(int(start), 0), self.count - 1)
+        return {
+            "volatility": float(self.volatility[i]),
+            "slope": float(self.slope[i]),
+            "drawdown": float(self.drawdown[i]),
+            "volume_pct": float(self.volume_pct[i]),
+        }
+
+
+def uniform_start(rows: int, seed=None, span: int = SPAN) -> int:
+    """색인 없이 뽑는 시작 위치. 같은 seed 면 ScenarioIndex.draw(ANY, seed) 와 같은 값."""
+    rng = random.Random(seed) if seed is not None else random
+    return rng.randrange(max(rows - span + 1, 1))
+
+
+def dataset_end(dataset) -> int:
+    """마지막 캔들 open_time (ms). 저장된 색인이 같은 데이터로 만든 것인지 확인하는 데 쓴다."""
+    return int(dataset.open_time[len(dataset) - 1]) if len(dataset) else 0
+
+
+def build_dataset_index(dataset, path: str, span: int = SPAN) -> ScenarioIndex:
+    """데이터셋(ChunkedStore) 전체로 색인을 만들어 path 에 저장한다."""
+    index = ScenarioIndex(dataset, span)
+    index.save(path, len(dataset), dataset_end(dataset))
+    return index
+
+
+class DatasetScenarios:
+    """데이터셋 옆에 저장된 색인을 처음 쓸 때 읽는다.
+
+    파일이 없거나 데이터셋과 맞지 않으면 백그라운드 스레드에서 다시 만들어 저장하고,
+    그동안 get() 은 None 이다 (호출한 쪽은 uniform_start 로 뽑는다).
+    """
+
+    def __init__(self, dataset, path: str, span: int = SPAN):
+        self.dataset = dataset
+        self.path = path
+        self.span = span
+        self.error = None
+        self._index = None
+        self._loaded = False
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def get(self):
+        with self._lock:
+            if self._index is None and not self._loaded:
+                self._loaded = True
+                self._index = ScenarioIndex.load(self.path, len(self.dataset), dataset_end(self.dataset), self.span)
+                if self._index is None:
+                    self._thread = threading.Thread(target=self._build, name="scenario-index", daemon=True)
+                    self._thread.start()
+            return self._index
+
+    def _build(self):
+        try:
+            index = build_dataset_index(self.dataset, self.path, self.span)
+        except Exception as e:  # noqa: BLE001 - 색인 없이도 균등 추첨으로 동작한다
+            self.error = repr(e)
+            return
+        with self._lock:
+            self._index = index
+
+    def wait(self, timeout: float = None):
+        """백그라운드 생성이 끝날 때까지 기다린다 (CLI / 벤치마크용)."""
+        self.get()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        return self._index
+
+
+# =====================
+# 공유용 시나리오 코드 ("crash-123456")
+# =====================
+def scenario_code(regime: str, seed: int) -> str:
+    return f"{regime}-{seed}"
+
+
+def parse_code(code: str):
+    """시나리오 코드 → (regime, seed). 형식이 틀리면 ValueError."""
+    regime, sep, seed = code.strip().rpartition("-")
+    if not sep or regime not in REGIMES or not seed.isdigit():
+        raise ValueError(f"invalid scenario code '{code}'")
+    return regime, int(seed)
@@ -0,0 +1,465 @@
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+
+STORE_FILE = "trades.sqlite3"
+
+TRADE_COLUMNS = (
+    "session_id", "idempotency_key",
+    "entry_time", "exit_time", "play_hours", "direction",
+    "entry_price", "exit_price", "leverage", "position_ratio",
+    "entry_capital", "pnl_dollar", "balance_after", "reason",
+)
+
+# 세션별 누적 요약 (리더보드). 청산 기록이 trade_log 에 들어갈 때 트리거가 한 행씩 갱신한다
+SUMMARY_COLUMNS = (
+    "session_id", "trades", "wins", "win_rate", "total_pnl",
+    "balance", "peak", "max_drawdown", "last_trade_id",
+)
+# 리더보드 정렬 기준 → 내림차순 여부 (max_drawdown 은 작을수록 위)
+LEADERBOARD_METRICS = {"total_pnl": True, "win_rate": True, "max_drawdown": False}
+
+
+# =====================
+# 저장소 인터페이스
+# =====================
+class TradeStore:
+    """session_meta / trade_log 원격 저장소. insert_trades 는 idempotency_key 기준으로 중복을 무시해야 한다."""
+
+    def active_session(self):
+        raise NotImplementedError
+
+    def create_session(self, session_id: str):
+        raise NotImplementedError
+
+    def insert_trades(self, rows: list):
+        raise NotImplementedError
+
+    def load_trades(self, session_id: str, columns=None, page_size: int = 1000) -> list:
+        """trade_id 순 행 목록. columns 를 주면 그 컬럼만, page_size 행씩 나눠 읽는다."""
+        raise NotImplementedError
+
+    def iter_trades(self, session_id: str = None, columns=None, page_size: int = 1000, after: int = 0):
+        """trade_id > after 인 행을 trade_id 순 page_size 개씩 (keyset 페이지) 내보낸다.
+
+        session_id 가 None 이면 모든 세션. 각 페이지에는 항상 trade_id 가 들어 있다.
+        """
+        raise NotImplementedError
+
+    def delete_trades(self, session_id: str):
+        raise NotImplementedError
+
+    def leaderboard(self, metric: str = "total_pnl", limit: int = 20, offset: int = 0, min_trades: int = 1) -> list:
+        """session_summary 를 metric 순으로 정렬한 한 페이지 (trades >= min_trades 인 세션만)."""
+        raise NotImplementedError
+
+    def session_rank(self, session_id: str, metric: str = "total_pnl", min_trades: int = 1):
+        """세션의 요약 행과 순위. {"summary", "rank", "total"} 또는 요약이 없으면 None."""
+        raise NotImplementedError
+
+    def rollup_summaries(self) -> int:
+        """trade_log 전체에서 요약이 뒤처진 세션을 다시 계산한다 (백필/복구용 일괄 작업). 갱신한 세션 수."""
+        raise NotImplementedError
+
+
+def _check_metric(metric: str) -> bool:
+    if metric not in LEADERBOARD_METRICS:
+        raise ValueError(f"unknown leaderboard metric '{metric}'")
+    return LEADERBOARD_METRICS[metric]
+
+
+def _utc_now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+# =====================
+# Supabase
+# =====================
+# trade_log 에는 중복 방지용 고유 컬럼이 필요하다:
+#   alter table trade_log add column idempotency_key text unique;
+# 리더보드에는 아래 SUPABASE_SUMMARY_SQL 의 요약 테이블/트리거/rollup 함수가 필요하다
+#   (python leaderboard.py ddl 로 출력)
+SUPABASE_SUMMARY_SQL = """
+create table if not exists session_summary (
+    session_id text primary key,
+    trades integer not null,
+    wins integer not null,
+    win_rate double precision not null,
+    total_pnl double precision not null,
+    balance double precision not null,
+    peak double precision not null,
+    max_drawdown double precision not null,
+    last_trade_id bigint not null,
+    updated_at timestamptz not null default now()
+);
+create index if not exists session_summary_total_pnl on session_summary (total_pnl desc, session_id);
+create index if not exists session_summary_win_rate on session_summary (win_rate desc, session_id);
+create index if not exists session_summary_max_drawdown on session_summary (max_drawdown, session_id);
+
+create or replace function trade_log_summary() returns trigger language plpgsql as $$
+declare
+    start_balance double precision := new.balance_after - new.pnl_dollar;
+begin
+    insert into session_summary as s
+        (session_id, trades, wins, win_rate, total_pnl, balance, peak, max_drawdown, last_trade_id)
+    values (
+        new.session_id, 1, (new.pnl_dollar > 0)::int, (new.pnl_dollar > 0)::int, new.pnl_dollar,
+        new.balance_after, greatest(start_balance, new.balance_after),
+        (greatest(start_balance, new.balance_after) - new.balance_after)
+            / greatest(start_balance, new.balance_after, 1e-12),
+        new.trade_id
+    )
+    on conflict (session_id) do update set
+        trades = s.trades + 1,
+        wins = s.wins + excluded.wins,
+        win_rate = (s.wins + excluded.wins)::double precision / (s.trades + 1),
+        total_pnl = s.total_pnl + excluded.total_pnl,
+        balance = excluded.balance,
+        peak = greatest(s.peak, excluded.balance),
+        max_drawdown = greatest(
+            s.max_drawdown,
+            (greatest(s.peak, excluded.balance) - excluded.balance) / greatest(s.peak, excluded.balance, 1e-12)
+        ),
+        last_trade_id = greatest(s.last_trade_id, excluded.last_trade_id),
+        updated_at = now();
+    return null;
+end $$;
+
+drop trigger if exists trade_log_summary on trade_log;
+create trigger trade_log_summary after insert on trade_log
+    for each row execute function trade_log_summary();
+
+-- 백필/복구: 요약이 없거나 뒤처진 세션만 trade_log 에서 다시 계산한다
+create or replace function rollup_session_summary() returns integer language sql as $$
+    with stale as (
+        select t.session_id from trade_log t left join session_summary s using (session_id)
+        group by t.session_id, s.last_trade_id
+        having max(t.trade_id) > coalesce(s.last_trade_id, -1)
+    ), ordered as (
+        select session_id, trade_id, pnl_dollar, balance_after,
+               greatest(first_value(balance_after - pnl_dollar) over w, max(balance_after) over w) as peak,
+               last_value(balance_after) over (w rows between unbounded preceding and unbounded following) as balance
+        from trade_log where session_id in (select session_id from stale)
+        window w as (partition by session_id order by trade_id)
+    ), upserted as (
+        insert into session_summary as s
+            (session_id, trades, wins, win_rate, total_pnl, balance, peak, max_drawdown, last_trade_id)
+        select session_id, count(*), count(*) filter (where pnl_dollar > 0),
+               (count(*) filter (where pnl_dollar > 0))::double precision / count(*),
+               sum(pnl_dollar), max(balance), max(peak),
+               max((peak - balance_after) / greatest(peak, 1e-12)), max(trade_id)
+        from ordered group by session_id
+        on conflict (session_id) do update set
+            trades = excluded.trades, wins = excluded.wins, win_rate = excluded.win_rate,
+            total_pnl = excluded.total_pnl, balance = excluded.balance, peak = excluded.peak,
+            max_drawdown = excluded.max_drawdown, last_trade_id = excluded.last_trade_id, updated_at = now()
+        returning 1
+    )
+    select count(*)::int from upserted;
+$$;
+"""
+
+class SupabaseTradeStore(TradeStore):
+    def __init__(self, client, idempotency_column: str = "idempotency_key"):
+        self.client = client
+        self.idempotency_column = idempotency_column
+
+    def active_session(self):
+        res = (
+            self.client.table("session_meta")
+            .select("session_id")
+            .eq("is_active", True)
+            .order("created_at", desc=True)
+            .limit(1)
+            .execute()
+        )
+        return res.data[0]["session_id"] if res.data else None
+
+    def create_session(self, session_id: str):
+        self.client.table("session_meta").insert({
+            "session_id": session_id,
+            "is_active": True,
+            "created_at": _utc_now_iso()
+        }).execute()
+
+    def insert_trades(self, rows: list):
+        self.client.table("trade_log").upsert(
+            rows, on_conflict=self.idempotency_column, ignore_duplicates=True
+        ).execute()
+
+    def load_trades(self, session_id: str, columns=None, page_size: int = 1000) -> list:
+        rows = []
+        for page in self.iter_trades(session_id, columns, page_size):
+            rows += page
+        if columns and "trade_id" not in columns:
+            for row in rows:
+                del row["trade_id"]
+        return rows
+
+    def iter_trades(self, session_id: str = None, columns=None, page_size: int = 1000, after: int = 0):
+        # offset(range) 대신 trade_id 기준 keyset: 깊은 페이지도 인덱스 탐색 한 번
+        projection = ",".join(["trade_id", *(c for c in columns if c != "trade_id")]) if columns else "*"
+        while True:
+            query = self.client.table("trade_log").select(projection).gt("trade_id", after)
+            if session_id is not None:
+                query = query.eq("session_id", session_id)
+            page = query.order("trade_id").limit(page_size).execute().data or []
+            if page:
+                yield page
+                after = page[-1]["trade_id"]
+            if len(page) < page_size:
+                return
+
+    def delete_trades(self, session_id: str):
+        self.client.table("trade_log").delete().eq("session_id", session_id).execute()
+        self.client.table("session_summary").delete().eq("session_id", session_id).execute()
+
+    def leaderboard(self, metric: str = "total_pnl", limit: int = 20, offset: int = 0, min_trades: int = 1) -> list:
+        desc = _check_metric(metric)
+        res = (
+            self.client.table("session_summary")
+            .select(",".join(SUMMARY_COLUMNS))
+            .gte("trades", min_trades)
+            .order(metric, desc=desc)
+            .order("session_id")
+            .range(offset, offset + limit - 1)
+            .execute()
+        )
+        return res.data or []
+
+    def session_rank(self, session_id: str, metric: str = "total_pnl", min_trades: int = 1):
+        desc = _check_metric(metric)
+        res = (
+            self.client.table("session_summary")
+            .select(",".join(SUMMARY_COLUMNS))
+            .eq("session_id", session_id)
+            .execute()
+        )
+        if not res.data:
+            return None
+        summary = res.data[0]
+
+        def count(better: bool) -> int:
+            query = self.client.table("session_summary").select("session_id", count="exact", head=True)
+            query = query.gte("trades", min_trades)
+            if better:
+                query = query.gt(metric, summary[metric]) if desc else query.lt(metric, summary[metric])
+            return query.execute().count or 0
+
+        return {"summary": summary, "rank": count(True) + 1, "total": count(False)}
+
+    def rollup_summaries(self) -> int:
+        return self.client.rpc("rollup_session_summary").execute().data or 0
+
+
+# =====================
+# SQLite (로컬 대체 저장소 / 부하 테스트용)
+# =====================
+class SQLiteTradeStore(TradeStore):
+    """path=":memory:" 이면 프로세스 메모리 안의 저장소. latency 초만큼 호출마다 지연을 넣어 원격을 흉내낸다."""
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS session_meta (
+        session_id TEXT PRIMARY KEY,
+        is_active INTEGER NOT NULL DEFAULT 1,
+        created_at TEXT NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS trade_log (
+        trade_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        session_id TEXT NOT NULL,
+        idempotency_key TEXT UNIQUE,
+        entry_time TEXT,
+        exit_time TEXT,
+        play_hours REAL,
+        direction TEXT,
+        entry_price REAL,
+        exit_price REAL,
+        leverage REAL,
+        position_ratio INTEGER,
+        entry_capital REAL,
+        pnl_dollar REAL,
+        balance_after REAL,
+        reason TEXT
+    );
+    CREATE INDEX IF NOT EXISTS trade_log_session ON trade_log (session_id, trade_id);
+    CREATE TABLE IF NOT EXISTS session_summary (
+        session_id TEXT PRIMARY KEY,
+        trades INTEGER NOT NULL,
+        wins INTEGER NOT NULL,
+        win_rate REAL NOT NULL,
+        total_pnl REAL NOT NULL,
+        balance REAL NOT NULL,
+        peak REAL NOT NULL,
+        max_drawdown REAL NOT NULL,
+        last_trade_id INTEGER NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS session_summary_total_pnl ON session_summary (total_pnl DESC, session_id);
+    CREATE INDEX IF NOT EXISTS session_summary_win_rate ON session_summary (win_rate DESC, session_id);
+    CREATE INDEX IF NOT EXISTS session_summary_max_drawdown ON session_summary (max_drawdown, session_id);
+    -- INSERT OR IGNORE 로 무시된 중복 행에는 트리거가 돌지 않는다
+    CREATE TRIGGER IF NOT EXISTS trade_log_summary AFTER INSERT ON trade_log BEGIN
+        INSERT INTO session_summary
+            (session_id, trades, wins, win_rate, total_pnl, balance, peak, max_drawdown, last_trade_id)
+        VALUES (
+            NEW.session_id, 1, NEW.pnl_dollar > 0, NEW.pnl_dollar > 0, NEW.pnl_dollar, NEW.balance_after,
+            MAX(NEW.balance_after - NEW.pnl_dollar, NEW.balance_after),
+            (MAX(NEW.balance_after - NEW.pnl_dollar, NEW.balance_after) - NEW.balance_after)
+                / MAX(NEW.balance_after - NEW.pnl_dollar, NEW.balance_after, 1e-12),
+            NEW.trade_id
+        )
+        ON CONFLICT (session_id) DO UPDATE SET
+            trades = trades + 1,
+            wins = wins + excluded.wins,
+            win_rate = 1.0 * (wins + excluded.wins) / (trades + 1),
+            total_pnl = total_pnl + excluded.total_pnl,
+            balance = excluded.balance,
+            peak = MAX(peak, excluded.balance),
+            max_drawdown = MAX(
+                max_drawdown,
+                (MAX(peak, excluded.balance) - excluded.balance) / MAX(peak, excluded.balance, 1e-12)
+            ),
+            last_trade_id = MAX(last_trade_id, excluded.last_trade_id);
+    END;
+    """
+
+    # 요약이 없거나 last_trade_id 가 뒤처진 세션만 trade_log 에서 다시 계산한다
+    ROLLUP = """
+    WITH stale AS (
+        SELECT t.session_id FROM trade_log t LEFT JOIN session_summary s USING (session_id)
+        GROUP BY t.session_id
+        HAVING MAX(t.trade_id) > COALESCE(MAX(s.last_trade_id), -1)
+    ), ordered AS (
+        SELECT session_id, trade_id, pnl_dollar, balance_after,
+               MAX(FIRST_VALUE(balance_after - pnl_dollar) OVER w, MAX(balance_after) OVER w) AS peak,
+               LAST_VALUE(balance_after) OVER (w ROWS BETWEEN UNBOUNDED PRECEDING AND UNBOUNDED FOLLOWING) AS balance
+        FROM trade_log WHERE session_id IN (SELECT session_id FROM stale)
+        WINDOW w AS (PARTITION BY session_id ORDER BY trade_id)
+    )
+    INSERT OR REPLACE INTO session_summary
+        (session_id, trades, wins, win_rate, total_pnl, balance, peak, max_drawdown, last_trade_id)
+    SELECT session_id, COUNT(*), SUM(pnl_dollar > 0), 1.0 * SUM(pnl_dollar > 0) / COUNT(*),
+           SUM(pnl_dollar), MAX(balance), MAX(peak),
+           MAX((peak - balance_after) / MAX(peak, 1e-12)), MAX(trade_id)
+    FROM ordered GROUP BY session_id
+    """
+
+    def __init__(self, path: str = ":memory:", latency: float = 0.0):
+        self.path = path
+        self.latency = latency
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(self.SCHEMA)
+        # 요약 테이블이 없던 기존 파일이면 처음 열 때 한 번 채운다
+        if self._conn.execute(
+            "SELECT NOT EXISTS (SELECT 1 FROM session_summary) AND EXISTS (SELECT 1 FROM trade_log)"
+        ).fetchone()[0]:
+            self.rollup_summaries()
+
+    def _wait(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    def active_session(self):
+        self._wait()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT session_id FROM session_meta WHERE is_active = 1 ORDER BY created_at DESC LIMIT 1"
+            ).fetchone()
+        return row["session_id"] if row else None
+
+    def create_session(self, session_id: str):
+        self._wait()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO session_meta (session_id, is_active, created_at) VALUES (?, 1, ?)",
+                (session_id, _utc_now_iso()),
+            )
+
+    def insert_trades(self, rows: list):
+        self._wait()
+        sql = (
+            f"INSERT OR IGNORE INTO trade_log ({', '.join(TRADE_COLUMNS)}) "
+            f"VALUES ({', '.join('?' * len(TRADE_COLUMNS))})"
+        )
+        with self._lock, self._conn:
+            self._conn.executemany(sql, [tuple(r.get(c) for c in TRADE_COLUMNS) for r in rows])
+
+    @staticmethod
+    def _check_columns(columns):
+        if columns:
+            unknown = set(columns) - {"trade_id", *TRADE_COLUMNS}
+            if unknown:
+                raise ValueError(f"unknown trade_log columns: {sorted(unknown)}")
+
+    def load_trades(self, session_id: str, columns=None, page_size: int = 1000) -> list:
+        self._wait()
+        self._check_columns(columns)
+        projection = ", ".join(columns) if columns else "*"
+        with self._lock:
+            cur = self._conn.execute(
+                f"SELECT {projection} FROM trade_log WHERE session_id = ? ORDER BY trade_id", (session_id,)
+            )
+            return [dict(r) for r in cur]
+
+    def iter_trades(self, session_id: str = None, columns=None, page_size: int = 1000, after: int = 0):
+        self._check_columns(columns)
+        projection = ", ".join(["trade_id", *(c for c in columns if c != "trade_id")]) if columns else "*"
+        where = "trade_id > ?" if session_id is None else "session_id = ? AND trade_id > ?"
+        sql = f"SELECT {projection} FROM trade_log WHERE {where} ORDER BY trade_id LIMIT ?"
+        while True:
+            self._wait()
+            params = (after, page_size) if session_id is None else (session_id, after, page_size)
+            # 페이지마다 잠금을 풀어 내보내는 동안에도 다른 세션의 저장이 끼어들 수 있다
+            with self._lock:
+                page = [dict(r) for r in self._conn.execute(sql, params)]
+            if page:
+                yield page
+                after = page[-1]["trade_id"]
+            if len(page) < page_size:
+                return
+
+    def delete_trades(self, session_id: str):
+        self._wait()
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM trade_log WHERE session_id = ?", (session_id,))
+            self._conn.execute("DELETE FROM session_summary WHERE session_id = ?", (session_id,))
+
+    def leaderboard(self, metric: str = "total_pnl", limit: int = 20, offset: int = 0, min_trades: int = 1) -> list:
+        desc = _check_metric(metric)
+        self._wait()
+        with self._lock:
+            cur = self._conn.execute(
+                f"SELECT {', '.join(SUMMARY_COLUMNS)} FROM session_summary WHERE trades >= ? "
+                f"ORDER BY {metric} {'DESC' if desc else 'ASC'}, session_id LIMIT ? OFFSET ?",
+                (min_trades, limit, offset),
+            )
+            return [dict(r) for r in cur]
+
+    def session_rank(self, session_id: str, metric: str = "total_pnl", min_trades: int = 1):
+        desc = _check_metric(metric)
+        self._wait()
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(SUMMARY_COLUMNS)} FROM session_summary WHERE session_id = ?", (session_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            # metric 인덱스 범위만 훑는다
+            better = self._conn.execute(
+                f"SELECT COUNT(*) FROM session_summary WHERE {metric} {'>' if desc else '<'} ? AND trades >= ?",
+                (row[metric], min_trades),
+            ).fetchone()[0]
+            total = self._conn.execute(
+                "SELECT COUNT(*) FROM session_summary WHERE trades >= ?", (min_trades,)
+            ).fetchone()[0]
+        return {"summary": dict(row), "rank": better + 1, "total": total}
+
+    def rollup_summaries(self) -> int:
+        self._wait()
+        with self._lock, self._conn:
+            self._conn.execute(self.ROLLUP)
+            return self._conn.execute("SELECT changes()").fetchone()[0]
@@ -0,0 +1,141 @@
+import numpy as np
+import pandas as pd
+
+from chart_payload import CANDLE_FIELDS, encode_columns
+from indicators import Bars
+
+BASE_TIMEFRAME = "1h"
+
+HOUR_MS = 3_600_000
+DAY_MS = 24 * HOUR_MS
+TIMEFRAMES = {
+    "4h": 4 * HOUR_MS,
+    "12h": 12 * HOUR_MS,
+    "1d": DAY_MS,
+    "1w": 7 * DAY_MS,
+}
+# 1970-01-01 은 목요일이므로 주봉은 월요일(1970-01-05) 기준으로 자른다
+OFFSETS = {"1w": 4 * DAY_MS}
+
+
+# =====================
+# 상위 타임프레임 1개
+# =====================
+class TimeframeLevel:
+    """기본 캔들 인덱스 i 마다 소속 봉 번호(bucket_of)와 i 시점까지의 진행 중 봉을 미리 계산해 둔다.
+
+    윈도우 [start:end] 의 상위 봉은 완성 봉 슬라이스 + end-1 시점의 진행 중 봉이므로
+    end 이후 데이터는 절대 섞이지 않는다.
+    """
+
+    __slots__ = (
+        "key", "period_ms", "offset_ms", "bucket_of",
+        "time", "open", "high", "low", "close", "volume",
+        "run_high", "run_low", "run_volume", "base_close",
+    )
+
+    def __init__(self, store, key: str, period_ms: int, offset_ms: int = 0):
+        self.key = key
+        self.period_ms = period_ms
+        self.offset_ms = offset_ms
+
+        open_time = np.asarray(store.open_time)
+        bucket_key = (open_time - offset_ms) // period_ms
+        new = np.ones(len(bucket_key), dtype=bool)
+        new[1:] = bucket_key[1:] != bucket_key[:-1]
+        first = np.flatnonzero(new)
+        last = np.append(first[1:] - 1, len(bucket_key) - 1)
+        self.bucket_of = np.cumsum(new) - 1
+
+        high = np.asarray(store.high)
+        low = np.asarray(store.low)
+        volume = np.asarray(store.volume)
+
+        # 완성 봉
+        self.time = (bucket_key[first] * period_ms + offset_ms) // 1000
+        self.open = np.asarray(store.open)[first]
+        self.high = np.maximum.reduceat(high, first) if len(first) else high[:0]
+        self.low = np.minimum.reduceat(low, first) if len(first) else low[:0]
+        self.close = np.asarray(store.close)[last]
+        self.volume = np.add.reduceat(volume, first) if len(first) else volume[:0]
+
+        # 기본 캔들 시점별 진행 중 봉 (봉 시작부터 누적)
+        groups = pd.Series(self.bucket_of)
+        self.run_high = pd.Series(high).groupby(groups).cummax().to_numpy()
+        self.run_low = pd.Series(low).groupby(groups).cummin().to_numpy()
+        self.run_volume = pd.Series(volume).groupby(groups).cumsum().to_numpy()
+        self.base_close = np.asarray(store.close)
+
+    def __len__(self):
+        return len(self.time)
+
+    def bar_time(self, t: int) -> int:
+        """기본 캔들 시간(초)이 속한 봉의 시간(초)."""
+        return ((t * 1000 - self.offset_ms) // self.period_ms * self.period_ms + self.offset_ms) // 1000
+
+    def window(self, start: int, end: int) -> dict:
+        """[start:end] 기본 캔들이 보이는 시점의 상위 봉 컬럼 (마지막 봉은 진행 중)."""
+        if end <= start:
+            return {name: [] for name in CANDLE_FIELDS}
+        b0 = self.bucket_of[start]
+        b1 = self.bucket_of[end - 1]
+        i = end - 1
+        return {
+            "time": np.append(self.time[b0:b1], self.time[b1]).tolist(),
+            "open": np.append(self.open[b0:b1], self.open[b1]).tolist(),
+            "high": np.append(self.high[b0:b1], self.run_high[i]).tolist(),
+            "low": np.append(self.low[b0:b1], self.run_low[i]).tolist(),
+            "close": np.append(self.close[b0:b1], self.base_close[i]).tolist(),
+            "volume": np.append(self.volume[b0:b1], self.run_volume[i]).tolist(),
+        }
+
+    # chart_component 가 쓰는 인코더 인터페이스 (CandleEncoder 와 동일)
+    def encode(self, start: int, end: int) -> str:
+        return encode_columns(self.window(start, end))
+
+    def encode_range(self, start: int, end: int) -> str:
+        # start-1 이 속했던 봉(이제 완성됐을 수 있음)부터 현재 진행 중 봉까지
+        return self.encode(max(start - 1, 0), end)
+
+    # 넓은 맥락(WideContext)용: 완성 봉 [lo:hi) 컬럼
+    def columns(self, lo: int, hi: int) -> dict:
+        return {
+            "time": self.time[lo:hi], "open": self.open[lo:hi], "high": self.high[lo:hi],
+            "low": self.low[lo:hi], "close": self.close[lo:hi], "volume": self.volume[lo:hi],
+        }
+
+    # 지표 오버레이용: 완성 봉 배열 + end-1 시점의 진행 중 봉
+    def bars(self) -> Bars:
+        return Bars(self.time, self.open, self.high, self.low, self.close, self.volume)
+
+    def span(self, start: int, end: int):
+        """(b0, b1, 진행 중 봉) — 완성 봉 [b0:b1] 와 b1 번째 봉의 end-1 시점 상태."""
+        if end <= start:
+            return 0, 0, None
+        b0 = self.bucket_of[start]
+        b1 = self.bucket_of[end - 1]
+        i = end - 1
+        partial = (int(self.time[b1]), self.open[b1], self.run_high[i], self.run_low[i],
+                   self.base_close[i], self.run_volume[i])
+        return b0, b1, partial
+
+    def span_range(self, start: int, end: int):
+        return self.span(max(start - 1, 0), end)
+
+
+# =====================
+# 타임프레임 피라미드 (프로세스당 1회 생성)
+# =====================
+class TimeframePyramid:
+    def __init__(self, store, timeframes: dict = None):
+        timeframes = TIMEFRAMES if timeframes is None else timeframes
+        self.levels = {
+            key: TimeframeLevel(store, key, period, OFFSETS.get(key, 0))
+            for key, period in timeframes.items()
+        }
+
+    def __getitem__(self, key: str) -> TimeframeLevel:
+        return self.levels[key]
+
+    def keys(self):
+        return [BASE_TIMEFRAME, *self.levels]
@@ -0,0 +1,210 @@
+import argparse
+import csv
+import io
+import tempfile
+import uuid
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from storage import STORE_FILE, TRADE_COLUMNS, SQLiteTradeStore
+
+CSV = "csv"
+PARQUET = "parquet"
+FORMATS = (CSV, PARQUET)
+MIME_TYPES = {CSV: "text/csv", PARQUET: "application/vnd.apache.parquet"}
+
+EXPORT_COLUMNS = ("trade_id", *TRADE_COLUMNS)
+SCHEMA = pa.schema([
+    ("trade_id", pa.int64()),
+    ("session_id", pa.string()),
+    ("idempotency_key", pa.string()),
+    ("entry_time", pa.string()),
+    ("exit_time", pa.string()),
+    ("play_hours", pa.float64()),
+    ("direction", pa.string()),
+    ("entry_price", pa.float64()),
+    ("exit_price", pa.float64()),
+    ("leverage", pa.float64()),
+    ("position_ratio", pa.int64()),      # 앱은 int(비중 × 100) 으로 저장한다
+    ("entry_capital", pa.float64()),
+    ("pnl_dollar", pa.float64()),
+    ("balance_after", pa.float64()),
+    ("reason", pa.string()),
+])
+# 가져올 때 숫자 열의 변환 (Postgres 정수 열은 5.0 같은 값을 받지 않으므로 정수는 int 로)
+NUMERIC_COLUMNS = {
+    f.name: int if pa.types.is_integer(f.type) else float
+    for f in SCHEMA if pa.types.is_integer(f.type) or pa.types.is_floating(f.type)
+}
+
+# 원격 저장소 한 번 읽기 / 한 번 쓰기의 행 수. 메모리에는 이 크기의 페이지 하나만 올라간다
+PAGE_ROWS = 10_000
+IMPORT_BATCH = 5_000
+
+
+# =====================
+# 내보내기 (keyset 페이지 → CSV / Parquet 스트리밍)
+# =====================
+def _pages(store, session_id: str, page_size: int, pending=()):
+    """저장소 페이지 뒤에 아직 전송 대기 중인 행(pending)을 마지막 페이지로 붙인다.
+
+    그 사이 저장소에 들어간 행은 idempotency_key 로 빼므로, pending 은 저장소를 읽기 전에 구해 둔다.
+    """
+    waiting = {r["idempotency_key"]: r for r in pending}
+    for page in store.iter_trades(session_id, EXPORT_COLUMNS, page_size):
+        for row in page:
+            waiting.pop(row.get("idempotency_key"), None)
+        yield page
+    if waiting:
+        yield list(waiting.values())
+
+
+def export_csv(store, out, session_id: str = None, page_size: int = PAGE_ROWS, pending=()) -> int:
+    """out(텍스트 파일)에 CSV 로 쓴다. 내보낸 행 수."""
+    writer = csv.DictWriter(out, EXPORT_COLUMNS, extrasaction="ignore", lineterminator="\n")
+    writer.writeheader()
+    count = 0
+    for page in _pages(store, session_id, page_size, pending):
+        writer.writerows(page)
+        count += len(page)
+    return count
+
+
+def export_parquet(store, out, session_id: str = None, page_size: int = PAGE_ROWS, pending=()) -> int:
+    """out(경로 또는 바이너리 파일)에 Parquet 으로 쓴다. 페이지 하나가 row group 하나. 내보낸 행 수."""
+    count = 0
+    with pq.ParquetWriter(out, SCHEMA, compression="zstd") as writer:
+        for page in _pages(store, session_id, page_size, pending):
+            writer.write_table(pa.Table.from_pylist(page, SCHEMA))
+            count += len(page)
+    return count
+
+
+def export_trades(store, out, fmt: str, session_id: str = None, page_size: int = PAGE_ROWS, pending=()) -> int:
+    """pending: 아직 저장소에 반영되지 않은 행 (write-behind 대기열). 저장소에 없는 것만 끝에 붙인다."""
+    if fmt == CSV:
+        if isinstance(out, str):
+            with open(out, "w", newline="", encoding="utf-8") as f:
+                return export_csv(store, f, session_id, page_size, pending)
+        text = io.TextIOWrapper(out, encoding="utf-8", newline="", write_through=True)
+        try:
+            return export_csv(store, text, session_id, page_size, pending)
+        finally:
+            # 감싼 바이너리 파일은 호출한 쪽이 닫는다
+            text.detach()
+    if fmt == PARQUET:
+        return export_parquet(store, out, session_id, page_size, pending)
+    raise ValueError(f"unknown export format '{fmt}'")
+
+
+def export_bytes(store, fmt: str, session_id: str = None, page_size: int = PAGE_ROWS, pending=()) -> bytes:
+    """다운로드 버튼용 파일 내용. 페이지 단위로 임시 파일에 쓴 뒤 한 번에 읽는다
+    (st.download_button 의 지연 data 는 bytes / BytesIO 같은 몇 가지 타입만 받는다)."""
+    with tempfile.TemporaryFile() as out:
+        export_trades(store, out, fmt, session_id, page_size, pending)
+        out.seek(0)
+        return out.read()
+
+
+# =====================
+# 가져오기 (묶음 insert)
+# =====================
+def _restore_row(row: dict, session_id: str = None) -> dict:
+    """파일 행 → insert 행. trade_id 는 저장소가 새로 매긴다(파일 순서 유지).
+
+    session_id 를 주면 그 세션으로 옮기고, 중복 방지 키도 (새 세션, 원래 키)로 다시 만들어
+    같은 파일을 여러 번 가져와도 한 번만 들어간다.
+    """
+    out = {c: row.get(c) for c in TRADE_COLUMNS}
+    for c in TRADE_COLUMNS:
+        if out[c] == "":
+            out[c] = None
+        elif c in NUMERIC_COLUMNS and out[c] is not None:
+            # CSV 는 문자열, 예전 내보내기의 정수 열은 "5.0" 일 수 있다
+            out[c] = NUMERIC_COLUMNS[c](float(out[c]))
+    key = out["idempotency_key"] or f"{out['session_id']}:{row.get('trade_id')}"
+    if session_id is not None and session_id != out["session_id"]:
+        key = str(uuid.uuid5(uuid.NAMESPACE_URL, f"{session_id}/{key}"))
+        out["session_id"] = session_id
+    out["idempotency_key"] = key
+    return out
+
+
+def _insert_batches(store, rows, session_id: str = None, batch: int = IMPORT_BATCH) -> int:
+    count = 0
+    buf = []
+    for row in rows:
+        buf.append(_restore_row(row, session_id))
+        if len(buf) >= batch:
+            store.insert_trades(buf)
+            count += len(buf)
+            buf = []
+    if buf:
+        store.insert_trades(buf)
+        count += len(buf)
+    return count
+
+
+def import_csv(store, src, session_id: str = None, batch: int = IMPORT_BATCH) -> int:
+    """src(경로 또는 텍스트 파일)의 CSV 행을 batch 개씩 insert_trades 로 넣는다. 읽은 행 수."""
+    if isinstance(src, str):
+        with open(src, newline="", encoding="utf-8") as f:
+            return _insert_batches(store, csv.DictReader(f), session_id, batch)
+    return _insert_batches(store, csv.DictReader(src), session_id, batch)
+
+
+def import_parquet(store, src, session_id: str = None, batch: int = IMPORT_BATCH) -> int:
+    """src(경로 또는 바이너리 파일)의 Parquet 을 batch 행씩 읽어 넣는다. 읽은 행 수."""
+    parquet = pq.ParquetFile(src)
+    columns = [c for c in EXPORT_COLUMNS if c in parquet.schema_arrow.names]
+    rows = (row for b in parquet.iter_batches(batch, columns=columns) for row in b.to_pylist())
+    return _insert_batches(store, rows, session_id, batch)
+
+
+def import_trades(store, src, fmt: str, session_id: str = None, batch: int = IMPORT_BATCH) -> int:
+    if fmt == CSV:
+        if isinstance(src, str):
+            return import_csv(store, src, session_id, batch)
+        text = io.TextIOWrapper(src, encoding="utf-8", newline="")
+        try:
+            return import_csv(store, text, session_id, batch)
+        finally:
+            text.detach()
+    if fmt == PARQUET:
+        return import_parquet(store, src, session_id, batch)
+    raise ValueError(f"unknown import format '{fmt}'")
+
+
+def guess_format(path: str) -> str:
+    return PARQUET if path.lower().endswith((".parquet", ".pq")) else CSV
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stream trade_log to/from CSV or Parquet.")
+    parser.add_argument("--sqlite", default=STORE_FILE, help="SQLite trade store path")
+    sub = parser.add_subparsers(dest="command", required=True)
+    export = sub.add_parser("export", help="export trades (all sessions unless --session)")
+    export.add_argument("path")
+    export.add_argument("--session", default=None)
+    export.add_argument("--format", choices=FORMATS, default=None, help="default: from the file extension")
+    export.add_argument("--page-size", type=int, default=PAGE_ROWS)
+    restore = sub.add_parser("import", help="import trades exported by this tool")
+    restore.add_argument("path")
+    restore.add_argument("--session", default=None, help="move every row into this session")
+    restore.add_argument("--format", choices=FORMATS, default=None, help="default: from the file extension")
+    restore.add_argument("--batch", type=int, default=IMPORT_BATCH)
+    args = parser.parse_args(argv)
+
+    store = SQLiteTradeStore(args.sqlite)
+    fmt = args.format or guess_format(args.path)
+    if args.command == "export":
+        count = export_trades(store, args.path, fmt, args.session, args.page_size)
+        print(f"exported {count} trades to {args.path} ({fmt})")
+    else:
+        count = import_trades(store, args.path, fmt, args.session, args.batch)
+        print(f"read {count} trades from {args.path} ({fmt}); duplicates by idempotency_key were skipped")
+
+
+if __name__ == "__main__":
+    main()